@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corps', '0006_alter_address_options_alter_corporation_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entity',
+            name='corporation',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entity', to='corps.corporation'),
+        ),
+    ]
@@ -48,6 +48,8 @@ class Entity(models.Model):
     legal_name = models.CharField(max_length=255)
     jurisdiction = models.CharField(max_length=50, blank=True)
     address = models.ForeignKey(Address, on_delete=models.PROTECT)
+    # Société gérée sur la plateforme (société de portefeuille) : permet de remonter la chaîne de détention (ISC)
+    corporation = models.OneToOneField(Corporation, null=True, blank=True, on_delete=models.SET_NULL, related_name="entity")
 
 class Party(models.Model):
     class Type(models.TextChoices):
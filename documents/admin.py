@@ -1,10 +1,42 @@
 from django.contrib import admin
-from .models import Document
+from orgs.models import Organization
+from .models import Blob, Document, DocumentStage, MerkleTree
+from .search import search_documents
+
+class DocumentStageInline(admin.TabularInline):
+    model = DocumentStage
+    extra = 0
+    can_delete = False
+    readonly_fields = ("name", "status", "sha256", "attempts", "error", "updated_at")
 
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
-    list_display = ("corp", "title", "category", "language", "content_type", "uploaded_by", "created_at", "id")
-    list_filter = ("corp", "category", "language", "content_type")
+    list_display = ("corp", "title", "category", "language", "content_type", "status", "integrity", "uploaded_by", "created_at", "id")
+    list_filter = ("corp", "category", "language", "content_type", "status", "integrity")
     search_fields = ("title", "corp__legal_name", "uploaded_by__username", "uploaded_by__email")
-    readonly_fields = ("sha256", "created_at")
+    readonly_fields = ("sha256", "created_at", "status", "page_count", "integrity", "verified_at",
+                       "parent", "page_start", "page_end")
     autocomplete_fields = ["corp", "uploaded_by"]
+    inlines = [DocumentStageInline]
+
+    def get_search_results(self, request, queryset, search_term):
+        # Titre/société (search_fields) + contenu via l'index plein texte
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            hits = search_documents(search_term, Organization.objects.values_list("id", flat=True), limit=200)
+            results |= queryset.filter(id__in=[document_id for document_id, _, _ in hits])
+        return results, may_have_duplicates
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "size", "content_type", "ref_count", "created_at", "released_at")
+    list_filter = ("content_type",)
+    search_fields = ("sha256",)
+    readonly_fields = ("sha256", "name", "size", "content_type", "ref_count", "created_at", "released_at")
+
+@admin.register(MerkleTree)
+class MerkleTreeAdmin(admin.ModelAdmin):
+    list_display = ("corp", "root", "leaf_count", "updated_at")
+    search_fields = ("corp__legal_name", "root")
+    exclude = ("leaves", "levels")
+    readonly_fields = ("corp", "root", "leaf_count", "updated_at")
@@ -0,0 +1,209 @@
+"""Conversion DOCX → PDF/A par un pool borné de LibreOffice headless résidents.
+
+Chaque worker a son canal UNO (pipe nommé d'après le pid) et son profil temporaire : les
+processus gunicorn/Celery d'une même machine ne partagent jamais un soffice. Le module `uno`
+(paquet python3-uno) est requis : sans lui la conversion est indisponible plutôt que relancée
+à froid à chaque document. Un worker est recyclé après LIBREOFFICE_MAX_JOBS conversions ou
+après un dépassement de délai. Les PDF produits sont mis en cache par SHA-256 de la source.
+"""
+import atexit
+import hashlib
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+
+try:
+    import uno  # fourni avec LibreOffice (python3-uno)
+    from com.sun.star.beans import PropertyValue
+except Exception:  # pragma: no cover
+    uno = None
+
+PDFA_VERSION = 2  # PDF/A-2b
+DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+# Types convertibles → extension attendue par LibreOffice
+SUFFIXES = {
+    DOCX: ".docx",
+    "application/msword": ".doc",
+    "application/vnd.oasis.opendocument.text": ".odt",
+    "application/rtf": ".rtf",
+}
+CACHE_PREFIX = "conversions/pdfa/"
+
+class ConversionError(Exception):
+    pass
+
+class ConversionTimeout(ConversionError):
+    pass
+
+def _props(**values):
+    out = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name, prop.Value = name, value
+        out.append(prop)
+    return tuple(out)
+
+class OfficeWorker:
+    """Un soffice headless dédié (canal et profil propres au processus courant)."""
+
+    def __init__(self, slot):
+        self.slot = slot
+        self.profile = None
+        self.pipe = None
+        self.jobs = 0
+        self.process = None
+        self.desktop = None
+
+    def start(self):
+        if self.profile is None:
+            self.profile = Path(tempfile.mkdtemp(prefix=f"minutebooks-lo-{os.getpid()}-{self.slot}-"))
+        # Nom unique à chaque démarrage : un soffice en fin de vie ne peut pas être confondu avec le suivant
+        self.pipe = f"minutebooks-lo-{os.getpid()}-{self.slot}-{uuid.uuid4().hex[:8]}"
+        self.process = subprocess.Popen([
+            settings.LIBREOFFICE_BINARY, "--headless", "--invisible", "--nologo", "--norestore", "--nodefault",
+            f"-env:UserInstallation={self.profile.as_uri()}",
+            f"--accept=pipe,name={self.pipe};urp;StarOffice.ComponentContext",
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local)
+        deadline = time.monotonic() + settings.LIBREOFFICE_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(f"uno:pipe,name={self.pipe};urp;StarOffice.ComponentContext")
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise ConversionError("LibreOffice n'a pas démarré")
+                time.sleep(0.25)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+    def stop(self):
+        if self.desktop is not None:
+            try:
+                self.desktop.terminate()
+            except Exception:
+                pass
+            self.desktop = None
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def reset(self):
+        self.stop()
+        if self.profile is not None:
+            shutil.rmtree(self.profile, ignore_errors=True)
+            self.profile = None
+        self.jobs = 0
+
+    def convert(self, source, target, timeout):
+        """Convertit le fichier `source` en PDF/A `target` ; tue le processus au-delà de `timeout`."""
+        self.jobs += 1
+        done = threading.Event()
+        timer = threading.Timer(timeout, lambda: done.is_set() or self.stop())
+        timer.start()
+        try:
+            doc = self.desktop.loadComponentFromURL(source.as_uri(), "_blank", 0, _props(Hidden=True))
+            try:
+                filter_data = uno.Any("[]com.sun.star.beans.PropertyValue", _props(SelectPdfVersion=PDFA_VERSION))
+                doc.storeToURL(target.as_uri(), _props(FilterName="writer_pdf_Export", FilterData=filter_data))
+            finally:
+                doc.close(True)
+        except Exception as exc:
+            if self.process is None:
+                raise ConversionTimeout(f"Conversion interrompue après {timeout} s") from exc
+            raise ConversionError(str(exc)) from exc
+        finally:
+            done.set()
+            timer.cancel()
+
+class ConversionPool:
+    """Pool borné : les conversions attendent un worker libre (au plus `timeout` secondes)."""
+
+    def __init__(self, size, max_jobs, timeout):
+        self.max_jobs = max_jobs
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        for slot in range(size):
+            self._idle.put(OfficeWorker(slot))
+
+    def convert(self, data, suffix=".docx"):
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise ConversionTimeout("Aucun convertisseur libre")
+        workdir = Path(tempfile.mkdtemp(prefix="minutebooks-pdfa-"))
+        try:
+            if worker.process is None:
+                worker.start()
+            source = workdir / f"source{suffix}"
+            source.write_bytes(data)
+            target = workdir / "out" / "source.pdf"
+            target.parent.mkdir()
+            worker.convert(source, target, self.timeout)
+            return target.read_bytes()
+        except ConversionError:
+            worker.reset()  # état incertain : processus et profil recréés au prochain job
+            raise
+        finally:
+            if worker.jobs >= self.max_jobs:
+                worker.stop()
+                worker.jobs = 0
+            self._idle.put(worker)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().reset()
+            except queue.Empty:
+                return
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def available():
+    return uno is not None and bool(shutil.which(settings.LIBREOFFICE_BINARY))
+
+def get_pool():
+    """Pool du processus courant, créé au premier usage (et recréé dans un processus forké)."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConversionPool(settings.LIBREOFFICE_POOL_SIZE, settings.LIBREOFFICE_MAX_JOBS,
+                                       settings.LIBREOFFICE_TIMEOUT)
+                _pool_pid = os.getpid()
+                atexit.register(_pool.shutdown)
+    return _pool
+
+def cache_name(sha256):
+    return f"{CACHE_PREFIX}{sha256[:2]}/{sha256}.pdf"
+
+def convert_to_pdfa(data, sha256=None, suffix=".docx"):
+    """PDF/A des octets `data` ; servi depuis le cache si la même source a déjà été convertie.
+
+    Retourne (nom dans le stockage, octets du PDF).
+    """
+    sha256 = sha256 or hashlib.sha256(data).hexdigest()
+    name = cache_name(sha256)
+    storage = storages["default"]
+    if storage.exists(name):
+        with storage.open(name, "rb") as fh:
+            return name, fh.read()
+    pdf = get_pool().convert(data, suffix)
+    if not storage.exists(name):
+        storage.save(name, ContentFile(pdf))
+    return name, pdf
@@ -0,0 +1,107 @@
+"""Téléchargement des fichiers après contrôle d'accès, transfert délégué selon FILE_DOWNLOAD_BACKEND.
+
+- "django" : servi par Django, avec requêtes Range (une plage) ;
+- "x-accel" : nginx (X-Accel-Redirect vers FILE_DOWNLOAD_ACCEL_PREFIX, location `internal`) ;
+- "x-sendfile" : Apache/lighttpd (X-Sendfile, chemin local) ;
+- "s3" : redirection vers une URL présignée de courte durée (S3/MinIO).
+
+ETag = SHA-256 du contenu : If-None-Match répond 304 sans toucher au stockage.
+"""
+import mimetypes
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (FileResponse, HttpResponse, HttpResponseNotModified, HttpResponseRedirect,
+                         StreamingHttpResponse)
+from django.utils.http import content_disposition_header
+
+from .files import CHUNK_SIZE
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def etag_matches(header, etag):
+    return header.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+def _parse_range(header, size):
+    """(début, fin) inclusifs, "unsatisfiable", ou None (en-tête absent, multiple ou invalide : fichier entier)."""
+    match = _RANGE.match(header.strip()) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        start, end = max(size - int(last), 0), size - 1
+    if start >= size or (not first and int(last) == 0):
+        return "unsatisfiable"
+    return start, end
+
+def _read(fh, length):
+    try:
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+def _django_response(request, fieldfile, content_type, size, etag):
+    byte_range = _parse_range(request.headers.get("Range", ""), size)
+    if_range = request.headers.get("If-Range")
+    if byte_range is None or (if_range and if_range != etag):
+        return FileResponse(fieldfile.open("rb"), content_type=content_type)
+    if byte_range == "unsatisfiable":
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+    start, end = byte_range
+    fh = fieldfile.open("rb")
+    fh.seek(start)
+    response = StreamingHttpResponse(_read(fh, end - start + 1), status=206, content_type=content_type)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Content-Length"] = str(end - start + 1)
+    return response
+
+def download_filename(title, name, content_type=""):
+    """Nom proposé au navigateur : le titre, avec l'extension du fichier stocké ou du type MIME."""
+    ext = posixpath.splitext(name)[1] or mimetypes.guess_extension(content_type or "") or ""
+    return title if not ext or title.lower().endswith(ext.lower()) else f"{title}{ext}"
+
+def file_response(request, fieldfile, *, filename, content_type="", sha256="", size=None):
+    """Réponse de téléchargement pour `fieldfile` ; l'appelant a déjà vérifié les droits."""
+    content_type = content_type or "application/octet-stream"
+    etag = f'"{sha256}"' if sha256 else None
+    if etag and etag_matches(request.headers.get("If-None-Match", ""), etag):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    disposition = content_disposition_header(as_attachment=True, filename=filename)
+    backend = settings.FILE_DOWNLOAD_BACKEND
+    if backend == "s3":
+        url = fieldfile.storage.url(fieldfile.name, expire=settings.FILE_DOWNLOAD_URL_EXPIRY, parameters={
+            "ResponseContentDisposition": disposition, "ResponseContentType": content_type})
+        response = HttpResponseRedirect(url)
+        response["Cache-Control"] = "private, no-store"  # URL signée : ne pas la mettre en cache
+        return response
+    if backend == "x-accel":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.FILE_DOWNLOAD_ACCEL_PREFIX + quote(fieldfile.name)
+    elif backend == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = fieldfile.path
+    else:
+        response = _django_response(request, fieldfile, content_type, size if size else fieldfile.size, etag)
+
+    response["Content-Disposition"] = disposition
+    response["Accept-Ranges"] = "bytes"
+    response["Cache-Control"] = "private, no-cache"  # revalidation par ETag à chaque accès
+    if etag:
+        response["ETag"] = etag
+    return response
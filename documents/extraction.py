@@ -0,0 +1,29 @@
+"""Extraction du texte des documents (DOCX, PDF, texte brut) pour l'indexation."""
+try:
+    from pypdf import PdfReader
+except Exception:  # pragma: no cover
+    PdfReader = None
+
+from .conversion import DOCX
+
+def _docx_text(fileobj):
+    from docx import Document
+    doc = Document(fileobj)
+    parts = [p.text for p in doc.paragraphs]
+    for table in doc.tables:
+        for row in table.rows:
+            parts.extend(cell.text for cell in row.cells)
+    return "\n".join(part for part in parts if part)
+
+def _pdf_text(fileobj):
+    return "\n".join(page.extract_text() or "" for page in PdfReader(fileobj).pages)
+
+def extract_text(fileobj, content_type):
+    """Texte du fichier, ou None si le type n'est pas pris en charge."""
+    if content_type == DOCX:
+        return _docx_text(fileobj)
+    if content_type == "application/pdf" and PdfReader is not None:
+        return _pdf_text(fileobj)
+    if content_type.startswith("text/"):
+        return fileobj.read().decode("utf-8", errors="replace")
+    return None
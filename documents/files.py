@@ -0,0 +1,86 @@
+"""Empreinte et type MIME des fichiers, calculés en une seule lecture."""
+import hashlib
+import mimetypes
+import threading
+
+try:
+    import magic  # python-magic (libmagic)
+except Exception:  # pragma: no cover
+    magic = None
+
+SNIFF_BYTES = 8192
+CHUNK_SIZE = 64 * 1024
+
+_local = threading.local()
+
+def _magic():
+    # Une instance libmagic par thread (création coûteuse, objet non partageable)
+    if not hasattr(_local, "magic"):
+        _local.magic = magic.Magic(mime=True)
+    return _local.magic
+
+def sniff_content_type(head, name=""):
+    """Type MIME d'après les premiers octets (libmagic), sinon d'après l'extension."""
+    if magic and head:
+        try:
+            ctype = _magic().from_buffer(head[:SNIFF_BYTES])
+            if ctype:
+                return ctype
+        except Exception:
+            pass
+    ctype, _ = mimetypes.guess_type(name or "")
+    return ctype or "application/octet-stream"
+
+class Digest:
+    """SHA-256, taille et premiers octets, alimentés morceau par morceau."""
+
+    def __init__(self):
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+
+    def update(self, chunk):
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+def file_digest(fileobj):
+    """Lit `fileobj` une fois depuis le début (position restaurée) et retourne son Digest."""
+    pos = fileobj.tell() if hasattr(fileobj, "tell") else 0
+    try:
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(0)
+        digest = Digest()
+        for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+        return digest
+    finally:
+        if hasattr(fileobj, "seek"):
+            fileobj.seek(pos)
+
+def fieldfile_digest(fieldfile):
+    """(sha256, content_type, size) d'un FieldFile : repris de l'upload, sinon une seule lecture.
+
+    L'empreinte est reportée sur le contenu pour que le stockage adressé par contenu ne relise pas.
+    """
+    digest = uploaded_digest(fieldfile)
+    if digest:
+        return digest
+    read = file_digest(fieldfile)
+    content = getattr(fieldfile, "_file", None)
+    if content is not None and not getattr(content, "sha256", ""):
+        content.sha256 = read.sha256
+    return read.sha256, sniff_content_type(read.head, fieldfile.name), read.size
+
+def uploaded_digest(fieldfile):
+    """(sha256, content_type, size) posés sur l'UploadedFile par les gestionnaires d'upload, sinon None."""
+    uploaded = getattr(fieldfile, "_file", None)
+    sha256 = getattr(uploaded, "sha256", "")
+    if not sha256:
+        return None
+    return sha256, getattr(uploaded, "sniffed_content_type", ""), uploaded.size
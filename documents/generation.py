@@ -0,0 +1,102 @@
+"""Génération des résolutions DOCX : modèles chargés et précompilés une fois par worker."""
+import copy
+import io
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.timezone import now
+from docx import Document
+from docxtpl import DocxTemplate
+from jinja2 import Environment
+
+TEMPLATE_DIR = Path(settings.BASE_DIR) / "templates" / "docx"
+
+class _CachingEnvironment(Environment):
+    # Le XML d'un même modèle est identique d'un rendu à l'autre : on ne le compile qu'une fois
+    def __init__(self):
+        super().__init__()
+        self._compiled = {}
+
+    def from_string(self, source, globals=None, template_class=None):
+        template = self._compiled.get(source)
+        if template is None:
+            template = self._compiled[source] = super().from_string(source, globals, template_class)
+        return template
+
+class _Rendering(DocxTemplate):
+    # Copie de travail du document déjà analysé (plus rapide qu'une relecture du .docx) ;
+    # le nettoyage XML de docxtpl est mémorisé d'un rendu à l'autre
+    def __init__(self, compiled):
+        super().__init__(io.BytesIO(compiled.source))
+        self.docx = copy.deepcopy(compiled.docx)
+        self._patched = compiled.patched
+
+    def patch_xml(self, src_xml):
+        patched = self._patched.get(src_xml)
+        if patched is None:
+            patched = self._patched[src_xml] = super().patch_xml(src_xml)
+        return patched
+
+class CompiledTemplate:
+    """Modèle DOCX en mémoire ; `render` produit les octets du document rempli."""
+
+    def __init__(self, path):
+        self.path = path
+        self.source = path.read_bytes()
+        self.docx = Document(io.BytesIO(self.source))
+        self.patched = {}
+        self.env = _CachingEnvironment()
+
+    def render(self, context):
+        tpl = _Rendering(self)
+        tpl.render(context, jinja_env=self.env)
+        out = io.BytesIO()
+        tpl.save(out)
+        return out.getvalue()
+
+class TemplateRegistry:
+    """Modèles par nom, langue et juridiction : <nom>_<juridiction>_<langue>.docx, sinon <nom>_<langue>.docx."""
+
+    def __init__(self, directory=TEMPLATE_DIR):
+        self.directory = Path(directory)
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, language="fr", jurisdiction=""):
+        candidates = [f"{name}_{language}.docx"]
+        if jurisdiction:
+            candidates.insert(0, f"{name}_{jurisdiction.lower()}_{language}.docx")
+        for filename in candidates:
+            compiled = self._load(filename)
+            if compiled is not None:
+                return compiled
+        raise FileNotFoundError(f"Modèle introuvable : {candidates[-1]}")
+
+    def _load(self, filename):
+        # Seuls les modèles existants sont retenus : un nom absent ne fait pas grossir le cache
+        compiled = self._templates.get(filename)
+        if compiled is None:
+            with self._lock:
+                compiled = self._templates.get(filename)
+                path = self.directory / filename
+                if compiled is None and path.exists():
+                    compiled = self._templates[filename] = CompiledTemplate(path)
+        return compiled
+
+templates = TemplateRegistry()
+
+def org_initial_context(corp):
+    return {
+        "corp": {
+            "legal_name": corp.legal_name,
+            "jurisdiction": corp.jurisdiction,
+            "incorporation_number": corp.incorporation_number or "",
+            "business_number": corp.business_number or "",
+        },
+        "date": now().date().strftime("%Y-%m-%d"),
+        "address": str(corp.registered_office) if corp.registered_office else "",
+    }
+
+def render_org_initial(corp, language="fr"):
+    return templates.get("org_initial", language, corp.jurisdiction).render(org_initial_context(corp))
@@ -0,0 +1,212 @@
+"""Intégrité des fichiers stockés : revérification des SHA-256 et arbre de Merkle par société.
+
+Revérification : chaque fichier distinct (un blob partagé n'est relu qu'une fois) est haché à
+nouveau par un pool de threads ; un seau à jetons commun limite le débit total lu depuis S3.
+Arbre de Merkle : feuilles = (id, sha256) des documents par id croissant, préfixes 0x00/0x01 à la
+RFC 6962. La racine atteste tout le livre ; quand seuls quelques documents changent ou s'ajoutent
+en fin d'arbre (id croissants), seuls leurs chemins jusqu'à la racine sont recalculés. L'arbre est
+tenu à jour après chaque ajout, remplacement ou suppression (documents.signals) et rapproché du
+livre par `verify_documents` ; sa lecture (API) n'écrit rien. Une preuve (chemin des empreintes sœurs) permet de
+vérifier un document contre la racine sans le reste du livre.
+"""
+import bisect
+import hashlib
+import logging
+import threading
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .files import CHUNK_SIZE
+from .models import Document, MerkleTree
+
+logger = logging.getLogger(__name__)
+
+LEAF, NODE = b"\x00", b"\x01"  # une feuille ne peut pas se faire passer pour un nœud
+
+class RateLimiter:
+    """Seau à jetons partagé par les threads : au plus `rate` octets/s en moyenne (0 = illimité)."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, n):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= n  # dette éventuelle : chaque lecteur attend sa part
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+def rehash(fieldfile, limiter):
+    """SHA-256 du fichier stocké, lu au débit permis ; FileNotFoundError s'il a disparu."""
+    if not fieldfile.storage.exists(fieldfile.name):
+        raise FileNotFoundError(fieldfile.name)
+    sha256 = hashlib.sha256()
+    with fieldfile.storage.open(fieldfile.name, "rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            limiter.take(len(chunk))
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def verify_batch(documents, pool, limiter):
+    """Revérifie un lot de documents ; retourne ({état: [ids]}, [(document, erreur)]).
+
+    Les erreurs de lecture (réseau, S3) ne donnent pas de verdict : le document reste à vérifier.
+    """
+    by_name = {}
+    for document in documents:
+        by_name.setdefault(document.file.name, []).append(document)
+
+    def check(group):
+        try:
+            return group, rehash(group[0].file, limiter), None
+        except FileNotFoundError:
+            return group, None, None
+        except Exception as exc:
+            return group, None, exc
+
+    outcome, errors = {}, []
+    for group, sha256, exc in pool.map(check, by_name.values()):
+        if exc is not None:
+            errors += [(document, exc) for document in group]
+            continue
+        for document in group:
+            if sha256 is None:
+                state = Document.Integrity.MISSING
+            else:
+                state = Document.Integrity.OK if sha256 == document.sha256 else Document.Integrity.MISMATCH
+            outcome.setdefault(state, []).append(document.id)
+            if state != Document.Integrity.OK:
+                logger.error("Intégrité : document %s (%s) %s", document.id, document.file.name, state)
+    verified_at = timezone.now()
+    for state, ids in outcome.items():
+        Document.objects.filter(id__in=ids).update(integrity=state, verified_at=verified_at)
+    return outcome, errors
+
+def leaf_hash(document_id, sha256):
+    return hashlib.sha256(LEAF + f"{document_id}:{sha256}".encode()).hexdigest()
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+def _node(below, i):
+    # Nœud sans frère (niveau impair) : remonté tel quel
+    return node_hash(below[2 * i], below[2 * i + 1]) if 2 * i + 1 < len(below) else below[2 * i]
+
+def build_levels(leaves):
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        below = levels[-1]
+        levels.append([_node(below, i) for i in range((len(below) + 1) // 2)])
+    return levels
+
+def _rehash_paths(levels, changed):
+    """Recalcule les seuls chemins des feuilles `changed` (indices) jusqu'à la racine."""
+    for depth in range(1, len(levels)):
+        changed = {i // 2 for i in changed}
+        for i in changed:
+            levels[depth][i] = _node(levels[depth - 1], i)
+
+def _append_leaves(levels, hashes):
+    """Ajoute des feuilles en fin d'arbre : seuls les nœuds à droite de la première sont recalculés."""
+    changed = set(range(len(levels[0]), len(levels[0]) + len(hashes)))
+    levels[0].extend(hashes)
+    depth = 1
+    while len(levels[depth - 1]) > 1:
+        below = levels[depth - 1]
+        if depth == len(levels):
+            levels.append([])
+        levels[depth].extend([""] * ((len(below) + 1) // 2 - len(levels[depth])))
+        changed = {i // 2 for i in changed}
+        for i in changed:
+            levels[depth][i] = _node(below, i)
+        depth += 1
+
+def _save(tree):
+    tree.leaf_count = len(tree.leaves)
+    tree.root = tree.levels[-1][0] if tree.leaves else ""
+    tree.save()
+    return tree
+
+def update_tree(corp):
+    """Rapproche l'arbre de la société des empreintes enregistrées ; retourne le MerkleTree."""
+    current = [[pk, sha256] for pk, sha256 in Document.objects.filter(corp=corp).exclude(file="")
+               .order_by("id").values_list("id", "sha256")]
+    with transaction.atomic():
+        tree, _ = MerkleTree.objects.select_for_update().get_or_create(corp=corp)
+        known = len(tree.leaves)
+        if tree.levels and [pk for pk, _ in current[:known]] == [pk for pk, _ in tree.leaves]:
+            changed = [i for i, (old, new) in enumerate(zip(tree.leaves, current)) if old != new]
+            if not changed and known == len(current):
+                return tree
+            for i in changed:
+                tree.levels[0][i] = leaf_hash(*current[i])
+            _rehash_paths(tree.levels, changed)
+            _append_leaves(tree.levels, [leaf_hash(pk, sha256) for pk, sha256 in current[known:]])
+        else:  # documents supprimés ou insérés avant la fin : positions décalées, arbre reconstruit
+            tree.levels = build_levels([leaf_hash(pk, sha256) for pk, sha256 in current])
+        tree.leaves = current
+        return _save(tree)
+
+def record_document(document):
+    """Porte dans l'arbre de sa société un document ajouté ou dont le contenu a changé, sans relire le livre."""
+    with transaction.atomic():
+        tree = MerkleTree.objects.select_for_update().filter(corp_id=document.corp_id).first()
+        if tree is None or not tree.leaves:  # premier document, ou arbre jamais construit : livre relu
+            return update_tree(document.corp)
+        ids = [pk for pk, _ in tree.leaves]
+        index = bisect.bisect_left(ids, document.id)
+        if index < len(ids) and ids[index] == document.id:
+            if tree.leaves[index][1] == document.sha256:
+                return tree
+            tree.leaves[index][1] = document.sha256
+            tree.levels[0][index] = leaf_hash(document.id, document.sha256)
+            _rehash_paths(tree.levels, [index])
+        elif index == len(ids):
+            tree.leaves.append([document.id, document.sha256])
+            _append_leaves(tree.levels, [leaf_hash(document.id, document.sha256)])
+        else:  # id inférieur à une feuille existante (validations croisées) : rapprochement complet
+            return update_tree(document.corp)
+        return _save(tree)
+
+def forget_document(corp_id, document_id):
+    """Retire la feuille d'un document supprimé ; les nœuds sont recalculés depuis les feuilles gardées."""
+    with transaction.atomic():
+        tree = MerkleTree.objects.select_for_update().filter(corp_id=corp_id).first()
+        ids = [pk for pk, _ in tree.leaves] if tree else []
+        index = bisect.bisect_left(ids, document_id)
+        if index == len(ids) or ids[index] != document_id:
+            return  # société supprimée, ou document jamais porté dans l'arbre
+        del tree.leaves[index]
+        tree.levels = build_levels(tree.levels[0][:index] + tree.levels[0][index + 1:])
+        _save(tree)
+
+def proof(tree, document_id):
+    """Preuve d'appartenance d'un document à la racine : empreintes sœurs de la feuille à la racine."""
+    ids = [pk for pk, _ in tree.leaves]
+    index = bisect.bisect_left(ids, document_id)
+    if index == len(ids) or ids[index] != document_id:
+        raise KeyError(document_id)
+    leaf, path, position = tree.levels[0][index], [], index
+    for level in tree.levels[:-1]:
+        sibling = position ^ 1
+        if sibling < len(level):
+            path.append({"hash": level[sibling], "side": "left" if sibling < position else "right"})
+        position //= 2
+    return {"document": document_id, "sha256": tree.leaves[index][1], "index": index, "leaf": leaf,
+            "path": path, "root": tree.root}
+
+def verify_proof(document_id, sha256, path, root):
+    current = leaf_hash(document_id, sha256)
+    for step in path:
+        current = node_hash(step["hash"], current) if step["side"] == "left" else node_hash(current, step["hash"])
+    return current == root
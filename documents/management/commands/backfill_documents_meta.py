@@ -1,20 +1,72 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 from django.core.management.base import BaseCommand
+from django.db.models import Q
+from documents.files import file_digest, sniff_content_type
 from documents.models import Document
 
+FIELDS = ["sha256", "content_type", "size"]
+
+def _read_meta(doc):
+    """(doc, sha256, content_type, size, erreur) — une seule lecture du fichier."""
+    try:
+        with doc.file.open("rb") as fh:
+            digest = file_digest(fh)
+    except Exception as exc:
+        return doc, None, None, None, exc
+    return doc, digest.sha256, sniff_content_type(digest.head, doc.file.name), digest.size, None
+
 class Command(BaseCommand):
-    help = "Calcule sha256 et content_type pour les documents manquants"
-
-    def handle(self, *args, **options):
-        qs = Document.objects.all()
-        updated = 0
-        for doc in qs:
-            dirty = False
-            if doc.file and (not doc.sha256 or not doc.content_type):
-                old_sha, old_ct = doc.sha256, doc.content_type
-                doc.sha256 = doc._compute_sha256() or doc.sha256
-                doc.content_type = doc._sniff_content_type() or doc.content_type
-                if doc.sha256 != old_sha or doc.content_type != old_ct:
-                    doc.save(update_fields=["sha256", "content_type"])
-                    updated += 1
-                    self.stdout.write(f"✓ {doc.id}  sha256={doc.sha256[:8]}…  ct={doc.content_type}")
-        self.stdout.write(self.style.SUCCESS(f"Terminé. {updated} document(s) mis à jour."))
+    help = "Calcule sha256, content_type et taille pour les documents incomplets (parallèle, reprise possible)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=16, help="Lectures simultanées (I/O S3)")
+        parser.add_argument("--checkpoint", default="backfill_documents_meta.checkpoint",
+                            help="Fichier où est noté le dernier id traité")
+        parser.add_argument("--restart", action="store_true", help="Ignore le point de reprise")
+
+    def handle(self, *args, **opts):
+        checkpoint = Path(opts["checkpoint"])
+        last_id = 0
+        if checkpoint.exists() and not opts["restart"]:
+            last_id = int(checkpoint.read_text().strip() or 0)
+            self.stdout.write(f"Reprise après l'id {last_id}")
+
+        qs = (Document.objects.exclude(file="")
+              .filter(Q(sha256="") | Q(content_type="") | Q(size=0))
+              .only("id", "file", *FIELDS).order_by("id"))
+        updated = failed = nbytes = 0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=opts["workers"]) as pool:
+            while True:
+                batch = list(qs.filter(id__gt=last_id)[:opts["batch_size"]])
+                if not batch:
+                    break
+                dirty = []
+                for doc, sha256, ctype, size, exc in pool.map(_read_meta, batch):
+                    if exc:
+                        failed += 1
+                        self.stderr.write(f"✗ {doc.id}  {doc.file.name}: {exc}")
+                        continue
+                    new = (doc.sha256 or sha256, doc.content_type or ctype, doc.size or size)
+                    if new != (doc.sha256, doc.content_type, doc.size):
+                        doc.sha256, doc.content_type, doc.size = new
+                        dirty.append(doc)
+                        nbytes += size
+                Document.objects.bulk_update(dirty, FIELDS)
+                updated += len(dirty)
+                last_id = batch[-1].id
+                checkpoint.write_text(str(last_id))
+
+                elapsed = max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f"… id ≤ {last_id}  {updated} mis à jour, {failed} en erreur  "
+                    f"{updated / elapsed:.0f} doc/s, {nbytes / elapsed / 2**20:.1f} Mo/s")
+
+        checkpoint.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Terminé. {updated} document(s) mis à jour, {failed} en erreur, "
+            f"en {time.monotonic() - started:.1f} s."))
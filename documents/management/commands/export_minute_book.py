@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from corps.models import Corporation
+from documents.minutebook import iter_minute_book
+from documents.zipstream import iter_zip
+
+class Command(BaseCommand):
+    help = "Exporte le livre de minutes complet d'une société dans un ZIP (documents, registres, manifeste)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("corp_id", type=int)
+        parser.add_argument("--output", help="Fichier ZIP produit (défaut : livre_minutes_<id>.zip)")
+        parser.add_argument("--merged", action="store_true", help="Ajoute un PDF fusionné du livre")
+
+    def handle(self, *args, **options):
+        try:
+            corp = Corporation.objects.get(id=options["corp_id"])
+        except Corporation.DoesNotExist:
+            raise CommandError(f"Société introuvable : {options['corp_id']}")
+        try:
+            entries = iter_minute_book(corp, merged=options["merged"])
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        output = options["output"] or f"livre_minutes_{corp.id}.zip"
+        size = 0
+        with open(output, "wb") as out:
+            for data in iter_zip(entries):
+                out.write(data)
+                size += len(data)
+        self.stdout.write(self.style.SUCCESS(f"Terminé. {output} ({size / 1e6:.1f} Mo)."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from documents import pipeline
+from documents.models import Document, DocumentStage
+
+class Command(BaseCommand):
+    help = "(Re)lance le pipeline d'ingestion des documents en attente ou en échec"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--status", nargs="+", default=[Document.Status.PENDING, Document.Status.FAILED],
+                            choices=Document.Status.values)
+        parser.add_argument("--force", action="store_true",
+                            help="Oublie les étapes déjà terminées et les réexécute")
+
+    def handle(self, *args, **opts):
+        ids = Document.objects.filter(status__in=opts["status"]).values_list("id", flat=True)
+        count = 0
+        for document_id in ids.iterator(chunk_size=2000):
+            if opts["force"]:
+                DocumentStage.objects.filter(document_id=document_id).delete()
+            pipeline.enqueue(document_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"{count} document(s) envoyé(s) au pipeline."))
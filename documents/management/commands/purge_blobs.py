@@ -0,0 +1,26 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from documents.models import Blob
+from documents.storage import cas_storage
+
+class Command(BaseCommand):
+    help = "Supprime les blobs sans référence depuis plus d'un délai de grâce"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-hours", type=int, default=24)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["older_than_hours"])
+        purged = 0
+        for sha256 in Blob.objects.filter(ref_count=0, released_at__lt=cutoff).values_list("sha256", flat=True).iterator():
+            with transaction.atomic():
+                blob = (Blob.objects.select_for_update()
+                        .filter(sha256=sha256, ref_count=0, released_at__lt=cutoff).first())
+                if blob is None:
+                    continue  # référencé ou réservé (Blob.reserve) entre-temps
+                cas_storage.delete(blob.name)
+                blob.delete()
+                purged += 1
+        self.stdout.write(self.style.SUCCESS(f"Terminé. {purged} blob(s) supprimé(s)."))
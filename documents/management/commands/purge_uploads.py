@@ -0,0 +1,20 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from documents import resumable
+from documents.models import UploadSession
+
+class Command(BaseCommand):
+    help = "Abandonne les uploads reprenables inactifs et oublie les sessions terminées"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-hours", type=int, default=settings.UPLOAD_SESSION_TTL_HOURS)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["older_than_hours"])
+        purged = 0
+        for session in UploadSession.objects.filter(created_at__lt=cutoff).iterator():
+            resumable.abort(session)  # fichier partiel / upload multipart S3 inclus
+            purged += 1
+        self.stdout.write(self.style.SUCCESS(f"Terminé. {purged} session(s) supprimée(s)."))
@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+from django.utils import timezone
+from corps.models import Corporation
+from documents.integrity import RateLimiter, update_tree, verify_batch
+from documents.models import Document
+
+class Command(BaseCommand):
+    help = ("Revérifie le SHA-256 des fichiers stockés (jamais vérifiés ou vérifiés depuis trop longtemps), "
+            "puis met à jour les racines de Merkle des sociétés")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corp", type=int, nargs="*", help="Limite aux sociétés indiquées")
+        parser.add_argument("--max-age-days", type=int, default=settings.INTEGRITY_MAX_AGE_DAYS)
+        parser.add_argument("--workers", type=int, default=settings.INTEGRITY_WORKERS, help="Lectures simultanées")
+        parser.add_argument("--rate-mb", type=int, default=settings.INTEGRITY_RATE_MB,
+                            help="Débit total lu en Mo/s (0 = illimité)")
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--limit", type=int, help="Nombre maximal de documents par exécution")
+
+    def handle(self, *args, **opts):
+        cutoff = timezone.now() - timedelta(days=opts["max_age_days"])
+        qs = (Document.objects.exclude(file="")
+              .filter(Q(verified_at__isnull=True) | Q(verified_at__lt=cutoff))
+              .only("id", "corp_id", "file", "sha256")
+              .order_by(F("verified_at").asc(nulls_first=True), "id"))
+        if opts["corp"]:
+            qs = qs.filter(corp_id__in=opts["corp"])
+        limiter = RateLimiter(opts["rate_mb"] * 2**20)
+        counts = {state: 0 for state in Document.Integrity.values}
+        failed, corp_ids, done = set(), set(), 0
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=opts["workers"]) as pool:
+            while opts["limit"] is None or done < opts["limit"]:
+                size = opts["batch_size"] if opts["limit"] is None else min(opts["batch_size"], opts["limit"] - done)
+                # Les documents vérifiés sortent de la sélection ; ceux en erreur sont écartés pour cette exécution
+                batch = list(qs.exclude(id__in=failed)[:size])
+                if not batch:
+                    break
+                outcome, errors = verify_batch(batch, pool, limiter)
+                for state, ids in outcome.items():
+                    counts[state] += len(ids)
+                for document, exc in errors:
+                    failed.add(document.id)
+                    self.stderr.write(f"✗ {document.id}  {document.file.name}: {exc}")
+                corp_ids.update(document.corp_id for document in batch)
+                done += len(batch)
+                self.stdout.write(f"… {done} document(s), {done / max(time.monotonic() - started, 1e-6):.0f} doc/s")
+
+        for corp in Corporation.objects.filter(id__in=corp_ids).order_by("id"):
+            tree = update_tree(corp)
+            self.stdout.write(f"{corp.id}  {corp.legal_name}  racine {tree.root or '-'} ({tree.leaf_count} documents)")
+
+        summary = ", ".join(f"{state} : {n}" for state, n in counts.items() if n)
+        bad = counts[Document.Integrity.MISMATCH] + counts[Document.Integrity.MISSING]
+        if bad:
+            raise CommandError(f"Intégrité compromise pour {bad} document(s) ({summary}).")
+        self.stdout.write(self.style.SUCCESS(
+            f"Terminé. {summary or 'rien à vérifier'} ; {len(failed)} en erreur de lecture, "
+            f"en {time.monotonic() - started:.1f} s."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_alter_document_options_alter_document_category_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_blob_alter_document_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='page_count',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'En attente'), ('PROCESSING', 'En traitement'), ('READY', 'Prêt'), ('FAILED', 'Échec')], db_index=True, default='PENDING', max_length=12),
+        ),
+        migrations.CreateModel(
+            name='DocumentStage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30)),
+                ('status', models.CharField(choices=[('RUNNING', 'En cours'), ('DONE', 'Terminée'), ('SKIPPED', 'Sans objet'), ('FAILED', 'Échec')], max_length=10)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stages', to='documents.document')),
+            ],
+            options={
+                'unique_together': {('document', 'name')},
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Configuration de recherche d'après la langue du document (expression immuable : colonne générée)
+TS_CONFIG = ("CASE language WHEN 'en' THEN 'english'::regconfig WHEN 'fr' THEN 'french'::regconfig "
+             "ELSE 'simple'::regconfig END")
+
+POSTGRES_FORWARD = [
+    f"""ALTER TABLE documents_documenttext ADD COLUMN search tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector({TS_CONFIG}, title), 'A') || setweight(to_tsvector({TS_CONFIG}, content), 'B')
+        ) STORED""",
+    "CREATE INDEX documents_documenttext_search ON documents_documenttext USING GIN (search)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS documents_documenttext_search",
+    "ALTER TABLE documents_documenttext DROP COLUMN IF EXISTS search",
+]
+
+# SQLite n'a pas de racinisation française : porter (anglais) + accents ignorés pour toutes les langues
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE documents_documenttext_fts USING fts5(
+            title, content, content='documents_documenttext', content_rowid='document_id',
+            tokenize='porter unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER documents_documenttext_ai AFTER INSERT ON documents_documenttext BEGIN
+            INSERT INTO documents_documenttext_fts(rowid, title, content) VALUES (new.document_id, new.title, new.content);
+        END""",
+    """CREATE TRIGGER documents_documenttext_ad AFTER DELETE ON documents_documenttext BEGIN
+            INSERT INTO documents_documenttext_fts(documents_documenttext_fts, rowid, title, content)
+            VALUES ('delete', old.document_id, old.title, old.content);
+        END""",
+    """CREATE TRIGGER documents_documenttext_au AFTER UPDATE ON documents_documenttext BEGIN
+            INSERT INTO documents_documenttext_fts(documents_documenttext_fts, rowid, title, content)
+            VALUES ('delete', old.document_id, old.title, old.content);
+            INSERT INTO documents_documenttext_fts(rowid, title, content) VALUES (new.document_id, new.title, new.content);
+        END""",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS documents_documenttext_au",
+    "DROP TRIGGER IF EXISTS documents_documenttext_ad",
+    "DROP TRIGGER IF EXISTS documents_documenttext_ai",
+    "DROP TABLE IF EXISTS documents_documenttext_fts",
+]
+
+def _run(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corps', '0007_entity_corporation'),
+        ('documents', '0007_document_status_documentstage'),
+        ('orgs', '0003_alter_organization_options'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text', serialize=False, to='documents.document')),
+                ('language', models.CharField(default='fr', max_length=5)),
+                ('title', models.CharField(max_length=255)),
+                ('content', models.TextField(blank=True)),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+                ('corp', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='corps.corporation')),
+                ('org', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='orgs.organization')),
+            ],
+        ),
+        migrations.RunPython(
+            _run({"postgresql": POSTGRES_FORWARD, "sqlite": SQLITE_FORWARD}),
+            _run({"postgresql": POSTGRES_BACKWARD, "sqlite": SQLITE_BACKWARD}),
+        ),
+    ]
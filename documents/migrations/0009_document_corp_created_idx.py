@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corps', '0007_entity_corporation'),
+        ('documents', '0008_documenttext'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['corp', '-created_at', '-id'], name='documents_corp_created_idx'),
+        ),
+    ]
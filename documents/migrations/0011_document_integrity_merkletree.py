@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corps', '0007_entity_corporation'),
+        ('documents', '0010_uploadsession'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MerkleTree',
+            fields=[
+                ('corp', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='merkle_tree', serialize=False, to='corps.corporation')),
+                ('root', models.CharField(blank=True, max_length=64)),
+                ('leaf_count', models.PositiveIntegerField(default=0)),
+                ('leaves', models.JSONField(default=list)),
+                ('levels', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='integrity',
+            field=models.CharField(choices=[('UNVERIFIED', 'Non vérifié'), ('OK', 'Conforme'), ('MISMATCH', 'Contenu altéré'), ('MISSING', 'Fichier introuvable')], default='UNVERIFIED', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='verified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['verified_at', 'id'], name='documents_verified_idx'),
+        ),
+    ]
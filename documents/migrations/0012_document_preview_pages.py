@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0011_document_integrity_merkletree'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='preview_pages',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
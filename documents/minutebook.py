@@ -0,0 +1,161 @@
+"""Export d'un livre de minutes complet en un seul ZIP diffusé.
+
+Contenu : documents rangés par catégorie, registres (PDF + CSV), `manifest.json` et `SHA256SUMS`
+(empreintes calculées pendant la diffusion), et en option un PDF fusionné du livre.
+Les fichiers sont lus en avance par un petit pool de threads (fenêtre bornée) : S3 est lu en
+parallèle de la compression, sans copie temporaire du livre entier.
+"""
+import hashlib
+import json
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.errors import PdfReadError
+except Exception:  # pragma: no cover
+    PdfReader = PdfWriter = None
+
+from .conversion import cache_name
+from .downloads import download_filename
+from .files import CHUNK_SIZE
+from .models import Document
+
+SPOOL_BYTES = 16 * 1024 * 1024  # au-delà, un fichier lu en avance passe sur disque
+
+REGISTER_FILES = {
+    "securities": "valeurs_mobilieres",
+    "directors": "administrateurs_dirigeants",
+    "cap-table": "cap_table",
+}
+
+def _category_dirs():
+    return {value: f"{i:02d}_{get_valid_filename(label)}"
+            for i, (value, label) in enumerate(Document.Category.choices, start=1)}
+
+def _fetch(document):
+    """Lit le fichier depuis le stockage dans un tampon (mémoire, puis disque au-delà de SPOOL_BYTES)."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    with document.file.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+def _prefetched(documents, workers):
+    """(document, fichier lu) dans l'ordre, au plus `workers` lectures en cours ou en attente."""
+    documents = iter(documents)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque((doc, pool.submit(_fetch, doc)) for doc in islice(documents, workers))
+        while pending:
+            document, future = pending.popleft()
+            for doc in islice(documents, 1):
+                pending.append((doc, pool.submit(_fetch, doc)))
+            yield document, future.result()
+
+def _hashed(chunks, manifest, entry):
+    """Diffuse les morceaux en calculant SHA-256 et taille ; complète l'entrée du manifeste à la fin."""
+    sha256, size = hashlib.sha256(), 0
+    for chunk in chunks:
+        sha256.update(chunk)
+        size += len(chunk)
+        yield chunk
+    entry.update(sha256=sha256.hexdigest(), size=size)
+    if entry.get("expected_sha256") == entry["sha256"]:
+        del entry["expected_sha256"]  # conforme à l'empreinte enregistrée
+    manifest["entries"].append(entry)
+
+def _read_chunks(fileobj):
+    yield from iter(lambda: fileobj.read(CHUNK_SIZE), b"")
+
+def _file_chunks(fileobj):
+    with fileobj:
+        yield from _read_chunks(fileobj)
+
+def _register_entries(corp, manifest, register_pdfs):
+    from registers.exports import REGISTERS, iter_csv, write_pdf
+    for register, basename in REGISTER_FILES.items():
+        header, rows = REGISTERS[register](corp)
+        pdf = write_pdf(f"{corp.legal_name} — {register}", header, rows)
+        register_pdfs.append(pdf)
+        path = f"registres/{basename}.pdf"
+        yield path, _hashed(_read_chunks(pdf), manifest, {"path": path, "register": register})
+        header, rows = REGISTERS[register](corp)  # nouveau curseur : les lignes sont produites une seule fois
+        path = f"registres/{basename}.csv"
+        csv_chunks = (line.encode("utf-8") for line in iter_csv(header, rows))
+        yield path, _hashed(csv_chunks, manifest, {"path": path, "register": register})
+
+def _merged_pdf(documents, register_pdfs, skipped):
+    """PDF unique : documents PDF (ou leur PDF/A déjà en cache) puis registres ; PDF illisibles dans `skipped`."""
+    writer = PdfWriter()
+    storage = storages["default"]
+    for document in documents:
+        if document.content_type == "application/pdf":
+            source = document.file.open("rb")
+        elif document.sha256 and storage.exists(cache_name(document.sha256)):
+            source = storage.open(cache_name(document.sha256), "rb")
+        else:
+            continue
+        with source:
+            try:
+                writer.append(PdfReader(source), outline_item=document.title)
+            except PdfReadError:
+                skipped.append(document.id)
+    for pdf in register_pdfs:
+        pdf.seek(0)
+        writer.append(PdfReader(pdf))
+    out = tempfile.TemporaryFile()
+    writer.write(out)
+    out.seek(0)
+    return _file_chunks(out)
+
+def _manifest_chunks(manifest):
+    yield json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+
+def _sums_chunks(manifest):
+    yield "".join(f"{e['sha256']}  {e['path']}\n" for e in manifest["entries"]).encode("utf-8")
+
+def iter_minute_book(corp, merged=False):
+    """Entrées (chemin, morceaux) du ZIP d'un livre de minutes, à passer à `zipstream.iter_zip`."""
+    if merged and PdfWriter is None:
+        raise RuntimeError("pypdf est requis pour le PDF fusionné.")
+    manifest = {
+        "corporation": {"id": corp.id, "legal_name": corp.legal_name, "jurisdiction": corp.jurisdiction,
+                        "incorporation_number": corp.incorporation_number},
+        "generated_at": timezone.now().isoformat(),
+        "entries": [],
+    }
+    dirs = _category_dirs()
+    # Sections d'un scan découpé : leurs pages figurent déjà dans le document parent
+    documents = (Document.objects.filter(corp=corp, parent__isnull=True).exclude(file="")
+                 .order_by("category", "created_at", "id"))
+    register_pdfs = []
+
+    def entries():
+        for document, fileobj in _prefetched(documents.iterator(chunk_size=200), settings.MINUTEBOOK_PREFETCH):
+            name = download_filename(document.title, document.file.name, document.content_type)
+            path = f"{dirs.get(document.category, '99_Autre')}/{document.id:06d}_{get_valid_filename(name)}"
+            entry = {"path": path, "document": document.id, "category": document.category, "title": document.title,
+                     "created_at": document.created_at.isoformat(), "expected_sha256": document.sha256}
+            yield path, _hashed(_file_chunks(fileobj), manifest, entry)
+        yield from _register_entries(corp, manifest, register_pdfs)
+        try:
+            if merged:
+                # pypdf doit tenir tout l'arbre du PDF fusionné : seul élément écrit sur disque avant diffusion
+                yield "livre_complet.pdf", _hashed(_merged_pdf(documents.iterator(chunk_size=200), register_pdfs,
+                                                               manifest.setdefault("merge_skipped", [])),
+                                                   manifest, {"path": "livre_complet.pdf"})
+        finally:
+            for pdf in register_pdfs:
+                pdf.close()
+        yield "manifest.json", _manifest_chunks(manifest)
+        yield "SHA256SUMS", _sums_chunks(manifest)
+
+    return entries()
@@ -1,15 +1,68 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
+from django.utils import timezone
 from corps.models import Corporation
-import hashlib
-import mimetypes
+from orgs.models import Organization
+from .files import fieldfile_digest
+from .storage import get_cas_storage
+
+class Blob(models.Model):
+    """Contenu stocké une seule fois (clé = SHA-256), référencé par documents et pièces jointes.
+
+    Les octets d'un blob non référencé ne sont supprimés qu'après un délai de grâce
+    (commande `purge_blobs`), pour ne pas courir après un upload concurrent du même contenu.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255)  # clé dans le stockage (cas/ab/cd/<sha256>)
+    size = models.PositiveBigIntegerField(default=0)
+    content_type = models.CharField(max_length=120, blank=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    @classmethod
+    def acquire(cls, sha256, name, size=0, content_type=""):
+        with transaction.atomic():
+            cls.objects.get_or_create(sha256=sha256, defaults={"name": name, "size": size, "content_type": content_type})
+            cls.objects.filter(sha256=sha256).update(ref_count=F("ref_count") + 1, released_at=None)
+
+    @classmethod
+    def reserve(cls, sha256):
+        """Vrai si ce contenu est déjà stocké ; un blob sans référence voit son délai de grâce repartir.
+
+        Constat fait sous verrou de ligne : `purge_blobs`, qui revérifie sous le même verrou, ne peut
+        plus supprimer les octets avant que l'objet enregistré ensuite n'en prenne la référence.
+        """
+        with transaction.atomic():
+            blob = cls.objects.select_for_update().filter(sha256=sha256).first()
+            if blob is None:
+                return False
+            if blob.ref_count == 0:
+                blob.released_at = timezone.now()
+                blob.save(update_fields=["released_at"])
+            return True
+
+    @classmethod
+    def release(cls, sha256):
+        cls.objects.filter(sha256=sha256, ref_count__gt=0).update(ref_count=F("ref_count") - 1, released_at=timezone.now())
 
-try:
-    import magic  # python-magic (libmagic)
-except Exception:  # pragma: no cover
-    magic = None
 
 class Document(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "En attente"
+        PROCESSING = "PROCESSING", "En traitement"
+        READY = "READY", "Prêt"
+        FAILED = "FAILED", "Échec"
+
+    class Integrity(models.TextChoices):
+        UNVERIFIED = "UNVERIFIED", "Non vérifié"
+        OK = "OK", "Conforme"
+        MISMATCH = "MISMATCH", "Contenu altéré"
+        MISSING = "MISSING", "Fichier introuvable"
+
     class Category(models.TextChoices):
         ARTICLES = "ARTICLES", "Statuts/Articles"
         BYLAWS = "BYLAWS", "Règlement intérieur"
@@ -21,53 +74,140 @@ class Document(models.Model):
     corp = models.ForeignKey(Corporation, on_delete=models.CASCADE, related_name="documents")
     category = models.CharField(max_length=20, choices=Category.choices)
     title = models.CharField(max_length=255)
-    file = models.FileField(upload_to="docs/%Y/%m/%d/")
+    file = models.FileField(upload_to="docs/%Y/%m/%d/", storage=get_cas_storage)
     language = models.CharField(max_length=5, default="fr")
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
     sha256 = models.CharField(max_length=64, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     content_type = models.CharField(max_length=120, blank=True)  # ← AJOUT
+    size = models.PositiveBigIntegerField(default=0)
+    # Pipeline d'ingestion (documents.pipeline)
+    status = models.CharField(max_length=12, choices=Status.choices, default=Status.PENDING, db_index=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    preview_pages = models.PositiveSmallIntegerField(null=True, blank=True)  # pages de la bande d'aperçu
+    # Revérification périodique des octets stockés (documents.integrity)
+    integrity = models.CharField(max_length=10, choices=Integrity.choices, default=Integrity.UNVERIFIED)
+    verified_at = models.DateTimeField(null=True, blank=True)
+    # Section d'un PDF numérisé découpé (documents.splitting) : pages du parent, 1re et dernière incluses
+    parent = models.ForeignKey("self", on_delete=models.CASCADE, null=True, blank=True, related_name="sections")
+    page_start = models.PositiveIntegerField(null=True, blank=True)
+    page_end = models.PositiveIntegerField(null=True, blank=True)
 
-    def _compute_sha256(self):
-        if not self.file:
-            return ""
-        pos = self.file.tell() if hasattr(self.file, "tell") else 0
-        try:
-            if hasattr(self.file, "seek"):
-                self.file.seek(0)
-            h = hashlib.sha256()
-            for chunk in iter(lambda: self.file.read(8192), b""):
-                h.update(chunk)
-            return h.hexdigest()
-        finally:
-            if hasattr(self.file, "seek"):
-                self.file.seek(pos)
-
-    def _sniff_content_type(self):
-        if not self.file:
-            return ""
-        # 1) libmagic (meilleur)
-        if magic:
-            pos = self.file.tell() if hasattr(self.file, "tell") else 0
-            try:
-                if hasattr(self.file, "seek"):
-                    self.file.seek(0)
-                m = magic.Magic(mime=True)
-                ctype = m.from_buffer(self.file.read(8192))
-                if ctype:
-                    return ctype
-            except Exception:
-                pass
-            finally:
-                if hasattr(self.file, "seek"):
-                    self.file.seek(pos)
-        # 2) mimetypes (fallback)
-        ctype, _ = mimetypes.guess_type(self.file.name)
-        return ctype or "application/octet-stream"
+    class Meta:
+        indexes = [
+            # Listes paginées par (created_at, id) décroissants, par société
+            models.Index(fields=["corp", "-created_at", "-id"], name="documents_corp_created_idx"),
+            # Sélection des documents à revérifier (jamais vérifiés ou vérification la plus ancienne)
+            models.Index(fields=["verified_at", "id"], name="documents_verified_idx"),
+        ]
+
+    def _fill_file_meta(self):
+        sha256, ctype, size = fieldfile_digest(self.file)
+        self.sha256 = self.sha256 or sha256
+        self.content_type = self.content_type or ctype
+        self.size = self.size or size
 
     def save(self, *args, **kwargs):
-        # Calcule/complete si manquant (ou si file changé)
-        if self.file and (not self.sha256 or not self.content_type):
-            self.sha256 = self._compute_sha256() or self.sha256
-            self.content_type = self._sniff_content_type() or self.content_type
+        # Fichier remplacé (PATCH, admin) : empreinte, type et taille du nouveau contenu
+        if self.pk and self.file and not self.file._committed:
+            self.sha256, self.content_type, self.size = "", "", 0
+            self.integrity, self.verified_at = self.Integrity.UNVERIFIED, None
+        # Calcule/complete si manquant
+        if self.file and (not self.sha256 or not self.content_type or not self.size):
+            self._fill_file_meta()
         super().save(*args, **kwargs)
+
+
+class DocumentStage(models.Model):
+    """Exécution d'une étape du pipeline pour un document (une ligne par étape)."""
+    class Status(models.TextChoices):
+        RUNNING = "RUNNING", "En cours"
+        DONE = "DONE", "Terminée"
+        SKIPPED = "SKIPPED", "Sans objet"
+        FAILED = "FAILED", "Échec"
+
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="stages")
+    name = models.CharField(max_length=30)
+    status = models.CharField(max_length=10, choices=Status.choices)
+    sha256 = models.CharField(max_length=64, blank=True)  # contenu sur lequel l'étape a tourné
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("document", "name")]
+
+
+class DocumentPage(models.Model):
+    """Index des pages d'un PDF découpé : en-tête détecté, début de texte et section de rattachement."""
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="pages")
+    number = models.PositiveIntegerField()  # à partir de 1
+    heading = models.CharField(max_length=255, blank=True)
+    excerpt = models.TextField(blank=True)
+    section = models.ForeignKey(Document, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    class Meta:
+        unique_together = [("document", "number")]
+        ordering = ["number"]
+
+
+class DocumentText(models.Model):
+    """Texte extrait d'un document, indexé en plein texte.
+
+    PostgreSQL : colonne générée `search` (tsvector, configuration d'après `language`) + index GIN.
+    SQLite : table FTS5 `documents_documenttext_fts` tenue à jour par triggers. Voir migration 0008.
+    """
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, primary_key=True, related_name="text")
+    org = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name="+")  # filtrage par cabinet
+    corp = models.ForeignKey(Corporation, on_delete=models.CASCADE, related_name="+")
+    language = models.CharField(max_length=5, default="fr")
+    title = models.CharField(max_length=255)
+    content = models.TextField(blank=True)
+    extracted_at = models.DateTimeField(auto_now=True)
+
+
+class MerkleTree(models.Model):
+    """Arbre de Merkle des documents d'une société : une racine atteste l'ensemble du livre (documents.integrity)."""
+    corp = models.OneToOneField(Corporation, on_delete=models.CASCADE, primary_key=True, related_name="merkle_tree")
+    root = models.CharField(max_length=64, blank=True)
+    leaf_count = models.PositiveIntegerField(default=0)
+    leaves = models.JSONField(default=list)  # [[document_id, sha256], …] par id croissant
+    levels = models.JSONField(default=list)  # empreintes par niveau : feuilles d'abord, [racine] en dernier
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class UploadSession(models.Model):
+    """Upload reprenable (style tus) : morceaux successifs jusqu'à `length` octets (documents.resumable)."""
+    class Target(models.TextChoices):
+        DOCUMENT = "DOCUMENT", "Document"
+        ATTACHMENT = "ATTACHMENT", "Pièce jointe de ticket"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    target = models.CharField(max_length=10, choices=Target.choices)
+    metadata = models.JSONField(default=dict)  # champs du document / ticket visé, validés à la création
+    filename = models.CharField(max_length=255)
+    length = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    content_type = models.CharField(max_length=120, blank=True)  # reconnu sur le premier morceau
+    staging_name = models.CharField(max_length=255)  # fichier local ou clé S3 en cours d'assemblage
+    multipart_id = models.CharField(max_length=255, blank=True)  # UploadId S3
+    sha256 = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    document = models.ForeignKey(Document, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    attachment = models.ForeignKey("tickets.TicketAttachment", null=True, blank=True, on_delete=models.SET_NULL,
+                                   related_name="+")
+
+
+class UploadPart(models.Model):
+    """Morceau reçu : empreinte propre (vérifiée si le client l'envoie) et ETag S3."""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name="parts")
+    number = models.PositiveIntegerField()
+    offset = models.PositiveBigIntegerField()
+    size = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    etag = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        unique_together = [("session", "number")]
@@ -0,0 +1,50 @@
+"""Pagination par curseur (keyset) sur (created_at, id) décroissants : coût constant par page."""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def _decode(self, cursor):
+        try:
+            created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+            return datetime.fromisoformat(created_at), int(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound("Curseur invalide.")
+
+    def _encode(self, obj):
+        return base64.urlsafe_b64encode(f"{obj.created_at.isoformat()}|{obj.pk}".encode()).decode()
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        queryset = queryset.order_by("-created_at", "-pk")
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self._decode(cursor)
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+        page = list(queryset[:size + 1])
+        self.next_cursor = self._encode(page[size - 1]) if len(page) > size else None
+        return page[:size]
+
+    def get_paginated_response(self, data):
+        next_url = None
+        if self.next_cursor:
+            next_url = replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+        return Response({"next": next_url, "results": data})
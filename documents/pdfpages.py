@@ -0,0 +1,36 @@
+"""Travail par tranches de pages d'un PDF, exécuté dans les processus du pool de découpage.
+
+Module sans dépendance Django : importable tel quel par un processus « spawn ».
+"""
+from pypdf import PdfReader, PdfWriter
+
+HEADING_LINES = 3
+EXCERPT_CHARS = 500
+
+def heading(text):
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return " ".join(lines[:HEADING_LINES])[:255]
+
+def index_range(path, start, stop):
+    """(numéro, en-tête, texte) des pages [start, stop), numérotées à partir de 1."""
+    reader = PdfReader(path)
+    pages = []
+    for n in range(start, stop):
+        text = reader.pages[n].extract_text() or ""
+        pages.append((n + 1, heading(text), text.replace("\x00", "")))
+    return pages
+
+def write_range(path, first, last, target):
+    """Écrit dans `target` le PDF des pages first..last (numéros inclusifs) ; retourne `target`."""
+    return write_ranges([(path, first, last)], target)
+
+def write_ranges(ranges, target):
+    """PDF des pages de plusieurs fichiers [(chemin, première, dernière)], dans l'ordre ; retourne `target`."""
+    writer = PdfWriter()
+    for path, first, last in ranges:
+        reader = PdfReader(path)
+        for n in range(first - 1, last):
+            writer.add_page(reader.pages[n])
+    with open(target, "wb") as out:
+        writer.write(out)
+    return target
@@ -0,0 +1,153 @@
+"""Pipeline d'ingestion : étapes indépendantes et idempotentes, exécutées en parallèle par Celery.
+
+Une étape est une fonction `(document) -> dict | None` enregistrée avec `@stage` ; le dict
+retourné est écrit sur le document par UPDATE, sans toucher aux champs des autres étapes.
+Sans Celery, ou avec CELERY_TASK_ALWAYS_EAGER, tout s'exécute dans le processus appelant.
+"""
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    from pypdf import PdfReader
+except Exception:  # pragma: no cover
+    PdfReader = None
+
+from minutebooks import celery_app
+from . import conversion, previews, splitting
+from .extraction import extract_text
+from .models import Document, DocumentStage
+from .search import save_text
+
+logger = logging.getLogger(__name__)
+
+STAGES = {}
+
+class Skip(Exception):
+    """Étape sans objet pour ce document."""
+
+class Deferred(Exception):
+    """Étape poursuivie par des sous-tâches : elle reste RUNNING jusqu'à `complete_stage`."""
+
+def stage(name):
+    def register(func):
+        STAGES[name] = func
+        return func
+    return register
+
+@stage("pages")
+def count_pages(doc):
+    if doc.content_type != "application/pdf" or PdfReader is None:
+        raise Skip
+    with doc.file.open("rb") as fh:
+        return {"page_count": len(PdfReader(fh).pages)}
+
+@stage("pdfa")
+def convert_pdfa(doc):
+    # Réchauffe le cache PDF/A (clé = SHA-256 de la source) ; rien à écrire sur le document
+    suffix = conversion.SUFFIXES.get(doc.content_type)
+    if suffix is None or not conversion.available():
+        raise Skip
+    with doc.file.open("rb") as fh:
+        conversion.convert_to_pdfa(fh.read(), doc.sha256, suffix)
+
+@stage("preview")
+def render_preview(doc):
+    pages = previews.render_previews(doc)
+    if pages is None:
+        raise Skip
+    return {"preview_pages": pages}
+
+@stage("split")
+def split_sections(doc):
+    if not splitting.splittable(doc):
+        raise Skip
+    if splitting.in_worker():  # sous-tâches enchaînées par callbacks, conclusion par complete_stage
+        from .tasks import start_split
+        if not start_split(doc):
+            raise Skip
+        raise Deferred
+    result = splitting.split_document(doc)
+    if result is None:
+        raise Skip
+    return {"page_count": result[0]}
+
+@stage("text")
+def index_text(doc):
+    if splitting.splittable(doc):
+        raise Skip  # texte indexé par l'étape split, depuis l'index des pages : PDF lu une seule fois
+    with doc.file.open("rb") as fh:
+        text = extract_text(fh, doc.content_type)
+    if text is None:
+        raise Skip
+    save_text(doc, text)
+
+def _mark(stage_id, **fields):
+    DocumentStage.objects.filter(pk=stage_id).update(updated_at=timezone.now(), **fields)
+
+def run_stage(document_id, name):
+    """Exécute une étape ; sans effet si elle a déjà abouti sur le même contenu."""
+    doc = Document.objects.filter(pk=document_id).first()
+    if doc is None:
+        return None  # supprimé entre-temps
+    record, _ = DocumentStage.objects.get_or_create(
+        document=doc, name=name, defaults={"status": DocumentStage.Status.RUNNING})
+    if record.status in (DocumentStage.Status.DONE, DocumentStage.Status.SKIPPED) and record.sha256 == doc.sha256:
+        return record.status
+    record.attempts += 1
+    _mark(record.pk, status=DocumentStage.Status.RUNNING, sha256=doc.sha256, attempts=record.attempts, error="")
+    try:
+        fields = STAGES[name](doc)
+        status = DocumentStage.Status.DONE
+    except Skip:
+        fields, status = None, DocumentStage.Status.SKIPPED
+    except Deferred:
+        return DocumentStage.Status.RUNNING
+    except Exception as exc:
+        _mark(record.pk, status=DocumentStage.Status.FAILED, error=f"{type(exc).__name__}: {exc}")
+        raise
+    if fields:
+        Document.objects.filter(pk=doc.pk).update(**fields)
+    _mark(record.pk, status=status)
+    return status
+
+def complete_stage(document_id, name, status, error="", **fields):
+    """Conclut une étape poursuivie par des sous-tâches, puis le document si c'était la dernière."""
+    if fields:
+        Document.objects.filter(pk=document_id).update(**fields)
+    DocumentStage.objects.filter(document_id=document_id, name=name).update(
+        status=status, error=error, updated_at=timezone.now())
+    finish(document_id)
+
+def finish(document_id):
+    """Statut final du document d'après ses étapes ; rien tant qu'une étape est poursuivie ailleurs."""
+    stages = DocumentStage.objects.filter(document_id=document_id)
+    if stages.filter(status=DocumentStage.Status.RUNNING).exists():
+        return  # la dernière étape à conclure rappellera finish
+    failed = stages.filter(status=DocumentStage.Status.FAILED).exists()
+    Document.objects.filter(pk=document_id).update(
+        status=Document.Status.FAILED if failed else Document.Status.READY)
+
+def process(document_id):
+    """Exécution locale, étape par étape (mode eager / sans Celery)."""
+    for name in STAGES:
+        try:
+            run_stage(document_id, name)
+        except Exception:
+            logger.exception("Étape %s en échec pour le document %s", name, document_id)
+    finish(document_id)
+
+def enqueue(document_id):
+    """Lance le pipeline d'un document : une tâche par étape, puis la conclusion."""
+    Document.objects.filter(pk=document_id).update(status=Document.Status.PROCESSING)
+    if celery_app is None or settings.CELERY_TASK_ALWAYS_EAGER:
+        process(document_id)
+        return
+    from .tasks import dispatch
+    try:
+        dispatch(document_id)
+    except Exception:
+        # Broker indisponible : le document reste en attente, repris par `process_documents`
+        logger.exception("Pipeline non lancé pour le document %s", document_id)
+        Document.objects.filter(pk=document_id).update(status=Document.Status.PENDING)
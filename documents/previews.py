@@ -0,0 +1,106 @@
+"""Aperçus des documents : vignette de la première page et bande des premières pages en basse résolution.
+
+Rendus une fois par contenu (clé = SHA-256 : les documents identiques partagent leurs aperçus) :
+PDF par pypdfium2, DOCX/ODT par leur PDF/A (cache de conversion), images par Pillow.
+Quelques Ko en WebP, servis avec un cache navigateur long (le contenu d'une clé ne change jamais).
+"""
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+
+try:
+    import pypdfium2 as pdfium
+except Exception:  # pragma: no cover
+    pdfium = None
+
+try:
+    from PIL import Image, ImageSequence
+except Exception:  # pragma: no cover
+    Image = None
+
+from . import conversion
+
+PREFIX = "previews/"
+KINDS = ("thumb", "strip")
+THUMB_WIDTH = 320
+TILE = (120, 160)  # case d'une page dans la bande ; page i à l'abscisse i × 120
+STRIP_PAGES = 12
+QUALITY = 70
+
+def preview_name(sha256, kind):
+    return f"{PREFIX}{sha256[:2]}/{sha256}/{kind}.webp"
+
+def _pdf_pages(source, count):
+    """Premières pages d'un PDF (octets ou fichier ouvert), rendues à THUMB_WIDTH de large."""
+    pdf = pdfium.PdfDocument(source)
+    try:
+        images = []
+        for i in range(min(count, len(pdf))):
+            page = pdf[i]
+            images.append(page.render(scale=THUMB_WIDTH / page.get_width()).to_pil())
+            page.close()
+        return images
+    finally:
+        pdf.close()
+
+def _image_pages(fh, count):
+    # TIFF multipage (numérisations) : une image par page
+    with Image.open(fh) as image:
+        return [frame.convert("RGB") for _, frame in zip(range(count), ImageSequence.Iterator(image))]
+
+def _pages(document):
+    """Images des premières pages, ou None si le type n'est pas pris en charge."""
+    content_type = document.content_type
+    if content_type == "application/pdf" and pdfium is not None:
+        with document.file.open("rb") as fh:
+            return _pdf_pages(fh, STRIP_PAGES)
+    if content_type in conversion.SUFFIXES and pdfium is not None and conversion.available():
+        with document.file.open("rb") as fh:
+            _, pdf = conversion.convert_to_pdfa(fh.read(), document.sha256, conversion.SUFFIXES[content_type])
+        return _pdf_pages(pdf, STRIP_PAGES)
+    if content_type.startswith("image/"):
+        with document.file.open("rb") as fh:
+            return _image_pages(fh, STRIP_PAGES)
+    return None
+
+def _strip(images):
+    strip = Image.new("RGB", (TILE[0] * len(images), TILE[1]), "white")
+    for i, image in enumerate(images):
+        tile = image.convert("RGB")
+        tile.thumbnail(TILE)
+        strip.paste(tile, (i * TILE[0] + (TILE[0] - tile.width) // 2, (TILE[1] - tile.height) // 2))
+    return strip
+
+def _webp(image):
+    out = io.BytesIO()
+    image.save(out, "WEBP", quality=QUALITY, method=4)
+    return out.getvalue()
+
+def render_previews(document):
+    """Rend et stocke vignette et bande si besoin ; retourne le nombre de pages de la bande (None : non pris en charge)."""
+    if Image is None or not document.sha256:
+        return None
+    storage = storages["default"]
+    names = {kind: preview_name(document.sha256, kind) for kind in KINDS}
+    if all(storage.exists(name) for name in names.values()):
+        with storage.open(names["strip"], "rb") as fh, Image.open(fh) as strip:
+            return strip.width // TILE[0]  # déjà rendus pour ce contenu
+    images = _pages(document)
+    if not images:
+        return None
+    thumb = images[0].convert("RGB")
+    thumb.thumbnail((THUMB_WIDTH, THUMB_WIDTH * 2))
+    for kind, image in (("thumb", thumb), ("strip", _strip(images))):
+        if not storage.exists(names[kind]):
+            storage.save(names[kind], ContentFile(_webp(image)))
+    return len(images)
+
+def read_preview(sha256, kind):
+    """Octets d'un aperçu stocké ; FileNotFoundError s'il n'a pas (encore) été rendu."""
+    storage = storages["default"]
+    name = preview_name(sha256, kind)
+    if not storage.exists(name):
+        raise FileNotFoundError(name)
+    with storage.open(name, "rb") as fh:
+        return fh.read()
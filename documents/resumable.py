@@ -0,0 +1,273 @@
+"""Uploads reprenables (style tus) pour les gros documents numérisés et les pièces jointes.
+
+Le client crée une session (longueur totale), puis envoie des morceaux à l'offset courant ;
+après une coupure, il relit l'offset acquitté et reprend. Chaque morceau est haché à la
+réception (empreinte propre, vérifiée contre `Upload-Checksum`) et ajouté au fichier en cours :
+- disque local : écriture à l'offset dans MEDIA_ROOT/uploads/ ;
+- S3/MinIO : une part d'upload multipart par morceau (≥ 5 Mo sauf le dernier).
+À la fin, le contenu rejoint le stockage adressé par contenu (déplacement ou copie côté serveur).
+
+Le SHA-256 global est calculé au fil des morceaux tant qu'ils arrivent au même processus ;
+sinon (reprise ailleurs, redémarrage) il est recalculé une fois le fichier assemblé.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db import transaction
+from django.utils import timezone
+
+from .files import CHUNK_SIZE, SNIFF_BYTES, file_digest, sniff_content_type
+from .models import Blob, Document, UploadPart, UploadSession
+from .storage import blob_name
+
+S3_MIN_PART = 5 * 1024 * 1024
+STAGING_PREFIX = "uploads/"
+
+class UploadError(Exception):
+    status = 400
+
+class OffsetMismatch(UploadError):
+    status = 409
+
+class ChecksumMismatch(UploadError):
+    status = 460  # code tus « Checksum Mismatch »
+
+class TooLarge(UploadError):
+    status = 413
+
+# SHA-256 en cours par session : {id: (offset atteint, hasher)} ; borné, perdu au redémarrage
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+MAX_HASHERS = 256
+
+def _take_hasher(session):
+    with _hashers_lock:
+        offset, hasher = _hashers.pop(session.id, (None, None))
+    if session.offset == 0:
+        return hashlib.sha256()
+    return hasher if offset == session.offset else None
+
+def _keep_hasher(session, hasher):
+    with _hashers_lock:
+        _hashers[session.id] = (session.offset, hasher)
+        while len(_hashers) > MAX_HASHERS:
+            _hashers.popitem(last=False)
+
+class LocalAssembler:
+    """Fichier local complété à l'offset, puis déplacé dans le stockage adressé par contenu."""
+    min_part = 0
+
+    def __init__(self):
+        self.storage = storages["default"]
+
+    def start(self, session):
+        path = self.storage.path(session.staging_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+
+    def write(self, session, number, chunk):
+        with open(self.storage.path(session.staging_name), "r+b") as out:
+            out.seek(session.offset)
+            for data in iter(lambda: chunk.read(CHUNK_SIZE), b""):
+                out.write(data)
+            out.truncate()  # morceau précédent rejoué après coupure : rien au-delà
+        return ""
+
+    def digest(self, session):
+        with open(self.storage.path(session.staging_name), "rb") as fh:
+            return file_digest(fh).sha256
+
+    def complete(self, session, key):
+        staging = self.storage.path(session.staging_name)
+        if self.storage.exists(key):
+            if os.path.exists(staging):
+                os.remove(staging)  # contenu déjà stocké (ou déplacé par une tentative précédente)
+        else:
+            dest = self.storage.path(key)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(staging, dest)
+
+    def abort(self, session):
+        if self.storage.exists(session.staging_name):
+            self.storage.delete(session.staging_name)
+
+class S3Assembler:
+    """Upload multipart S3/MinIO : une part par morceau, copie côté serveur vers la clé finale."""
+    min_part = S3_MIN_PART
+
+    def __init__(self):
+        self.storage = storages["default"]
+        self.client = self.storage.connection.meta.client
+        self.bucket = self.storage.bucket_name
+
+    def _key(self, name):
+        return self.storage._normalize_name(name)
+
+    def start(self, session):
+        created = self.client.create_multipart_upload(Bucket=self.bucket, Key=self._key(session.staging_name))
+        session.multipart_id = created["UploadId"]
+
+    def write(self, session, number, chunk):
+        part = self.client.upload_part(Bucket=self.bucket, Key=self._key(session.staging_name),
+                                       UploadId=session.multipart_id, PartNumber=number, Body=chunk)
+        return part["ETag"]
+
+    def _finish_multipart(self, session):
+        if session.multipart_id:
+            parts = [{"PartNumber": p.number, "ETag": p.etag} for p in session.parts.order_by("number")]
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=self._key(session.staging_name), UploadId=session.multipart_id,
+                MultipartUpload={"Parts": parts})
+            session.multipart_id = ""
+            session.save(update_fields=["multipart_id"])
+
+    def digest(self, session):
+        self._finish_multipart(session)
+        with self.storage.open(session.staging_name, "rb") as fh:
+            return file_digest(fh).sha256
+
+    def complete(self, session, key):
+        self._finish_multipart(session)
+        if not self.storage.exists(key):
+            self.client.copy_object(Bucket=self.bucket, Key=self._key(key),
+                                    CopySource={"Bucket": self.bucket, "Key": self._key(session.staging_name)})
+        self.storage.delete(session.staging_name)
+
+    def abort(self, session):
+        if session.multipart_id:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self._key(session.staging_name),
+                                               UploadId=session.multipart_id)
+        elif self.storage.exists(session.staging_name):
+            self.storage.delete(session.staging_name)
+
+def get_assembler():
+    return S3Assembler() if settings.USE_S3 else LocalAssembler()
+
+def create_session(user, target, filename, length, metadata):
+    if length > settings.UPLOAD_MAX_LENGTH:
+        raise TooLarge(f"Fichier trop volumineux (> {settings.UPLOAD_MAX_LENGTH} octets).")
+    session = UploadSession(created_by=user, target=target, filename=filename, length=length, metadata=metadata)
+    session.staging_name = f"{STAGING_PREFIX}{session.id}"
+    get_assembler().start(session)
+    session.save()
+    return session
+
+def _spool(stream, expected):
+    """Copie le corps de la requête (au plus `expected` octets) en le hachant."""
+    spooled = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    sha256, size, head = hashlib.sha256(), 0, b""
+    while size < expected:
+        data = stream.read(min(CHUNK_SIZE, expected - size))
+        if not data:
+            break
+        sha256.update(data)
+        spooled.write(data)
+        if len(head) < SNIFF_BYTES:
+            head += data[:SNIFF_BYTES - len(head)]
+        size += len(data)
+    spooled.seek(0)
+    return spooled, sha256, size, head
+
+def receive_chunk(session, offset, stream, content_length, checksum=""):
+    """Ajoute un morceau commençant à `offset` ; retourne la session à jour (terminée si complète)."""
+    if session.completed_at:
+        raise OffsetMismatch("Upload déjà terminé.")
+    if session.offset == session.length:
+        return finalize(session)  # finalisation précédente interrompue : reprise sans nouveau morceau
+    if content_length > settings.UPLOAD_CHUNK_MAX:
+        raise TooLarge(f"Morceau trop volumineux (> {settings.UPLOAD_CHUNK_MAX} octets).")
+    if offset != session.offset:
+        raise OffsetMismatch(f"Offset attendu : {session.offset}.")
+    if offset + content_length > session.length:
+        raise UploadError("Le morceau dépasse la longueur déclarée.")
+
+    chunk, chunk_sha, size, head = _spool(stream, content_length)
+    with chunk:
+        if size != content_length:
+            raise UploadError("Morceau incomplet.")  # connexion coupée : le client reprendra à l'offset
+        if checksum:
+            algorithm, _, value = checksum.partition(" ")
+            if algorithm.lower() != "sha256":
+                raise UploadError("Seul sha256 est accepté dans Upload-Checksum.")
+            try:
+                expected = base64.b64decode(value, validate=True)
+            except (binascii.Error, ValueError):
+                raise UploadError("Upload-Checksum invalide : empreinte base64 attendue.")
+            if expected != chunk_sha.digest():
+                raise ChecksumMismatch("Empreinte du morceau invalide.")
+        assembler = get_assembler()
+        if size < assembler.min_part and offset + size < session.length:
+            raise UploadError(f"Morceau trop petit (≥ {assembler.min_part} octets sauf le dernier).")
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session.pk)
+            if offset != session.offset:  # requête concurrente sur la même session
+                raise OffsetMismatch(f"Offset attendu : {session.offset}.")
+            hasher = _take_hasher(session)
+            number = session.parts.count() + 1
+            etag = assembler.write(session, number, chunk)
+            UploadPart.objects.create(session=session, number=number, offset=offset, size=size,
+                                      sha256=chunk_sha.hexdigest(), etag=etag)
+            if offset == 0:
+                session.content_type = sniff_content_type(head, session.filename)
+            session.offset += size
+            session.save(update_fields=["offset", "content_type"])
+            if hasher is not None:
+                chunk.seek(0)
+                for data in iter(lambda: chunk.read(CHUNK_SIZE), b""):
+                    hasher.update(data)
+                _keep_hasher(session, hasher)
+
+    if session.offset == session.length:
+        finalize(session)
+    return session
+
+def finalize(session):
+    """Place le contenu assemblé dans le stockage adressé par contenu et crée l'objet visé.
+
+    Rejouable : après un échec, la requête suivante sur la session reprend à l'étape interrompue.
+    """
+    assembler = get_assembler()
+    with _hashers_lock:
+        _, hasher = _hashers.pop(session.id, (None, None))
+    if not session.sha256:
+        # Enregistrée avant de déplacer le fichier assemblé : une reprise n'a plus à le relire
+        session.sha256 = hasher.hexdigest() if hasher is not None else assembler.digest(session)
+        session.save(update_fields=["sha256"])
+    key = blob_name(session.sha256)
+    if not Blob.reserve(session.sha256):
+        assembler.complete(session, key)
+    else:
+        assembler.abort(session)  # doublon : rien à conserver
+
+    meta, fields = session.metadata, dict(file=key, sha256=session.sha256, content_type=session.content_type,
+                                         size=session.length)
+    with transaction.atomic():
+        if UploadSession.objects.select_for_update().get(pk=session.pk).completed_at:
+            session.refresh_from_db()
+            return session  # finalisée entre-temps par une requête concurrente
+        if session.target == UploadSession.Target.DOCUMENT:
+            session.document = Document.objects.create(
+                corp_id=meta["corp"], category=meta["category"], title=meta.get("title") or session.filename,
+                language=meta.get("language", "fr"), uploaded_by=session.created_by, **fields)
+        else:
+            from tickets.models import TicketAttachment
+            session.attachment = TicketAttachment.objects.create(
+                ticket_id=meta["ticket"], original_name=session.filename, uploaded_by=session.created_by, **fields)
+        session.completed_at = timezone.now()
+        session.save(update_fields=["completed_at", "document", "attachment"])
+    return session
+
+def abort(session):
+    if not session.completed_at:
+        get_assembler().abort(session)
+    with _hashers_lock:
+        _hashers.pop(session.id, None)
+    session.delete()
@@ -0,0 +1,76 @@
+"""Recherche plein texte dans les documents, limitée aux cabinets de l'utilisateur.
+
+PostgreSQL : tsvector/GIN, requête interprétée en français et en anglais. SQLite : FTS5 (bm25).
+Autres bases : recherche par sous-chaîne, sans classement.
+"""
+import re
+
+from django.db import connection
+
+from .models import DocumentText
+
+MAX_TEXT = 500_000  # caractères indexés par document (limite de taille d'un tsvector)
+
+def save_text(doc, text):
+    """Enregistre le texte indexé d'un document (tronqué à MAX_TEXT caractères)."""
+    DocumentText.objects.update_or_create(document=doc, defaults={
+        "org_id": doc.corp.org_id, "corp_id": doc.corp_id, "language": doc.language,
+        "title": doc.title, "content": text[:MAX_TEXT].replace("\x00", ""),
+    })
+
+TS_CONFIG = ("CASE t.language WHEN 'en' THEN 'english'::regconfig WHEN 'fr' THEN 'french'::regconfig "
+             "ELSE 'simple'::regconfig END")
+
+POSTGRES_SEARCH = f"""
+    SELECT r.document_id, r.rank,
+           ts_headline({TS_CONFIG}, left(t.content, 20000), r.query,
+                       'StartSel=<b>, StopSel=</b>, MaxFragments=1, MaxWords=20, MinWords=8')
+      FROM (SELECT t.document_id, q.query, ts_rank_cd(t.search, q.query) AS rank
+              FROM documents_documenttext t,
+                   (SELECT websearch_to_tsquery('french', %s) || websearch_to_tsquery('english', %s) AS query) q
+             WHERE t.search @@ q.query AND t.org_id = ANY(%s) {{corp}}
+             ORDER BY rank DESC
+             LIMIT %s OFFSET %s) r
+      JOIN documents_documenttext t ON t.document_id = r.document_id
+     ORDER BY r.rank DESC
+"""
+
+SQLITE_SEARCH = """
+    SELECT t.document_id, -bm25(documents_documenttext_fts, 10.0, 1.0) AS rank,
+           snippet(documents_documenttext_fts, 1, '<b>', '</b>', '…', 20)
+      FROM documents_documenttext_fts
+      JOIN documents_documenttext t ON t.document_id = documents_documenttext_fts.rowid
+     WHERE documents_documenttext_fts MATCH %s AND t.org_id IN ({orgs}) {corp}
+     ORDER BY rank DESC
+     LIMIT %s OFFSET %s
+"""
+
+def _fts5_query(q):
+    # Mots entre guillemets (tous requis) : la saisie n'est jamais interprétée comme syntaxe FTS5
+    words = re.findall(r"\w+", q)
+    return " ".join(f'"{word}"' for word in words)
+
+def search_documents(q, org_ids, corp_id=None, limit=20, offset=0):
+    """Liste de (document_id, rang, extrait) triée par pertinence décroissante."""
+    org_ids = list(org_ids)
+    if not q.strip() or not org_ids:
+        return []
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        sql = POSTGRES_SEARCH.format(corp="AND t.corp_id = %s" if corp_id else "")
+        params = [q, q, org_ids] + ([corp_id] if corp_id else []) + [limit, offset]
+    elif vendor == "sqlite":
+        match = _fts5_query(q)
+        if not match:
+            return []
+        sql = SQLITE_SEARCH.format(orgs=", ".join(["%s"] * len(org_ids)),
+                                   corp="AND t.corp_id = %s" if corp_id else "")
+        params = [match] + org_ids + ([corp_id] if corp_id else []) + [limit, offset]
+    else:
+        texts = DocumentText.objects.filter(org_id__in=org_ids, content__icontains=q)
+        if corp_id:
+            texts = texts.filter(corp_id=corp_id)
+        return [(pk, 0.0, "") for pk in texts.values_list("document_id", flat=True)[offset:offset + limit]]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
@@ -1,8 +1,62 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Document
+from corps.models import Corporation
+from tickets.models import Ticket
+from .models import Document, DocumentPage, UploadSession
 
 class DocumentSerializer(serializers.ModelSerializer):
+    # Ré-upload d'un contenu déjà stocké : on passe son SHA-256 (« blob ») au lieu du fichier
+    blob = serializers.RegexField(r"^[0-9a-f]{64}$", write_only=True, required=False)
+    previews = serializers.SerializerMethodField()
+
     class Meta:
         model = Document
-        fields = ["id", "corp", "category", "title", "file", "language", "content_type", "uploaded_by", "sha256", "created_at"]
-        read_only_fields = ["uploaded_by", "sha256", "created_at", "content_type"]
+        fields = ["id", "corp", "category", "title", "file", "blob", "language", "content_type", "size", "status", "page_count", "preview_pages", "previews", "integrity", "verified_at", "parent", "page_start", "page_end", "uploaded_by", "sha256", "created_at"]
+        read_only_fields = ["uploaded_by", "sha256", "created_at", "content_type", "size", "status", "page_count",
+                            "preview_pages", "integrity", "verified_at", "parent", "page_start", "page_end"]
+        extra_kwargs = {"file": {"required": False}}
+
+    def get_previews(self, obj):
+        # URL par contenu : mise en cache longue côté navigateur, partagée entre documents identiques
+        if not obj.preview_pages:
+            return None
+        return {kind: reverse("document-preview", kwargs={"sha256": obj.sha256, "kind": kind})
+                for kind in ("thumb", "strip")}
+
+    def validate(self, attrs):
+        if not self.instance and not attrs.get("file") and not attrs.get("blob"):
+            raise serializers.ValidationError('Fournir "file" ou "blob".')
+        return attrs
+
+class DocumentPageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DocumentPage
+        fields = ["number", "heading", "excerpt", "section"]
+        read_only_fields = fields
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """Création d'un upload reprenable : longueur totale et objet visé (document ou pièce jointe)."""
+    target = serializers.ChoiceField(choices=UploadSession.Target.choices, default=UploadSession.Target.DOCUMENT)
+    filename = serializers.CharField(max_length=255)
+    length = serializers.IntegerField(min_value=1)
+    corp = serializers.PrimaryKeyRelatedField(queryset=Corporation.objects.select_related("org"), required=False)
+    category = serializers.ChoiceField(choices=Document.Category.choices, required=False)
+    title = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    language = serializers.CharField(max_length=5, default="fr")
+    ticket = serializers.PrimaryKeyRelatedField(queryset=Ticket.objects.select_related("corp__org"), required=False)
+
+    def validate(self, attrs):
+        if attrs["target"] == UploadSession.Target.DOCUMENT:
+            missing = [f for f in ("corp", "category") if not attrs.get(f)]
+        else:
+            missing = [] if attrs.get("ticket") else ["ticket"]
+        if missing:
+            raise serializers.ValidationError({f: "Champ requis pour cette cible." for f in missing})
+        return attrs
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ["id", "target", "filename", "length", "offset", "content_type", "sha256",
+                  "created_at", "completed_at", "document", "attachment"]
+        read_only_fields = fields
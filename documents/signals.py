@@ -0,0 +1,98 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from tickets.models import TicketAttachment
+from . import integrity, pipeline
+from .models import Blob, Document, DocumentText
+from .storage import is_blob_name
+
+# Comptage des références aux blobs. Signaux plutôt que save()/delete() :
+# les suppressions en cascade et QuerySet.delete() doivent aussi libérer la référence.
+
+@receiver(pre_save, sender=Document)
+@receiver(pre_save, sender=TicketAttachment)
+def remember_blob(sender, instance, update_fields=None, **kwargs):
+    # Fichier remplaçable (PATCH, admin) : empreinte et nom enregistrés avant l'écriture
+    instance._stored_blob = None
+    if not instance._state.adding and (update_fields is None or "file" in update_fields):
+        instance._stored_blob = sender.objects.filter(pk=instance.pk).values_list("sha256", "file").first()
+
+def _replaced(instance):
+    """(sha256, nom) du fichier remplacé par cet enregistrement, sinon None."""
+    stored = getattr(instance, "_stored_blob", None)
+    if stored and tuple(stored) != (instance.sha256, instance.file.name):
+        return stored
+    return None
+
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=TicketAttachment)
+def acquire_blob(sender, instance, created, **kwargs):
+    replaced = None if created else _replaced(instance)
+    if not created and replaced is None:
+        return
+    if replaced and replaced[0] and is_blob_name(replaced[1]):
+        Blob.release(replaced[0])
+    if instance.sha256 and is_blob_name(instance.file.name):
+        Blob.acquire(instance.sha256, instance.file.name, instance.size, instance.content_type)
+
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=TicketAttachment)
+def release_blob(sender, instance, **kwargs):
+    if instance.sha256 and is_blob_name(instance.file.name):
+        Blob.release(instance.sha256)
+
+# Pipeline d'ingestion lancé après commit : le worker doit voir la ligne.
+# Relancé si le contenu change : les étapes faites sur l'ancienne empreinte sont rejouées.
+@receiver(post_save, sender=Document)
+def start_pipeline(sender, instance, created, **kwargs):
+    replaced = None if created else _replaced(instance)
+    if created or (replaced and replaced[0] != instance.sha256):
+        # robust : un échec du lancement n'annule pas la réponse, déjà validée en base
+        transaction.on_commit(partial(pipeline.enqueue, instance.pk), robust=True)
+
+# Titre, langue et société indexés suivent les modifications du document. Valeurs retenues au
+# chargement (sans requête) : l'index n'est mis à jour que si l'une d'elles change.
+INDEXED_FIELDS = ("title", "language", "corp_id")
+
+def _indexed(instance):
+    # Champ différé (.only/.defer) absent de __dict__ : valeur inconnue, l'index sera resynchronisé
+    return tuple(instance.__dict__.get(field) for field in INDEXED_FIELDS)
+
+@receiver(post_init, sender=Document)
+def remember_indexed(sender, instance, **kwargs):
+    instance._stored_indexed = _indexed(instance)
+    instance._stored_corp_id = instance._stored_indexed[2]
+
+@receiver(post_save, sender=Document)
+def sync_text(sender, instance, created, update_fields=None, **kwargs):
+    stored, instance._stored_indexed = instance._stored_indexed, _indexed(instance)
+    if created or stored == instance._stored_indexed:
+        return
+    if update_fields is not None and not {"title", "language", "corp", "corp_id"} & update_fields:
+        return
+    DocumentText.objects.filter(document=instance).update(
+        title=instance.title, language=instance.language,
+        corp_id=instance.corp_id, org_id=instance.corp.org_id)
+
+# Arbre de Merkle de la société tenu à jour après commit, feuille par feuille : sa lecture n'écrit rien.
+# Document déplacé : sa feuille passe d'un arbre à l'autre (société retenue au chargement).
+@receiver(post_save, sender=Document)
+def record_merkle_leaf(sender, instance, created, update_fields=None, **kwargs):
+    moved_from, instance._stored_corp_id = instance._stored_corp_id, instance.corp_id
+    if not (instance.file and instance.sha256):
+        return
+    if created or (update_fields is not None and not {"corp", "corp_id"} & update_fields):
+        moved_from = None
+    if moved_from is not None and moved_from != instance.corp_id:
+        transaction.on_commit(partial(integrity.forget_document, moved_from, instance.id), robust=True)
+    elif not (created or _replaced(instance)):
+        return
+    transaction.on_commit(partial(integrity.record_document, instance), robust=True)
+
+@receiver(post_delete, sender=Document)
+def forget_merkle_leaf(sender, instance, **kwargs):
+    if instance.file:
+        transaction.on_commit(partial(integrity.forget_document, instance.corp_id, instance.id), robust=True)
@@ -0,0 +1,209 @@
+"""Découpage des gros PDF numérisés (migration de livres papier) en sections.
+
+1. Index des pages : texte de chaque page (couche OCR du scan), par tranches réparties ;
+   en-tête = premières lignes de la page.
+2. Sections : une page dont l'en-tête annonce une résolution, un registre, un certificat… ouvre
+   une section ; les pages suivantes au même en-tête (registre sur plusieurs pages) la prolongent.
+3. Chaque section devient un document enfant (PDF des pages concernées, écrit en parallèle) ;
+   le client récupère une résolution sans télécharger le scan entier.
+Répartition : dans un worker Celery (processus démon, sans sous-processus possible), le scan est
+lu une fois et déposé en tranches de SPLIT_CHUNK_PAGES pages ; chaque sous-tâche de la file
+SPLIT_QUEUE ne relit que ses tranches, et des callbacks (chords) enchaînent les phases sans
+qu'aucune tâche n'en attende une autre (documents.tasks). Ailleurs, un pool de processus local.
+Un scan sans texte est indexé (pages vides) mais n'est pas découpé.
+Le texte de recherche (DocumentText) des PDF d'origine est tiré de ce même index de pages, y compris
+sous SPLIT_MIN_PAGES pages : l'étape « text » du pipeline ne les relit pas.
+"""
+import multiprocessing
+import re
+import shutil
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.db import transaction
+
+try:
+    from celery import current_task
+except Exception:  # pragma: no cover
+    current_task = None
+
+try:
+    from pypdf import PdfReader
+    from . import pdfpages
+except Exception:  # pragma: no cover
+    PdfReader = pdfpages = None
+
+from .models import Document, DocumentPage
+from .search import save_text
+
+Category = Document.Category
+# Ordre significatif : « certificat d'actions » avant « certificat de constitution », etc.
+SECTION_PATTERNS = [
+    (Category.RESOLUTION_SH, r"r[ée]solutions?\b.*\bactionnaires|shareholders?'?\s+resolution|resolutions?\s+of\s+the\s+shareholders"),
+    (Category.RESOLUTION_BD, r"r[ée]solutions?\b.*\b(?:conseil|administrateurs)|directors'?\s+resolution|resolutions?\s+of\s+the\s+(?:board|directors)"),
+    (Category.CERTIFICATE, r"certificat\s+d'actions?|share\s+certificate"),
+    (Category.ARTICLES, r"\bstatuts\b|articles\s+of\s+(?:incorporation|amendment|continuance)|certifica(?:t|te)\s+(?:de\s+constitution|of\s+incorporation)"),
+    (Category.BYLAWS, r"r[èe]glement|by-?laws?"),
+    (Category.OTHER, r"\bregist(?:re|er)\b|proc[èe]s-verbal|minutes\s+of"),
+]
+_PATTERNS = [(category, re.compile(pattern, re.IGNORECASE)) for category, pattern in SECTION_PATTERNS]
+
+def detect_sections(pages):
+    """[(première page, dernière page, catégorie, en-tête)] d'après les en-têtes de l'index."""
+    sections = []
+    for number, heading, _ in pages:
+        category = next((c for c, pattern in _PATTERNS if heading and pattern.search(heading)), None)
+        if category is not None and not (sections and sections[-1][3] == heading):
+            sections.append([number, number, category, heading])
+        elif sections:
+            sections[-1][1] = number
+        else:  # pages avant le premier en-tête reconnu
+            sections.append([number, number, Category.OTHER, heading])
+    sections = [tuple(section) for section in sections]
+    return sections if len(sections) >= 2 else []  # un seul document : rien à découper
+
+@contextmanager
+def _local_copy(storage, name):
+    # Les processus relisent le fichier : chemin local, copie temporaire si stockage distant
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        path = None
+    if path:
+        yield path
+        return
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp, storage.open(name, "rb") as fh:
+        shutil.copyfileobj(fh, tmp)
+        tmp.flush()
+        yield tmp.name
+
+@contextmanager
+def _pool():
+    # Processus démon (worker prefork) : sous-processus interdits, exécution en série
+    if multiprocessing.current_process().daemon or settings.SPLIT_WORKERS <= 1:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=settings.SPLIT_WORKERS,
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        yield pool
+
+def _run(pool, func, calls):
+    """Résultats dans l'ordre des appels, au fur et à mesure."""
+    if pool is None:
+        return (func(*args) for args in calls)
+    return pool.map(func, *zip(*calls)) if calls else iter(())
+
+def splittable(doc):
+    """PDF d'origine, découpé et indexé par l'étape « split » (une section n'est jamais redécoupée)."""
+    return doc.content_type == "application/pdf" and not doc.parent_id and pdfpages is not None
+
+def in_worker():
+    """Vrai dans une tâche Celery réelle (ni eager ni hors Celery) : découpage en sous-tâches."""
+    return bool(current_task and not current_task.request.is_eager and settings.SPLIT_WORKERS > 1)
+
+def _chunk_ranges(page_count):
+    step = settings.SPLIT_CHUNK_PAGES
+    return [(n, min(n + step, page_count)) for n in range(0, page_count, step)]
+
+def _save_text(doc, pages):
+    save_text(doc, "\n".join(text for _, _, text in pages))
+
+def _index_short(doc, path, page_count):
+    # Trop court pour être découpé : seul le texte de recherche est enregistré
+    _save_text(doc, pdfpages.index_range(path, 0, page_count))
+
+def save_pages(doc, pages):
+    """Remplace l'index des pages, les sections d'un découpage précédent (reprise, --force) et le texte."""
+    with transaction.atomic():
+        doc.sections.all().delete()
+        DocumentPage.objects.filter(document=doc).delete()
+        DocumentPage.objects.bulk_create([
+            DocumentPage(document=doc, number=number, heading=heading, excerpt=text[:pdfpages.EXCERPT_CHARS])
+            for number, heading, text in pages
+        ], batch_size=500)
+        _save_text(doc, pages)
+
+def save_sections(doc, sections, files):
+    """Crée un document enfant par section (fichiers ouverts, dans l'ordre) et y rattache ses pages."""
+    with transaction.atomic():
+        for (first, last, category, heading), fh in zip(sections, files):
+            child = Document(corp_id=doc.corp_id, parent=doc, page_start=first, page_end=last,
+                             category=category, language=doc.language, uploaded_by_id=doc.uploaded_by_id,
+                             title=f"{doc.title} — p. {first}-{last}" + (f" — {heading[:120]}" if heading else ""))
+            with fh:
+                child.file.save(f"section_{doc.id}_{first}-{last}.pdf", File(fh), save=True)
+            DocumentPage.objects.filter(document=doc, number__range=(first, last)).update(section=child)
+    return len(sections)
+
+def split_document(doc):
+    """Indexe les pages d'un PDF et crée une section enfant par partie détectée (dans ce processus).
+
+    Retourne (pages, sections), ou None sous SPLIT_MIN_PAGES pages.
+    """
+    with _local_copy(doc.file.storage, doc.file.name) as path, _pool() as pool, \
+            tempfile.TemporaryDirectory() as workdir:
+        page_count = len(PdfReader(path).pages)
+        if page_count < settings.SPLIT_MIN_PAGES:
+            return _index_short(doc, path, page_count)
+        chunks = _run(pool, pdfpages.index_range, [(path, start, stop) for start, stop in _chunk_ranges(page_count)])
+        pages = [page for chunk in chunks for page in chunk]
+        sections = detect_sections(pages)
+        # Sections écrites en parallèle, enregistrées une à une : mémoire bornée
+        written = _run(pool, pdfpages.write_range,
+                       [(path, first, last, f"{workdir}/{first}.pdf") for first, last, _, _ in sections])
+        save_pages(doc, pages)
+        return page_count, save_sections(doc, sections, (open(target, "rb") for target in written))
+
+# Découpage en sous-tâches Celery : le scan est lu une seule fois ici, puis chaque sous-tâche
+# ne télécharge que les tranches qui la concernent (lectures totales ≈ 2 × taille du scan).
+
+def stage_chunks(doc):
+    """Dépose le scan en tranches dans le stockage ; retourne (pages, préfixe, [(nom, début, fin)]) ou None."""
+    storage, prefix = storages["default"], f"splits/{doc.id}/{uuid.uuid4().hex}/"
+    with _local_copy(doc.file.storage, doc.file.name) as path, tempfile.TemporaryDirectory() as workdir:
+        page_count = len(PdfReader(path).pages)
+        if page_count < settings.SPLIT_MIN_PAGES:
+            return _index_short(doc, path, page_count)
+        chunks = []
+        for start, stop in _chunk_ranges(page_count):
+            with open(pdfpages.write_range(path, start + 1, stop, f"{workdir}/{start}.pdf"), "rb") as fh:
+                chunks.append((storage.save(f"{prefix}chunk-{start}.pdf", File(fh)), start, stop))
+    return page_count, prefix, chunks
+
+def index_chunk(name, start, stop):
+    """Sous-tâche : index des pages d'une tranche, numérotées dans le scan entier."""
+    with _local_copy(storages["default"], name) as path:
+        return [(number + start, heading, text)
+                for number, heading, text in pdfpages.index_range(path, 0, stop - start)]
+
+def section_parts(chunks, first, last):
+    """Tranches contenant les pages first..last."""
+    return [(name, start, stop) for name, start, stop in chunks if start < last and stop >= first]
+
+def write_chunk(parts, first, last, name):
+    """Sous-tâche : PDF des pages first..last assemblé depuis ses tranches, déposé sous `name`."""
+    storage = storages["default"]
+    with tempfile.TemporaryDirectory() as workdir:
+        ranges = []
+        for i, (chunk, start, stop) in enumerate(parts):
+            path = f"{workdir}/{i}.pdf"
+            with storage.open(chunk, "rb") as src, open(path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            ranges.append((path, max(first, start + 1) - start, min(last, stop) - start))
+        with open(pdfpages.write_ranges(ranges, f"{workdir}/section.pdf"), "rb") as fh:
+            return storage.save(name, File(fh))
+
+def cleanup(prefix):
+    """Supprime les tranches et sections intermédiaires d'un découpage."""
+    storage = storages["default"]
+    try:
+        _, files = storage.listdir(prefix)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for filename in files:
+        storage.delete(f"{prefix}{filename}")
@@ -0,0 +1,68 @@
+"""Stockage adressé par contenu : un fichier par SHA-256, partagé par tous les documents identiques.
+
+Enveloppe le stockage par défaut (disque local ou S3/MinIO). `save()` range le contenu sous
+`cas/ab/cd/<sha256>` ; si ce contenu est déjà connu (Blob) ou présent, rien n'est écrit.
+Le nom retourné est toujours la clé canonique : deux écritures concurrentes du même contenu
+ne laissent pas de copie suffixée que nul Blob ne référence.
+"""
+from django.core.files.storage import Storage, storages
+from django.utils.deconstruct import deconstructible
+
+from .files import file_digest
+
+CAS_PREFIX = "cas/"
+
+def blob_name(sha256):
+    return f"{CAS_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(CAS_PREFIX)
+
+@deconstructible
+class ContentAddressedStorage(Storage):
+
+    @property
+    def backend(self):
+        return storages["default"]
+
+    def save(self, name, content, max_length=None):
+        sha256 = getattr(content, "sha256", "")
+        if not sha256:
+            sha256 = content.sha256 = file_digest(content).sha256
+        key = blob_name(sha256)
+        from .models import Blob
+        if Blob.reserve(sha256) or self.backend.exists(key):
+            return key  # doublon : opération de métadonnées seulement
+        saved = self.backend.save(key, content, max_length=max_length)
+        if saved != key:
+            self.backend.delete(saved)  # même contenu écrit entre-temps sous la clé canonique
+        return key
+
+    def _open(self, name, mode="rb"):
+        return self.backend.open(name, mode)
+
+    def delete(self, name):
+        self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def url(self, name, *args, **kwargs):
+        return self.backend.url(name, *args, **kwargs)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+cas_storage = ContentAddressedStorage()
+
+def get_cas_storage():
+    return cas_storage
@@ -0,0 +1,114 @@
+import logging
+
+from celery import chord, shared_task
+from django.conf import settings
+from django.core.files.storage import storages
+
+from . import pipeline, splitting
+from .models import Document, DocumentStage
+
+logger = logging.getLogger(__name__)
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def run_stage(self, document_id, name):
+    try:
+        return pipeline.run_stage(document_id, name)
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        # Échec définitif déjà noté sur l'étape ; le chord doit quand même conclure
+        return DocumentStage.Status.FAILED
+
+@shared_task
+def finish(document_id):
+    pipeline.finish(document_id)
+
+def dispatch(document_id):
+    chord(run_stage.si(document_id, name) for name in pipeline.STAGES)(finish.si(document_id))
+
+# Découpage : tranches indexées puis sections écrites sur la file SPLIT_QUEUE ; chaque phase
+# est lancée par le callback de la précédente, l'étape « split » est conclue par le dernier.
+# Une sous-tâche en échec définitif retourne None : le callback conclut l'étape en échec.
+
+def start_split(doc):
+    """Dépose les tranches et lance leur indexation ; False si le PDF est trop court pour être découpé."""
+    staged = splitting.stage_chunks(doc)
+    if staged is None:
+        return False
+    page_count, prefix, chunks = staged
+    try:
+        chord(index_pages.si(*chunk).set(queue=settings.SPLIT_QUEUE) for chunk in chunks)(
+            plan_sections.s(doc.id, doc.sha256, prefix, chunks, page_count))
+    except Exception:
+        splitting.cleanup(prefix)
+        raise
+    return True
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def index_pages(self, name, start, stop):
+    try:
+        return splitting.index_chunk(name, start, stop)
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        logger.exception("Indexation de la tranche %s en échec", name)
+        return None
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def write_section(self, parts, first, last, name):
+    try:
+        return splitting.write_chunk(parts, first, last, name)
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        logger.exception("Écriture de la section %s en échec", name)
+        return None
+
+def _split_target(document_id, sha256, prefix):
+    # Contenu remplacé ou document supprimé entre-temps : ce découpage est abandonné
+    doc = Document.objects.filter(pk=document_id, sha256=sha256).first()
+    if doc is None:
+        splitting.cleanup(prefix)
+    return doc
+
+def _conclude_split(document_id, prefix, status, error="", **fields):
+    splitting.cleanup(prefix)
+    pipeline.complete_stage(document_id, "split", status, error=error, **fields)
+
+@shared_task
+def plan_sections(results, document_id, sha256, prefix, chunks, page_count):
+    doc = _split_target(document_id, sha256, prefix)
+    if doc is None:
+        return
+    try:
+        if any(pages is None for pages in results):
+            return _conclude_split(document_id, prefix, DocumentStage.Status.FAILED,
+                                   error="Indexation d'une tranche en échec.")
+        pages = [tuple(page) for chunk in results for page in chunk]
+        sections = splitting.detect_sections(pages)
+        splitting.save_pages(doc, pages)
+        if not sections:
+            return _conclude_split(document_id, prefix, DocumentStage.Status.DONE, page_count=page_count)
+        chord(write_section.si(splitting.section_parts(chunks, first, last), first, last,
+                               f"{prefix}section-{first}.pdf").set(queue=settings.SPLIT_QUEUE)
+              for first, last, _, _ in sections)(
+            save_sections.s(document_id, sha256, prefix, sections, page_count))
+    except Exception as exc:
+        logger.exception("Découpage du document %s en échec", document_id)
+        _conclude_split(document_id, prefix, DocumentStage.Status.FAILED, error=f"{type(exc).__name__}: {exc}")
+
+@shared_task
+def save_sections(names, document_id, sha256, prefix, sections, page_count):
+    doc = _split_target(document_id, sha256, prefix)
+    if doc is None:
+        return
+    try:
+        if None in names:
+            return _conclude_split(document_id, prefix, DocumentStage.Status.FAILED,
+                                   error="Écriture d'une section en échec.")
+        storage = storages["default"]
+        splitting.save_sections(doc, sections, (storage.open(name, "rb") for name in names))
+        _conclude_split(document_id, prefix, DocumentStage.Status.DONE, page_count=page_count)
+    except Exception as exc:
+        logger.exception("Découpage du document %s en échec", document_id)
+        _conclude_split(document_id, prefix, DocumentStage.Status.FAILED, error=f"{type(exc).__name__}: {exc}")
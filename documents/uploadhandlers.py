@@ -0,0 +1,36 @@
+"""Gestionnaires d'upload : SHA-256, taille et type MIME calculés au fil des morceaux reçus.
+
+L'UploadedFile obtenu porte `sha256` et `sniffed_content_type` ; Document et TicketAttachment
+les reprennent sans relire le fichier (voir `files.uploaded_digest`).
+"""
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+from .files import Digest, sniff_content_type
+
+class _DigestMixin:
+    def new_file(self, *args, **kwargs):
+        self._digest = Digest()
+        super().new_file(*args, **kwargs)
+
+    def _attach(self, uploaded):
+        if uploaded is not None:
+            uploaded.sha256 = self._digest.sha256
+            uploaded.sniffed_content_type = sniff_content_type(self._digest.head, uploaded.name)
+        return uploaded
+
+class HashingMemoryFileUploadHandler(_DigestMixin, MemoryFileUploadHandler):
+    def receive_data_chunk(self, raw_data, start):
+        if self.activated:
+            self._digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        return self._attach(super().file_complete(file_size))
+
+class HashingTemporaryFileUploadHandler(_DigestMixin, TemporaryFileUploadHandler):
+    def receive_data_chunk(self, raw_data, start):
+        self._digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        return self._attach(super().file_complete(file_size))
@@ -1,17 +1,30 @@
-from pathlib import Path
+import zipfile
 from django.conf import settings
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, HttpResponseNotModified, Http404, StreamingHttpResponse
 from django.utils.timezone import now
 
 from rest_framework import viewsets, permissions
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
+from rest_framework.response import Response
 
-from .models import Document
-from .serializers import DocumentSerializer
+from . import resumable
+from .models import Blob, Document, MerkleTree, UploadSession
+from .serializers import DocumentPageSerializer, DocumentSerializer, UploadSessionCreateSerializer, UploadSessionSerializer
 from orgs.models import Membership
 from corps.models import Corporation
-from django.db.models import QuerySet
+from django.db.models import Count, Min, QuerySet
+from .downloads import etag_matches, download_filename, file_response
+from .pagination import KeysetPagination
+from .search import search_documents
+from .integrity import proof
+from .previews import read_preview
+from .conversion import DOCX, SUFFIXES, ConversionError, ConversionTimeout, available, convert_to_pdfa
+
+class ServiceUnavailable(APIException):
+    status_code = 503
+    default_detail = "Service temporairement indisponible."
 
 from rest_framework import permissions
 
@@ -33,18 +46,173 @@ class DocumentViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsOrgMember]
     parser_classes = [MultiPartParser, FormParser]
 
+    pagination_class = KeysetPagination
+    filter_fields = ("corp", "category", "language", "parent")
+
     def get_queryset(self) -> QuerySet:
         org_ids = Membership.objects.filter(user=self.request.user, is_active=True)\
                                     .values_list("org_id", flat=True)
-        return Document.objects.filter(corp__org_id__in=org_ids).order_by("-created_at")
+        qs = Document.objects.filter(corp__org_id__in=org_ids).select_related("corp").order_by("-created_at", "-id")
+        if self.action == "list":
+            filters = {f: self.request.query_params[f] for f in self.filter_fields if self.request.query_params.get(f)}
+            try:
+                qs = qs.filter(**filters)
+            except ValueError:
+                raise ValidationError({"detail": "Filtre invalide."})
+        return qs
+
+    def _visible_blob(self, sha256):
+        # Un blob n'est réutilisable que s'il figure déjà dans un document accessible :
+        # connaître une empreinte ne donne pas accès au contenu d'un autre cabinet.
+        blob = Blob.objects.filter(sha256=sha256, ref_count__gt=0).first()
+        if blob and self.get_queryset().filter(sha256=sha256, file=blob.name).exists():
+            return blob
+        return None
 
     def perform_create(self, serializer):
         corp = serializer.validated_data["corp"]
         user = self.request.user
         if not user.is_superuser and not Membership.objects.filter(org=corp.org, user=user, is_active=True).exists():
             raise PermissionDenied("Vous devez être membre actif de l'organisation de cette société.")
+        sha256 = serializer.validated_data.pop("blob", None)
+        if sha256 and not serializer.validated_data.get("file"):
+            blob = self._visible_blob(sha256)
+            if blob is None:
+                raise ValidationError({"blob": "Contenu inconnu : envoyer le fichier."})
+            serializer.save(uploaded_by=user, file=blob.name, sha256=blob.sha256,
+                            content_type=blob.content_type, size=blob.size)
+            return
         serializer.save(uploaded_by=user)
 
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """Recherche plein texte classée : ?q=…&corp=<id>&limit=20&offset=0."""
+        q = request.query_params.get("q", "")
+        try:
+            corp_id = int(request.query_params["corp"]) if request.query_params.get("corp") else None
+            limit = min(int(request.query_params.get("limit", 20)), 100)
+            offset = max(int(request.query_params.get("offset", 0)), 0)
+        except ValueError:
+            raise ValidationError({"detail": "corp, limit et offset doivent être des entiers."})
+        org_ids = Membership.objects.filter(user=request.user, is_active=True).values_list("org_id", flat=True)
+        hits = search_documents(q, org_ids, corp_id, limit, offset)
+        documents = Document.objects.in_bulk([document_id for document_id, _, _ in hits])
+        results = []
+        for document_id, rank, snippet in hits:
+            if document_id in documents:
+                data = self.get_serializer(documents[document_id]).data
+                data.update(rank=rank, snippet=snippet)
+                results.append(data)
+        return Response({"q": q, "results": results})
+
+    @action(detail=False, methods=["get"], url_path=r"blobs/(?P<sha256>[0-9a-f]{64})")
+    def blob(self, request, sha256=None):
+        """Indique si un contenu est déjà stocké (avant upload) ; 404 sinon."""
+        blob = self._visible_blob(sha256)
+        if blob is None:
+            return Response({"detail": "Contenu inconnu."}, status=404)
+        return Response({"sha256": blob.sha256, "size": blob.size, "content_type": blob.content_type})
+
+    @action(detail=False, methods=["get"], url_path=r"previews/(?P<sha256>[0-9a-f]{64})/(?P<kind>thumb|strip)\.webp")
+    def preview(self, request, sha256=None, kind=None):
+        """Vignette ou bande de pages d'un contenu visible ; immuable, donc cache navigateur d'un an."""
+        etag = f'"{sha256}-{kind}"'
+        if not self.get_queryset().filter(sha256=sha256).exists():
+            raise Http404("Aperçu inconnu.")
+        if etag_matches(request.headers.get("If-None-Match", ""), etag):
+            response = HttpResponseNotModified()
+        else:
+            try:
+                response = HttpResponse(read_preview(sha256, kind), content_type="image/webp")
+            except FileNotFoundError:
+                raise Http404("Aperçu pas encore disponible.")
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
+        return response
+
+    def _pdfa(self, data, sha256=None, suffix=".docx"):
+        if not available():
+            raise ServiceUnavailable("Conversion PDF/A indisponible (LibreOffice ou python3-uno absent).")
+        try:
+            return convert_to_pdfa(data, sha256, suffix)[1]
+        except ConversionTimeout as exc:
+            raise ServiceUnavailable(str(exc))
+        except ConversionError as exc:
+            raise ValidationError({"detail": f"Conversion impossible : {exc}"})
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        """Fichier du document (Range, ETag = SHA-256 ; transfert délégué selon FILE_DOWNLOAD_BACKEND)."""
+        document = self.get_object()
+        if not document.file:
+            raise Http404("Aucun fichier.")
+        filename = download_filename(document.title, document.file.name, document.content_type)
+        return file_response(request, document.file, filename=filename, content_type=document.content_type,
+                             sha256=document.sha256, size=document.size)
+
+    @action(detail=True, methods=["get"])
+    def pages(self, request, pk=None):
+        """Index des pages d'un PDF découpé (en-tête, extrait, section) ; sections : ?parent=<id> sur la liste."""
+        document = self.get_object()
+        return Response({"document": document.id, "page_count": document.page_count,
+                         "pages": DocumentPageSerializer(document.pages.all(), many=True).data})
+
+    @action(detail=True, methods=["get"])
+    def pdfa(self, request, pk=None):
+        """Version PDF/A d'un document bureautique (convertie une fois par contenu)."""
+        document = self.get_object()
+        suffix = SUFFIXES.get(document.content_type)
+        if suffix is None:
+            raise ValidationError({"detail": "Type de document non convertible."})
+        with document.file.open("rb") as fh:
+            content = self._pdfa(fh.read(), document.sha256, suffix)
+        response = HttpResponse(content, content_type="application/pdf")
+        response["Content-Disposition"] = f'attachment; filename="document_{document.id}.pdf"'
+        return response
+
+    @action(detail=False, methods=["get"], url_path=r"integrity/(?P<corp_id>\d+)")
+    def integrity(self, request, corp_id=None):
+        """Racine de Merkle du livre d'une société et état de la dernière revérification des fichiers."""
+        try:
+            corp = Corporation.objects.select_related("org").get(id=corp_id)
+        except Corporation.DoesNotExist:
+            raise Http404("Corporation not found")
+        if not request.user.is_superuser and \
+                not Membership.objects.filter(org=corp.org, user=request.user, is_active=True).exists():
+            raise PermissionDenied("Vous devez être membre actif de l'organisation de cette société.")
+        tree = MerkleTree.objects.filter(corp=corp).first() or MerkleTree(corp=corp)  # lecture seule
+        documents = Document.objects.filter(corp=corp).exclude(file="")
+        states = dict(documents.order_by().values_list("integrity").annotate(n=Count("id")))
+        return Response({
+            "corp": corp.id,
+            "root": tree.root,
+            "leaf_count": tree.leaf_count,
+            "updated_at": tree.updated_at,
+            "integrity": {state: states.get(state, 0) for state in Document.Integrity.values},
+            "oldest_verification": documents.aggregate(oldest=Min("verified_at"))["oldest"],
+        })
+
+    @action(detail=True, methods=["get"])
+    def proof(self, request, pk=None):
+        """Preuve de Merkle du document : chemin des empreintes sœurs jusqu'à la racine de sa société."""
+        document = self.get_object()
+        if not document.file:
+            raise Http404("Aucun fichier.")
+        try:
+            path = proof(MerkleTree.objects.get(corp_id=document.corp_id), document.id)
+        except (MerkleTree.DoesNotExist, KeyError):
+            raise Http404("Document pas encore porté dans l'arbre de Merkle.")
+        return Response({**path, "integrity": document.integrity, "verified_at": document.verified_at})
+
+    @staticmethod
+    def _template_args(language, jurisdictions):
+        """Langue et juridictions validées avant de chercher un modèle (elles composent son nom)."""
+        if language not in dict(settings.LANGUAGES):
+            raise ValidationError({"language": f"Langue inconnue : {', '.join(dict(settings.LANGUAGES))}."})
+        if any(jurisdiction not in Corporation.Jurisdiction.values for jurisdiction in jurisdictions):
+            raise ValidationError({"detail": "Juridiction de société inconnue."})
+        return language
+
     @action(detail=False, methods=["get"], url_path=r"generate/org-initial/(?P<corp_id>\d+)")
     def generate_org_initial(self, request, corp_id=None):
         try:
@@ -54,21 +222,129 @@ class DocumentViewSet(viewsets.ModelViewSet):
         if not Membership.objects.filter(org=corp.org, user=request.user, is_active=True).exists():
             return HttpResponse(status=403)
 
-        from docxtpl import DocxTemplate
-        tpl = DocxTemplate(str((Path(settings.BASE_DIR) / "templates" / "docx" / "org_initial_fr.docx")))
-        context = {
-            "corp": {
-                "legal_name": corp.legal_name,
-                "jurisdiction": corp.jurisdiction,
-                "incorporation_number": corp.incorporation_number or "",
-                "business_number": corp.business_number or "",
-            },
-            "date": now().date().strftime("%Y-%m-%d"),
-            "address": str(corp.registered_office) if corp.registered_office else "",
-        }
-        tpl.render(context)
-        filename = f"resolution_organisation_{corp.id}.docx"
-        response = HttpResponse(content_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        from .generation import render_org_initial
+        language = self._template_args(request.query_params.get("language", "fr"), [corp.jurisdiction])
+        try:
+            content = render_org_initial(corp, language)
+        except FileNotFoundError as exc:
+            raise Http404(str(exc))
+        filename, content_type = f"resolution_organisation_{corp.id}.docx", DOCX
+        if request.query_params.get("format") == "pdf":
+            content = self._pdfa(content)
+            filename, content_type = filename.replace(".docx", ".pdf"), "application/pdf"
+        response = HttpResponse(content, content_type=content_type)
         response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        tpl.save(response)
         return response
+
+    @action(detail=False, methods=["post"], url_path="generate/org-initial/batch",
+            parser_classes=[JSONParser, FormParser])
+    def generate_org_initial_batch(self, request):
+        """Une résolution par société, dans un ZIP produit au fil du rendu."""
+        ids = request.data.get("corps") or []
+        if hasattr(request.data, "getlist"):
+            ids = request.data.getlist("corps")
+        try:
+            ids = {int(i) for i in ids}
+        except (TypeError, ValueError):
+            raise ValidationError({"corps": "Liste d'identifiants de sociétés attendue."})
+        if not ids:
+            raise ValidationError({"corps": "Au moins une société."})
+        corps = Corporation.objects.filter(id__in=ids).select_related("registered_office")
+        if not request.user.is_superuser:
+            org_ids = Membership.objects.filter(user=request.user, is_active=True).values_list("org_id", flat=True)
+            corps = corps.filter(org_id__in=org_ids)
+        if corps.count() != len(ids):
+            raise PermissionDenied("Sociétés inconnues ou hors de vos organisations.")
+
+        from .generation import render_org_initial, templates
+        from .zipstream import iter_zip
+        jurisdictions = list(corps.order_by().values_list("jurisdiction", flat=True).distinct())
+        language = self._template_args(request.data.get("language", "fr"), jurisdictions)
+        try:  # modèle manquant : erreur avant d'ouvrir le flux
+            for jurisdiction in jurisdictions:
+                templates.get("org_initial", language, jurisdiction)
+        except FileNotFoundError as exc:
+            raise Http404(str(exc))
+        entries = ((f"resolution_organisation_{corp.id}.docx", render_org_initial(corp, language))
+                   for corp in corps.order_by("id").iterator(chunk_size=200))
+        # Les .docx sont déjà compressés : stockés tels quels dans l'archive
+        response = StreamingHttpResponse(iter_zip(entries, compression=zipfile.ZIP_STORED),
+                                         content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="resolutions_organisation_{now():%Y%m%d}.zip"'
+        return response
+
+
+class UploadViewSet(viewsets.ViewSet):
+    """Uploads reprenables (style tus) : POST crée la session, HEAD/GET donne l'offset acquitté,
+    PATCH (application/offset+octet-stream, Upload-Offset, Upload-Checksum facultatif) ajoute un
+    morceau, DELETE abandonne. Le dernier morceau crée le document ou la pièce jointe (réponse 200) ;
+    si cette finalisation échoue, un PATCH sans corps à l'offset final la reprend."""
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [JSONParser, FormParser]
+    lookup_value_regex = "[0-9a-f-]{36}"
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response["Tus-Resumable"] = "1.0.0"
+        response["Cache-Control"] = "no-store"
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def _get_session(self, pk):
+        session = UploadSession.objects.filter(pk=pk, created_by=self.request.user).first()
+        if session is None:
+            raise Http404("Upload inconnu.")
+        return session
+
+    def _offset_headers(self, response, session):
+        response["Upload-Offset"] = str(session.offset)
+        response["Upload-Length"] = str(session.length)
+        return response
+
+    def create(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data, user = serializer.validated_data, request.user
+        if data["target"] == UploadSession.Target.DOCUMENT:
+            org, allowed = data["corp"].org, user.is_superuser
+            metadata = {"corp": data["corp"].id, "category": data["category"],
+                        "title": data.get("title", ""), "language": data["language"]}
+        else:
+            org, allowed = data["ticket"].corp.org, user.is_staff or user.is_superuser
+            metadata = {"ticket": data["ticket"].id}
+        if not allowed and not Membership.objects.filter(org=org, user=user, is_active=True).exists():
+            raise PermissionDenied("Vous devez être membre actif de l'organisation visée.")
+        try:
+            session = resumable.create_session(user, data["target"], data["filename"], data["length"], metadata)
+        except resumable.UploadError as exc:
+            return Response({"detail": str(exc)}, status=exc.status)
+        response = Response(UploadSessionSerializer(session).data, status=201)
+        response["Location"] = request.build_absolute_uri(f"{request.path.rstrip('/')}/{session.pk}/")
+        return self._offset_headers(response, session)
+
+    def retrieve(self, request, pk=None):
+        session = self._get_session(pk)
+        return self._offset_headers(Response(UploadSessionSerializer(session).data), session)
+
+    def partial_update(self, request, pk=None):
+        session = self._get_session(pk)
+        if request.content_type != "application/offset+octet-stream":
+            return Response({"detail": "Content-Type attendu : application/offset+octet-stream."}, status=415)
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except (KeyError, ValueError):
+            return Response({"detail": "En-têtes Upload-Offset et Content-Length requis."}, status=400)
+        if length <= 0 and session.offset < session.length:  # corps vide permis pour reprendre la finalisation
+            return Response({"detail": "Morceau vide."}, status=400)
+        try:
+            session = resumable.receive_chunk(session, offset, request.stream, length,
+                                              request.headers.get("Upload-Checksum", ""))
+        except resumable.UploadError as exc:
+            session.refresh_from_db()
+            return self._offset_headers(Response({"detail": str(exc)}, status=exc.status), session)
+        if session.completed_at:
+            return self._offset_headers(Response(UploadSessionSerializer(session).data), session)
+        return self._offset_headers(Response(status=204), session)
+
+    def destroy(self, request, pk=None):
+        resumable.abort(self._get_session(pk))
+        return Response(status=204)
@@ -0,0 +1,37 @@
+"""Archive ZIP produite au fil de l'eau : ni fichier temporaire, ni archive entière en mémoire."""
+import time
+import zipfile
+
+class _Sink:
+    # Flux sans tell()/seek() : zipfile écrit alors un descripteur de données après chaque entrée
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def iter_zip(entries, compression=zipfile.ZIP_DEFLATED):
+    """Octets d'un ZIP pour des entrées (nom, contenu) ; contenu = bytes ou itérable de morceaux."""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=compression) as archive:
+        for name, content in entries:
+            if isinstance(content, (bytes, bytearray)):
+                content = (content,)
+            info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+            info.compress_type = compression
+            with archive.open(info, "w", force_zip64=True) as dest:
+                for chunk in content:
+                    dest.write(chunk)
+                    if sink.chunks:
+                        yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
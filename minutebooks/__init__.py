@@ -0,0 +1,6 @@
+try:
+    from .celery import app as celery_app
+except ImportError:  # pragma: no cover - celery absent : pipeline exécuté dans le processus
+    celery_app = None
+
+__all__ = ("celery_app",)
@@ -150,9 +150,20 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Uploads : SHA-256, taille et type MIME calculés pendant la réception (documents.uploadhandlers)
+FILE_UPLOAD_HANDLERS = [
+    "documents.uploadhandlers.HashingMemoryFileUploadHandler",
+    "documents.uploadhandlers.HashingTemporaryFileUploadHandler",
+]
+
+# Uploads reprenables (documents.resumable)
+UPLOAD_MAX_LENGTH = env.int("UPLOAD_MAX_LENGTH", default=2 * 1024 ** 3)  # 2 Gio par fichier
+UPLOAD_CHUNK_MAX = env.int("UPLOAD_CHUNK_MAX", default=64 * 1024 ** 2)  # par requête PATCH
+UPLOAD_SESSION_TTL_HOURS = env.int("UPLOAD_SESSION_TTL_HOURS", default=24)
 
 # S3 (optionnel)
-if env.bool("USE_S3", default=False):
+USE_S3 = env.bool("USE_S3", default=False)
+if USE_S3:
     INSTALLED_APPS += ["storages"]
     STORAGES = {
         "default": {"BACKEND": "storages.backends.s3boto3.S3Boto3Storage"},
@@ -167,9 +178,39 @@ if env.bool("USE_S3", default=False):
     AWS_SECRET_ACCESS_KEY = env("AWS_SECRET_ACCESS_KEY")
 
 
+# Téléchargements (documents.downloads) : "django" | "x-accel" (nginx) | "x-sendfile" | "s3" (URL présignée)
+FILE_DOWNLOAD_BACKEND = env("FILE_DOWNLOAD_BACKEND", default="s3" if USE_S3 else "django")
+FILE_DOWNLOAD_ACCEL_PREFIX = env("FILE_DOWNLOAD_ACCEL_PREFIX", default="/protected-media/")
+FILE_DOWNLOAD_URL_EXPIRY = env.int("FILE_DOWNLOAD_URL_EXPIRY", default=300)  # secondes
+
 # Celery/Redis
 CELERY_BROKER_URL = env("CELERY_BROKER_URL", default="redis://127.0.0.1:6379/0")
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
+# Mode local : les tâches s'exécutent dans le processus appelant (tests, dev sans Redis)
+CELERY_TASK_ALWAYS_EAGER = env.bool("CELERY_TASK_ALWAYS_EAGER", default=False)
+CELERY_TASK_ACKS_LATE = True
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# LibreOffice headless (conversion DOCX → PDF/A, documents.conversion) ; pool par processus
+LIBREOFFICE_BINARY = env("LIBREOFFICE_BINARY", default="soffice")
+LIBREOFFICE_POOL_SIZE = env.int("LIBREOFFICE_POOL_SIZE", default=2)
+LIBREOFFICE_MAX_JOBS = env.int("LIBREOFFICE_MAX_JOBS", default=200)  # recyclage du processus
+LIBREOFFICE_TIMEOUT = env.int("LIBREOFFICE_TIMEOUT", default=120)  # secondes, par conversion
+
+# Export du livre de minutes (documents.minutebook) : fichiers lus en avance depuis le stockage
+MINUTEBOOK_PREFETCH = env.int("MINUTEBOOK_PREFETCH", default=4)
+
+# Revérification des fichiers stockés (commande verify_documents) : lectures parallèles, débit plafonné
+INTEGRITY_WORKERS = env.int("INTEGRITY_WORKERS", default=8)
+INTEGRITY_RATE_MB = env.int("INTEGRITY_RATE_MB", default=50)  # Mo/s au total, 0 = illimité
+INTEGRITY_MAX_AGE_DAYS = env.int("INTEGRITY_MAX_AGE_DAYS", default=30)  # revérification au-delà
+
+# Découpage des PDF numérisés en sections (documents.splitting) : pool de processus ou sous-tâches Celery
+SPLIT_MIN_PAGES = env.int("SPLIT_MIN_PAGES", default=20)
+SPLIT_WORKERS = env.int("SPLIT_WORKERS", default=4)  # 1 = dans le processus courant
+SPLIT_CHUNK_PAGES = env.int("SPLIT_CHUNK_PAGES", default=50)  # pages indexées par tâche
+# Dans un worker Celery, tranches et sections en sous-tâches sur cette file (enchaînées par callbacks)
+SPLIT_QUEUE = env("SPLIT_QUEUE", default="split")
 
 # DRF (API)
 REST_FRAMEWORK = {
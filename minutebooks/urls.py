@@ -5,13 +5,16 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from documents.views import DocumentViewSet
+from documents.views import DocumentViewSet, UploadViewSet
+from registers.views import RegisterViewSet
 from tickets.views import TicketViewSet
 
 # DRF Router
 router = DefaultRouter()
 router.register(r"documents", DocumentViewSet, basename="document")
+router.register(r"uploads", UploadViewSet, basename="upload")
 router.register(r"tickets", TicketViewSet, basename="ticket")
+router.register(r"registers", RegisterViewSet, basename="register")
 
 urlpatterns = [
     path("accounts/", include("allauth.urls")),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ShareClass, ShareIssuance, ShareTransfer, ShareRedemption, ShareCertificate
+from .models import ShareClass, ShareIssuance, ShareTransfer, ShareRedemption, ShareCertificate, CapTablePosition
 
 @admin.register(ShareClass)
 class ShareClassAdmin(admin.ModelAdmin):
@@ -35,3 +35,16 @@ class ShareCertificateAdmin(admin.ModelAdmin):
     list_filter = ("corp", "share_class", "cancelled_on")
     search_fields = ("number", "corp__legal_name",)
     autocomplete_fields = ["corp", "share_class", "holder"]
+
+@admin.register(CapTablePosition)
+class CapTablePositionAdmin(admin.ModelAdmin):
+    # Données dérivées : lecture seule (voir `manage.py rebuild_cap_table`)
+    list_display = ("corp", "holder", "share_class", "quantity", "id")
+    list_filter = ("corp", "share_class")
+    search_fields = ("corp__legal_name",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
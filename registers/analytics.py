@@ -0,0 +1,94 @@
+"""Analyses de détention vectorisées (NumPy) : matrice détenteurs × classes d'une société.
+
+Aucun titre convertible (options, bons) n'étant modélisé, le « pleinement dilué » correspond
+ici à l'ensemble des actions en circulation, toutes classes confondues.
+"""
+import numpy as np
+
+from .models import CapTablePosition
+
+def _ratio(num, den):
+    num = np.asarray(num, dtype=np.float64)
+    return np.divide(num, den, out=np.zeros_like(num), where=np.asarray(den) != 0)
+
+def _concentration(shares):
+    """HHI, part du premier détenteur et nombre minimal de détenteurs pour dépasser 50 %."""
+    if not shares.size or not shares.sum():
+        return {"hhi": 0.0, "top_holder": 0.0, "holders_for_majority": None}
+    ordered = np.sort(shares)[::-1]
+    return {
+        "hhi": float(np.square(shares).sum()),
+        "top_holder": float(ordered[0]),
+        "holders_for_majority": int(np.searchsorted(np.cumsum(ordered), 0.5, side="right") + 1),
+    }
+
+class OwnershipMatrix:
+    """Quantités en circulation par (détenteur, classe), avec le caractère votant des classes."""
+
+    def __init__(self, holder_ids, class_ids, quantities, voting):
+        self.holder_ids = np.asarray(holder_ids, dtype=np.int64)
+        self.class_ids = np.asarray(class_ids, dtype=np.int64)
+        self.quantities = np.asarray(quantities, dtype=np.int64).reshape(len(self.holder_ids), len(self.class_ids))
+        self.voting = np.asarray(voting, dtype=bool)
+
+    @classmethod
+    def from_rows(cls, holders, classes, quantities, voting):
+        """Construit la matrice depuis des colonnes parallèles (une entrée par position)."""
+        holders = np.asarray(holders, dtype=np.int64)
+        classes = np.asarray(classes, dtype=np.int64)
+        holder_ids, h = np.unique(holders, return_inverse=True)
+        class_ids, first, c = np.unique(classes, return_index=True, return_inverse=True)
+        matrix = np.zeros((len(holder_ids), len(class_ids)), dtype=np.int64)
+        np.add.at(matrix, (h, c), np.asarray(quantities, dtype=np.int64))
+        return cls(holder_ids, class_ids, matrix, np.asarray(voting, dtype=bool)[first])
+
+    @classmethod
+    def for_corp(cls, corp):
+        """Charge les positions matérialisées positives de la société (une requête)."""
+        rows = list(CapTablePosition.objects
+                    .filter(corp=corp, quantity__gt=0)
+                    .values_list("holder", "share_class", "quantity", "share_class__is_voting"))
+        if not rows:
+            return cls([], [], np.zeros((0, 0)), [])
+        holders, classes, quantities, voting = zip(*rows)
+        return cls.from_rows(holders, classes, quantities, voting)
+
+    def class_ownership(self):
+        """Part de chaque détenteur dans chaque classe (matrice H × C)."""
+        return _ratio(self.quantities, self.quantities.sum(axis=0))
+
+    def fully_diluted(self):
+        """Part de chaque détenteur dans l'ensemble des actions en circulation."""
+        return _ratio(self.quantities.sum(axis=1), self.quantities.sum())
+
+    def voting_power(self):
+        """Part des voix (une voix par action des classes votantes)."""
+        votes = self.quantities[:, self.voting].sum(axis=1)
+        return _ratio(votes, votes.sum())
+
+    def report(self):
+        fully_diluted = self.fully_diluted()
+        voting = self.voting_power()
+        by_class = self.class_ownership()
+        return {
+            "totals": {
+                "outstanding": int(self.quantities.sum()),
+                "voting": int(self.quantities[:, self.voting].sum()),
+                "by_class": {int(k): int(q) for k, q in zip(self.class_ids, self.quantities.sum(axis=0))},
+            },
+            "holders": [
+                {
+                    "holder": int(holder_id),
+                    "shares": int(self.quantities[i].sum()),
+                    "fully_diluted": float(fully_diluted[i]),
+                    "voting_power": float(voting[i]),
+                    "by_class": {int(k): float(p) for k, p, q in zip(self.class_ids, by_class[i], self.quantities[i]) if q},
+                }
+                for i, holder_id in enumerate(self.holder_ids)
+            ],
+            "concentration": {
+                "fully_diluted": _concentration(fully_diluted),
+                "voting": _concentration(voting),
+                "controlling_holder": int(self.holder_ids[voting.argmax()]) if voting.size and voting.max() > 0.5 else None,
+            },
+        }
@@ -0,0 +1,207 @@
+"""Exports des registres (valeurs mobilières, administrateurs/dirigeants, cap table).
+
+Les lignes sont lues par curseur serveur (`.iterator(chunk_size=…)`) et produites une à une.
+CSV et PDF sont diffusés au fil des lignes (le PDF page par page : seuls les décalages des
+objets déjà écrits sont retenus). Un XLSX est une archive ZIP terminée par son répertoire :
+openpyxl l'écrit sur disque (mode write_only), il n'est envoyé qu'une fois complet.
+"""
+import csv
+import heapq
+import tempfile
+
+from corps.models import Director, Officer
+from .models import CapTablePosition, ShareIssuance, ShareRedemption, ShareTransfer
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+
+def _party_fields(prefix):
+    return [f"{prefix}__type", f"{prefix}__person__first_name", f"{prefix}__person__last_name", f"{prefix}__entity__legal_name"]
+
+def _party_name(row, prefix):
+    if row.get(f"{prefix}__entity__legal_name"):
+        return row[f"{prefix}__entity__legal_name"]
+    first, last = row.get(f"{prefix}__person__first_name"), row.get(f"{prefix}__person__last_name")
+    return " ".join(filter(None, (first, last))) or f"#{row[prefix]}"
+
+def _ledger_rows(model, corp, rank, kind, from_prefix, to_prefix, extra):
+    fields = ["id", "occurred_on", "share_class__name", "quantity", *extra]
+    for prefix in filter(None, (from_prefix, to_prefix)):
+        fields += [prefix, *_party_fields(prefix)]
+    rows = model.objects.filter(corp=corp).order_by("occurred_on", "id").values(*fields).iterator(chunk_size=CHUNK_SIZE)
+    for row in rows:
+        yield (row["occurred_on"], rank, row["id"]), [
+            row["occurred_on"].isoformat(),
+            kind,
+            row["share_class__name"],
+            _party_name(row, from_prefix) if from_prefix else "",
+            _party_name(row, to_prefix) if to_prefix else "",
+            row["quantity"],
+            row.get("consideration", ""),
+            row.get("resolution_ref", ""),
+        ]
+
+def securities_register(corp):
+    """Registre des valeurs mobilières : mouvements en ordre chronologique (fusion de trois curseurs).
+
+    À date égale : émissions, puis transferts, puis rachats.
+    """
+    header = ["Date", "Opération", "Classe", "Cédant", "Cessionnaire", "Quantité", "Contrepartie", "Résolution"]
+    streams = [
+        _ledger_rows(ShareIssuance, corp, 0, "Émission", None, "to_holder", ["consideration", "resolution_ref"]),
+        _ledger_rows(ShareTransfer, corp, 1, "Transfert", "from_holder", "to_holder", ["consideration"]),
+        _ledger_rows(ShareRedemption, corp, 2, "Rachat", "from_holder", None, []),
+    ]
+    return header, (row for _, row in heapq.merge(*streams, key=lambda item: item[0]))
+
+def directors_register(corp):
+    """Registre des administrateurs puis des dirigeants."""
+    header = ["Fonction", "Nom", "Début", "Fin", "Adresse résidentielle"]
+
+    def rows():
+        directors = (Director.objects.filter(corp=corp).order_by("started_on", "id")
+                     .values("party", *_party_fields("party"), "started_on", "ended_on",
+                             "residential_address__line1", "residential_address__city")
+                     .iterator(chunk_size=CHUNK_SIZE))
+        for row in directors:
+            address = ", ".join(filter(None, (row["residential_address__line1"], row["residential_address__city"])))
+            yield ["Administrateur", _party_name(row, "party"), row["started_on"].isoformat(),
+                   row["ended_on"].isoformat() if row["ended_on"] else "", address]
+        officers = (Officer.objects.filter(corp=corp).order_by("started_on", "id")
+                    .values("party", *_party_fields("party"), "title", "started_on", "ended_on")
+                    .iterator(chunk_size=CHUNK_SIZE))
+        for row in officers:
+            yield [row["title"], _party_name(row, "party"), row["started_on"].isoformat(),
+                   row["ended_on"].isoformat() if row["ended_on"] else "", ""]
+
+    return header, rows()
+
+def cap_table_register(corp):
+    """Cap table courante (positions matérialisées non nulles)."""
+    header = ["Détenteur", "Classe", "Quantité"]
+    positions = (CapTablePosition.objects.filter(corp=corp).exclude(quantity=0)
+                 .order_by("share_class__name", "-quantity", "holder")
+                 .values("holder", *_party_fields("holder"), "share_class__name", "quantity")
+                 .iterator(chunk_size=CHUNK_SIZE))
+    return header, ([_party_name(row, "holder"), row["share_class__name"], row["quantity"]] for row in positions)
+
+REGISTERS = {
+    "securities": securities_register,
+    "directors": directors_register,
+    "cap-table": cap_table_register,
+}
+
+class _Echo:
+    def write(self, value):
+        return value
+
+def iter_csv(header, rows):
+    writer = csv.writer(_Echo())
+    yield "\ufeff" + writer.writerow(header)  # BOM : accents lisibles dans Excel
+    for row in rows:
+        yield writer.writerow(row)
+
+def write_xlsx(title, header, rows):
+    """Classeur en mode write_only (mémoire constante), dans un fichier temporaire rembobiné."""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    out = tempfile.TemporaryFile()
+    workbook.save(out)
+    out.seek(0)
+    return out
+
+def _pdf_string(text):
+    # Polices standard en WinAnsiEncoding : accents et tirets de cp1252, « ? » pour le reste
+    data = str(text).encode("cp1252", "replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+class _PdfObjects:
+    """Objets PDF numérotés, sérialisés à la demande ; garde le décalage de chacun pour la table xref."""
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+
+    def raw(self, data):
+        self.offset += len(data)
+        return data
+
+    def obj(self, number, body):
+        self.offsets[number] = self.offset
+        return self.raw(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+
+    def stream(self, number, content):
+        return self.obj(number, b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+
+def iter_pdf(title, header, rows):
+    """PDF paysage diffusé : chaque page est émise dès qu'elle est pleine."""
+    from reportlab.lib.pagesizes import landscape, letter
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    width, height = landscape(letter)
+    margin, line_height = 36, 12
+    col_width = (width - 2 * margin) / len(header)
+    fonts = {"Helvetica": b"/F1", "Helvetica-Bold": b"/F2"}
+    objects = _PdfObjects()
+    # 1 : catalogue, 2 : arbre des pages (écrit à la fin), 3-4 : polices, puis contenu/page par page
+    yield objects.raw(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    for number, (name, ref) in enumerate(fonts.items(), start=3):
+        yield objects.obj(number, b"<< /Type /Font /Subtype /Type1 /Name %s /BaseFont /%s "
+                                  b"/Encoding /WinAnsiEncoding >>" % (ref, name.encode()))
+
+    def text(x, y, value, font, size):
+        return b"BT %s %d Tf %.2f %.2f Td %s Tj ET" % (fonts[font], size, x, y, _pdf_string(value))
+
+    def draw_row(values, y, font):
+        ops = []
+        for i, value in enumerate(values):
+            value = str(value)
+            while value and stringWidth(value, font, 8) > col_width - 4:
+                value = value[:-1]
+            ops.append(text(margin + i * col_width, y, value, font, 8))
+        return ops
+
+    def new_page(page):
+        ops = [text(margin, height - margin, f"{title} — page {page}", "Helvetica-Bold", 11)]
+        ops += draw_row(header, height - margin - 2 * line_height, "Helvetica-Bold")
+        return ops, height - margin - 3 * line_height
+
+    kids = []
+
+    def flush(ops):
+        number = 5 + 2 * len(kids)
+        kids.append(number + 1)
+        return objects.stream(number, b"\n".join(ops)) + objects.obj(number + 1, (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (width, height, number)))
+
+    ops, y = new_page(1)
+    for row in rows:
+        if y < margin:
+            yield flush(ops)
+            ops, y = new_page(len(kids) + 1)
+        ops += draw_row(row, y, "Helvetica")
+        y -= line_height
+    yield flush(ops)
+    yield objects.obj(2, b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                      % (b" ".join(b"%d 0 R" % kid for kid in kids), len(kids)))
+    yield objects.obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    xref, size = objects.offset, max(objects.offsets) + 1
+    entries = b"".join(b"%010d 00000 n \n" % objects.offsets[n] for n in range(1, size))
+    yield objects.raw(b"xref\n0 %d\n0000000000 65535 f \n%s" % (size, entries)
+                      + b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref))
+
+def write_pdf(title, header, rows):
+    """PDF de `iter_pdf` dans un fichier temporaire rembobiné (export du livre de minutes)."""
+    out = tempfile.TemporaryFile()
+    for chunk in iter_pdf(title, header, rows):
+        out.write(chunk)
+    out.seek(0)
+    return out
@@ -0,0 +1,284 @@
+"""Import en flux des registres (migration de livres papier) depuis un CSV ou un XLSX.
+
+Une ligne par mouvement ; colonnes reconnues :
+    corp            id ou numéro d'entreprise (NEQ / no de société) d'une société de l'organisation
+    kind            issuance | transfer | redemption | certificate
+    share_class     nom de la classe (créée au besoin)
+    quantity        nombre d'actions
+    occurred_on     date AAAA-MM-JJ (date d'émission pour un certificat)
+    to_holder       détenteur bénéficiaire (issuance, transfer, certificate)
+    from_holder     détenteur cédant (transfer, redemption)
+    to_holder_type / from_holder_type   PERSON (défaut) ou ENTITY
+    consideration, resolution_ref, number, cancelled_on, reason_cancelled   (facultatifs)
+
+Une personne s'écrit « Nom, Prénom » ; une entité, par sa dénomination. Les détenteurs inconnus
+sont créés avec une adresse « à compléter ». Les lignes consécutives d'une même société sont
+insérées par lots (`bulk_create`) dans une transaction, puis ses positions sont reconstruites.
+"""
+import csv
+import io
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import groupby
+
+from django.db import DatabaseError, transaction
+
+from corps.models import Address, Director, Entity, Officer, Party, Person
+from .models import (
+    ShareCertificate, ShareClass, ShareIssuance, ShareRedemption, ShareTransfer,
+    rebuild_cap_table_positions,
+)
+
+MAX_REPORTED_ERRORS = 1000
+MAX_QUANTITY = 2**31 - 1  # PositiveIntegerField (PostgreSQL : integer)
+PARTY_TYPES = frozenset(Party.Type.values)
+
+class RowError(Exception):
+    pass
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = {"issuance": 0, "transfer": 0, "redemption": 0, "certificate": 0}
+        self.parties_created = 0
+        self.classes_created = 0
+        self.error_count = 0
+        self.errors = []  # [(ligne, message)] — tronqué à MAX_REPORTED_ERRORS
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "parties_created": self.parties_created,
+            "classes_created": self.classes_created,
+            "error_count": self.error_count,
+            "errors": [{"line": line, "message": message} for line, message in self.errors],
+        }
+
+def iter_rows(fileobj, filename=""):
+    """Génère (no de ligne, dict) depuis un fichier binaire CSV ou XLSX, sans tout charger."""
+    if filename.lower().endswith(".xlsx"):
+        from openpyxl import load_workbook
+        sheet = load_workbook(fileobj, read_only=True, data_only=True).worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(h or "").strip().lower() for h in next(rows, ())]
+        for line, values in enumerate(rows, start=2):
+            if any(v not in (None, "") for v in values):
+                yield line, dict(zip(header, values))
+        return
+    reader = csv.DictReader(io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline=""))
+    reader.fieldnames = [(h or "").strip().lower() for h in reader.fieldnames or []]
+    for row in reader:
+        if any((v or "").strip() for v in row.values() if isinstance(v, str)):
+            yield reader.line_num, row
+
+def _text(row, key):
+    value = row.get(key)
+    return "" if value is None else str(value).strip()
+
+def _date(row, key, required=True):
+    value = row.get(key)
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = _text(row, key)
+    if not value:
+        if required:
+            raise RowError(f"{key} manquant.")
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise RowError(f"{key} invalide : {value!r} (AAAA-MM-JJ).")
+
+def _quantity(row):
+    value = _text(row, "quantity")
+    if not value:
+        raise RowError("quantity manquant.")
+    try:
+        qty = Decimal(value)  # « 100.0 » d'une cellule XLSX accepté, « 12.7 » refusé
+    except InvalidOperation:
+        raise RowError(f"quantity invalide : {value!r}.")
+    if not qty.is_finite() or qty != qty.to_integral_value() or not 0 < qty <= MAX_QUANTITY:
+        raise RowError(f"quantity doit être un entier positif (au plus {MAX_QUANTITY}) : {value!r}.")
+    return int(qty)
+
+def _normalize(name):
+    return " ".join(name.lower().split())
+
+class RegisterImporter:
+    """Importe les mouvements d'une organisation ; tables de correspondance gardées en mémoire."""
+
+    def __init__(self, org, batch_size=1000, dry_run=False):
+        self.org = org
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.result = ImportResult()
+        self._placeholder_address = None
+        self._txn_created = []  # entrées des tables créées dans la transaction courante
+        self.corps = {}
+        for corp in org.corporations.all():
+            self.corps[str(corp.id)] = corp
+            if corp.incorporation_number:
+                self.corps[corp.incorporation_number.strip()] = corp
+        self.classes = {
+            (share_class.corp_id, _normalize(share_class.name)): share_class
+            for share_class in ShareClass.objects.filter(corp__org=org)
+        }
+        self.parties = self._load_parties()
+
+    def _load_parties(self):
+        # Détenteurs déjà connus de l'organisation (pas de rapprochement avec d'autres cabinets)
+        party_ids = set()
+        for model, fields in (
+            (ShareIssuance, ["to_holder"]),
+            (ShareTransfer, ["from_holder", "to_holder"]),
+            (ShareRedemption, ["from_holder"]),
+            (ShareCertificate, ["holder"]),
+            (Director, ["party"]),
+            (Officer, ["party"]),
+        ):
+            for field in fields:
+                party_ids.update(model.objects.filter(corp__org=self.org).values_list(field, flat=True).distinct())
+        parties, ids = {}, sorted(party_ids)
+        for start in range(0, len(ids), 500):
+            for party_id, party_type, first, last, legal_name in (Party.objects
+                    .filter(id__in=ids[start:start + 500])
+                    .values_list("id", "type", "person__first_name", "person__last_name", "entity__legal_name")):
+                name = legal_name if party_type == Party.Type.ENTITY else f"{last}, {first}"
+                parties.setdefault((party_type, _normalize(name or "")), party_id)
+        return parties
+
+    def _placeholder(self):
+        if self._placeholder_address is None:
+            self._placeholder_address = Address.objects.create(
+                line1="À compléter (migration)", city="—", province_state="—", postal_code="—",
+            )
+            self._txn_created.append((None, None))
+        return self._placeholder_address
+
+    def _party_id(self, row, key):
+        name = _text(row, key)
+        if not name:
+            raise RowError(f"{key} manquant.")
+        party_type = (_text(row, f"{key}_type") or Party.Type.PERSON).upper()
+        if party_type not in PARTY_TYPES:
+            raise RowError(f"{key}_type invalide : {party_type!r}.")
+        lookup = (party_type, _normalize(name))
+        if lookup not in self.parties:
+            if party_type == Party.Type.ENTITY:
+                entity = Entity.objects.create(legal_name=name, address=self._placeholder())
+                party = Party.objects.create(type=party_type, entity=entity)
+            else:
+                last, _, first = name.partition(",")
+                person = Person.objects.create(first_name=first.strip(), last_name=last.strip(), address=self._placeholder())
+                party = Party.objects.create(type=party_type, person=person)
+            self.parties[lookup] = party.id
+            self._txn_created.append((self.parties, lookup))
+            self.result.parties_created += 1
+        return self.parties[lookup]
+
+    def _share_class(self, corp, row):
+        name = _text(row, "share_class")
+        if not name:
+            raise RowError("share_class manquant.")
+        key = (corp.id, _normalize(name))
+        if key not in self.classes:
+            self.classes[key] = ShareClass.objects.create(corp=corp, name=name)
+            self._txn_created.append((self.classes, key))
+            self.result.classes_created += 1
+        return self.classes[key]
+
+    def _build(self, corp, row):
+        kind = _text(row, "kind").lower()
+        common = {"corp": corp, "share_class": self._share_class(corp, row), "quantity": _quantity(row)}
+        if kind == "issuance":
+            return kind, ShareIssuance(
+                to_holder_id=self._party_id(row, "to_holder"), occurred_on=_date(row, "occurred_on"),
+                consideration=_text(row, "consideration"), resolution_ref=_text(row, "resolution_ref"), **common)
+        if kind == "transfer":
+            return kind, ShareTransfer(
+                from_holder_id=self._party_id(row, "from_holder"), to_holder_id=self._party_id(row, "to_holder"),
+                occurred_on=_date(row, "occurred_on"), consideration=_text(row, "consideration"), **common)
+        if kind == "redemption":
+            return kind, ShareRedemption(
+                from_holder_id=self._party_id(row, "from_holder"), occurred_on=_date(row, "occurred_on"), **common)
+        if kind == "certificate":
+            if not _text(row, "number"):
+                raise RowError("number manquant pour un certificat.")
+            return kind, ShareCertificate(
+                holder_id=self._party_id(row, "to_holder"), number=_text(row, "number"),
+                issued_on=_date(row, "occurred_on"), cancelled_on=_date(row, "cancelled_on", required=False),
+                reason_cancelled=_text(row, "reason_cancelled"), **common)
+        raise RowError(f"kind invalide : {kind!r}.")
+
+    def _flush(self, pending):
+        models = {"issuance": ShareIssuance, "transfer": ShareTransfer, "redemption": ShareRedemption, "certificate": ShareCertificate}
+        for kind, objs in pending.items():
+            if objs:
+                models[kind].objects.bulk_create(objs, batch_size=self.batch_size)
+                objs.clear()
+
+    def _forget_rolled_back(self):
+        for table, key in self._txn_created:
+            if table is None:
+                self._placeholder_address = None
+            else:
+                table.pop(key, None)
+        self._txn_created = []
+
+    def _import_corp(self, corp, rows):
+        pending = {"issuance": [], "transfer": [], "redemption": [], "certificate": []}
+        created = dict.fromkeys(pending, 0)
+        first_line = last_line = None
+        self._txn_created = []
+        try:
+            with transaction.atomic():
+                buffered = 0
+                for line, row in rows:
+                    first_line = first_line or line
+                    last_line = line
+                    self.result.rows += 1
+                    try:
+                        kind, obj = self._build(corp, row)
+                    except RowError as exc:
+                        self.result.add_error(line, str(exc))
+                        continue
+                    pending[kind].append(obj)
+                    created[kind] += 1
+                    buffered += 1
+                    if buffered >= self.batch_size:
+                        self._flush(pending)
+                        buffered = 0
+                self._flush(pending)
+                rebuild_cap_table_positions(corp)
+                if self.dry_run:
+                    transaction.set_rollback(True)
+                    self._forget_rolled_back()
+        except DatabaseError as exc:
+            self._forget_rolled_back()
+            self.result.add_error(first_line, f"Société {corp.id} : lignes {first_line}–{last_line} annulées ({exc}).")
+            return
+        for kind, count in created.items():
+            self.result.created[kind] += count
+
+    def run(self, rows):
+        """Importe un itérable de (ligne, dict) ; les lignes sont regroupées par société consécutive."""
+        def corp_key(item):
+            return _text(item[1], "corp")
+
+        for key, group in groupby(rows, key=corp_key):
+            corp = self.corps.get(key)
+            if corp is None:
+                for line, _ in group:
+                    self.result.rows += 1
+                    self.result.add_error(line, f"Société inconnue dans cette organisation : {key!r}.")
+                continue
+            self._import_corp(corp, group)
+        return self.result
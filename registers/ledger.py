@@ -0,0 +1,89 @@
+"""Écritures du registre (émissions, transferts, rachats) avec contrôle de solde.
+
+Le solde du cédant est lu sur sa position matérialisée, verrouillée (`SELECT … FOR UPDATE`)
+jusqu'à la fin de la transaction : deux transferts simultanés du même détenteur sont
+sérialisés, sans verrouiller le reste du registre. Une écriture antidatée relit en plus
+l'historique du cédant : son solde ne doit devenir négatif à aucune date postérieure.
+"""
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+
+from .models import (CapTablePosition, ShareIssuance, ShareRedemption, ShareTransfer, SignedLedgerEntry,
+                     compute_cap_table_as_of)
+
+class InsufficientShares(ValidationError):
+    pass
+
+def _lock_position(corp, holder, share_class):
+    lookup = {"corp_id": corp.id, "holder_id": holder.id, "share_class_id": share_class.id}
+    position = CapTablePosition.objects.select_for_update().filter(**lookup).first()
+    if position is None:
+        try:
+            with transaction.atomic():
+                position = CapTablePosition.objects.create(quantity=0, **lookup)
+        except IntegrityError:
+            position = CapTablePosition.objects.select_for_update().get(**lookup)
+    return position
+
+def _validate(corp, share_class, quantity):
+    if share_class.corp_id != corp.id:
+        raise ValidationError("La classe d'actions n'appartient pas à cette société.")
+    if quantity <= 0:
+        raise ValidationError("La quantité doit être positive.")
+
+def _lowest_balance_since(corp, holder, share_class, occurred_on):
+    """Plus petit solde du détenteur en fin de journée à partir de `occurred_on`, ou None sans mouvement postérieur."""
+    later = list(SignedLedgerEntry.objects
+                 .filter(corp=corp, holder=holder, share_class=share_class, occurred_on__gt=occurred_on)
+                 .values("occurred_on").annotate(qty=Sum("quantity")).order_by("occurred_on"))
+    if not later:
+        return None  # solde courant = solde à cette date : la position suffit
+    balance = lowest = compute_cap_table_as_of(corp, occurred_on).get((holder.id, share_class.id), 0)
+    for row in later:
+        balance += row["qty"]
+        lowest = min(lowest, balance)
+    return lowest
+
+def _debit(corp, holder, share_class, quantity, occurred_on):
+    position = _lock_position(corp, holder, share_class)
+    if position.quantity < quantity:
+        raise InsufficientShares(
+            f"Solde insuffisant : le détenteur {holder.id} détient {position.quantity} action(s) "
+            f"de la classe « {share_class.name} », {quantity} demandée(s)."
+        )
+    # Écriture antidatée : les cap tables historiques ne doivent jamais passer sous zéro
+    lowest = _lowest_balance_since(corp, holder, share_class, occurred_on)
+    if lowest is not None and lowest < quantity:
+        raise InsufficientShares(
+            f"Solde insuffisant au {occurred_on} ou après : le détenteur {holder.id} détient au plus "
+            f"{lowest} action(s) de la classe « {share_class.name} » sur la période, {quantity} demandée(s)."
+        )
+
+@transaction.atomic
+def issue_shares(*, corp, share_class, to_holder, quantity, occurred_on, consideration="", resolution_ref=""):
+    _validate(corp, share_class, quantity)
+    return ShareIssuance.objects.create(
+        corp=corp, share_class=share_class, to_holder=to_holder, quantity=quantity,
+        occurred_on=occurred_on, consideration=consideration, resolution_ref=resolution_ref,
+    )
+
+@transaction.atomic
+def transfer_shares(*, corp, share_class, from_holder, to_holder, quantity, occurred_on, consideration=""):
+    _validate(corp, share_class, quantity)
+    if from_holder.id == to_holder.id:
+        raise ValidationError("Le cédant et le cessionnaire doivent être différents.")
+    _debit(corp, from_holder, share_class, quantity, occurred_on)
+    return ShareTransfer.objects.create(
+        corp=corp, share_class=share_class, from_holder=from_holder, to_holder=to_holder,
+        quantity=quantity, occurred_on=occurred_on, consideration=consideration,
+    )
+
+@transaction.atomic
+def redeem_shares(*, corp, share_class, from_holder, quantity, occurred_on):
+    _validate(corp, share_class, quantity)
+    _debit(corp, from_holder, share_class, quantity, occurred_on)
+    return ShareRedemption.objects.create(
+        corp=corp, share_class=share_class, from_holder=from_holder,
+        quantity=quantity, occurred_on=occurred_on,
+    )
@@ -0,0 +1,106 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from accounts.models import User
+from corps.models import Address, Corporation, Party
+from orgs.models import Organization
+from registers.models import (
+    ShareClass, ShareIssuance, ShareTransfer, ShareRedemption,
+    compute_cap_table, get_cap_table, rebuild_cap_table_positions,
+)
+
+def _four_pass_cap_table(corp):
+    # Ancienne implémentation (4 requêtes groupées fusionnées en Python), gardée pour comparaison
+    result = {}
+    for model, holder, sign in (
+        (ShareIssuance, "to_holder", 1),
+        (ShareTransfer, "from_holder", -1),
+        (ShareTransfer, "to_holder", 1),
+        (ShareRedemption, "from_holder", -1),
+    ):
+        for row in model.objects.filter(corp=corp).values(holder, "share_class").annotate(qty=Sum("quantity")):
+            key = (row[holder], row["share_class"])
+            result[key] = result.get(key, 0) + sign * row["qty"]
+    return result
+
+class _Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = "Compare les calculs de cap table sur une société synthétique (données annulées à la fin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--transactions", type=int, default=100_000)
+        parser.add_argument("--holders", type=int, default=500)
+        parser.add_argument("--classes", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(**options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, transactions, holders, classes, seed, **_):
+        rnd = random.Random(seed)
+        owner = User.objects.create(username=f"bench-{seed}-{time.time_ns()}")
+        org = Organization.objects.create(name="Benchmark", owner=owner)
+        address = Address.objects.create(line1="1 rue du Test", city="Montréal", province_state="QC", postal_code="H0H 0H0")
+        corp = Corporation.objects.create(org=org, legal_name="Benchmark inc.", jurisdiction=Corporation.Jurisdiction.QC,
+                                          registered_office=address, records_office=address)
+        parties = Party.objects.bulk_create([Party(type=Party.Type.PERSON) for _ in range(holders)])
+        share_classes = ShareClass.objects.bulk_create([ShareClass(corp=corp, name=f"Classe {i}") for i in range(classes)])
+        start = date(1970, 1, 1)
+        rows = {ShareIssuance: [], ShareTransfer: [], ShareRedemption: []}
+        for n in range(transactions):
+            common = {
+                "corp": corp,
+                "share_class": rnd.choice(share_classes),
+                "quantity": rnd.randint(1, 1000),
+                "occurred_on": start + timedelta(days=n * 20000 // transactions),
+            }
+            kind = rnd.random()
+            if kind < 0.5:
+                rows[ShareIssuance].append(ShareIssuance(to_holder=rnd.choice(parties), **common))
+            elif kind < 0.9:
+                rows[ShareTransfer].append(ShareTransfer(from_holder=rnd.choice(parties), to_holder=rnd.choice(parties), **common))
+            else:
+                rows[ShareRedemption].append(ShareRedemption(from_holder=rnd.choice(parties), **common))
+        for model, objs in rows.items():
+            model.objects.bulk_create(objs, batch_size=5000)
+        rebuild_cap_table_positions(corp)
+        return corp
+
+    def _time(self, func, corp, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func(corp)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def _run(self, repeat, **options):
+        self.stdout.write(f"Génération de {options['transactions']} mouvements ({connection.vendor})…")
+        corp = self._seed(**options)
+        timings = [
+            ("4 requêtes (ancienne)", _four_pass_cap_table),
+            ("grand livre signé", compute_cap_table),
+            ("positions matérialisées", get_cap_table),
+        ]
+        reference = None
+        for label, func in timings:
+            best, result = self._time(func, corp, repeat)
+            result = {key: qty for key, qty in result.items() if qty}
+            if reference is None:
+                reference = result
+            status = "ok" if result == reference else "RÉSULTAT DIFFÉRENT"
+            self.stdout.write(f"{label:<26} {best * 1000:9.1f} ms  ({len(result)} positions, {status})")
@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from registers.analytics import OwnershipMatrix
+
+def _python_report(rows, voting):
+    # Référence « ligne à ligne » sur des dicts, comme on le ferait depuis compute_cap_table
+    shares, votes, class_totals = {}, {}, {}
+    for holder_id, class_id, qty in rows:
+        shares[holder_id] = shares.get(holder_id, 0) + qty
+        class_totals[class_id] = class_totals.get(class_id, 0) + qty
+        if voting[class_id]:
+            votes[holder_id] = votes.get(holder_id, 0) + qty
+    total, total_votes = sum(shares.values()), sum(votes.values())
+    by_class = {(h, k): q / class_totals[k] for h, k, q in rows}
+    fully_diluted = {h: q / total for h, q in shares.items()}
+    voting_power = {h: votes.get(h, 0) / total_votes for h in shares}
+    hhi = sum(p * p for p in voting_power.values())
+    return fully_diluted, voting_power, by_class, hhi
+
+class Command(BaseCommand):
+    help = "Compare l'analyse de détention vectorisée (NumPy) à un calcul Python ligne à ligne"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--holders", type=int, default=5000)
+        parser.add_argument("--classes", type=int, default=50)
+        parser.add_argument("--density", type=float, default=0.2, help="Proportion de couples (détenteur, classe) non nuls.")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, holders, classes, density, repeat, seed, **options):
+        rng = np.random.default_rng(seed)
+        mask = rng.random((holders, classes)) < density
+        h, c = np.nonzero(mask)
+        q = rng.integers(1, 10_000, size=h.size)
+        class_voting = rng.random(classes) < 0.6
+        class_voting[0] = True
+        rows = list(zip(h.tolist(), c.tolist(), q.tolist()))
+        voting = dict(enumerate(class_voting.tolist()))
+        self.stdout.write(f"{len(rows)} positions, {holders} détenteurs × {classes} classes")
+
+        def vectorized():
+            matrix = OwnershipMatrix.from_rows(h, c, q, class_voting[c])
+            power = matrix.voting_power()
+            return matrix.fully_diluted(), power, matrix.class_ownership(), float(np.square(power).sum())
+
+        timings = {}
+        for label, func in (("python", lambda: _python_report(rows, voting)), ("numpy", vectorized)):
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                result = func()
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[label] = (best, result)
+            self.stdout.write(f"{label:<8} {best * 1000:9.1f} ms")
+        hhi_py, hhi_np = timings["python"][1][3], timings["numpy"][1][3]
+        status = "ok" if abs(hhi_py - hhi_np) < 1e-9 else "RÉSULTAT DIFFÉRENT"
+        self.stdout.write(f"Accélération ×{timings['python'][0] / timings['numpy'][0]:.1f} (HHI des voix {status})")
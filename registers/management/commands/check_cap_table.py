@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from corps.models import Corporation
+from registers.models import check_cap_table_positions
+
+class Command(BaseCommand):
+    help = "Compare les positions matérialisées au recalcul complet du registre"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corp", type=int, action="append", dest="corp_ids", help="ID de société (répétable). Défaut : toutes.")
+
+    def handle(self, *args, **options):
+        corps = Corporation.objects.order_by("id")
+        if options["corp_ids"]:
+            corps = corps.filter(id__in=options["corp_ids"])
+        mismatches = 0
+        for corp in corps.iterator():
+            for holder_id, class_id, expected, actual in check_cap_table_positions(corp):
+                mismatches += 1
+                self.stdout.write(f"✗ corp={corp.id} holder={holder_id} class={class_id}  attendu={expected} matérialisé={actual}")
+        if mismatches:
+            raise CommandError(f"{mismatches} écart(s) détecté(s). Corriger avec `manage.py rebuild_cap_table`.")
+        self.stdout.write(self.style.SUCCESS("Positions cohérentes."))
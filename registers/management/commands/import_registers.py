@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from orgs.models import Organization
+from registers.importer import RegisterImporter, iter_rows
+
+class Command(BaseCommand):
+    help = "Importe des mouvements de registre (CSV/XLSX) pour une migration de livre papier"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Fichier .csv ou .xlsx")
+        parser.add_argument("--org", type=int, required=True, help="ID de l'organisation")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--dry-run", action="store_true", help="Valide et annule sans rien enregistrer")
+
+    def handle(self, *args, **options):
+        try:
+            org = Organization.objects.get(id=options["org"])
+        except Organization.DoesNotExist:
+            raise CommandError("Organisation introuvable.")
+        importer = RegisterImporter(org, batch_size=options["batch_size"], dry_run=options["dry_run"])
+        with open(options["path"], "rb") as fh:
+            result = importer.run(iter_rows(fh, options["path"]))
+        for line, message in result.errors:
+            self.stdout.write(f"✗ ligne {line} : {message}")
+        if result.error_count > len(result.errors):
+            self.stdout.write(f"… {result.error_count - len(result.errors)} autre(s) erreur(s) non affichée(s).")
+        created = ", ".join(f"{kind}={count}" for kind, count in result.created.items())
+        prefix = "Simulation terminée" if options["dry_run"] else "Terminé"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}. {result.rows} ligne(s) lue(s) : {created} ; "
+            f"{result.parties_created} détenteur(s) et {result.classes_created} classe(s) créé(s) ; "
+            f"{result.error_count} erreur(s)."
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from corps.models import Corporation
+from registers.models import rebuild_cap_table_positions
+
+class Command(BaseCommand):
+    help = "Reconstruit les positions matérialisées (CapTablePosition) depuis l'historique du registre"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corp", type=int, action="append", dest="corp_ids", help="ID de société (répétable). Défaut : toutes.")
+
+    def handle(self, *args, **options):
+        corps = Corporation.objects.order_by("id")
+        if options["corp_ids"]:
+            corps = corps.filter(id__in=options["corp_ids"])
+        count = 0
+        for corp in corps.iterator():
+            rebuild_cap_table_positions(corp)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Terminé. {count} société(s) reconstruite(s)."))
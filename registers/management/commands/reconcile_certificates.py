@@ -0,0 +1,47 @@
+import csv
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from corps.models import Corporation
+from registers.reconciliation import REPORT_FIELDS, init_worker, reconcile, reconcile_chunk
+
+class Command(BaseCommand):
+    help = "Rapproche les certificats en circulation avec le registre, pour toutes les sociétés"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corp", type=int, action="append", dest="corp_ids", help="ID de société (répétable). Défaut : toutes.")
+        parser.add_argument("--workers", type=int, default=1, help="Processus parallèles (défaut : 1, sans sous-processus).")
+        parser.add_argument("--chunk-size", type=int, default=200, help="Sociétés par tâche.")
+        parser.add_argument("--output", help="Rapport CSV des écarts (défaut : sortie standard).")
+
+    def handle(self, *args, **options):
+        corps = Corporation.objects.order_by("id")
+        if options["corp_ids"]:
+            corps = corps.filter(id__in=options["corp_ids"])
+        corp_ids = list(corps.values_list("id", flat=True))
+        size = options["chunk_size"]
+        chunks = [corp_ids[i:i + size] for i in range(0, len(corp_ids), size)]
+        if options["workers"] > 1 and len(chunks) > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options["workers"], initializer=init_worker) as pool:
+                results = list(pool.map(reconcile_chunk, chunks))
+        else:
+            results = [reconcile(chunk) for chunk in chunks]
+
+        out = open(options["output"], "w", newline="", encoding="utf-8") if options["output"] else sys.stdout
+        try:
+            writer = csv.writer(out)
+            writer.writerow(REPORT_FIELDS)
+            count = 0
+            for discrepancies in results:
+                for corp_id, holder_id, class_id, ledger, certificates in discrepancies:
+                    writer.writerow([corp_id, holder_id, class_id, ledger, certificates, certificates - ledger])
+                    count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        style = self.style.WARNING if count else self.style.SUCCESS
+        self.stderr.write(style(f"{len(corp_ids)} société(s) rapprochée(s), {count} écart(s)."))
@@ -0,0 +1,26 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from corps.models import Corporation
+from registers.models import take_cap_table_snapshots
+
+class Command(BaseCommand):
+    help = "Crée les instantanés de cap table de fin d'exercice manquants"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corp", type=int, action="append", dest="corp_ids", help="ID de société (répétable). Défaut : toutes.")
+        parser.add_argument("--until", help="Date limite AAAA-MM-JJ (défaut : aujourd'hui).")
+
+    def handle(self, *args, **options):
+        until = None
+        if options["until"]:
+            try:
+                until = date.fromisoformat(options["until"])
+            except ValueError:
+                raise CommandError("--until doit être au format AAAA-MM-JJ.")
+        corps = Corporation.objects.order_by("id")
+        if options["corp_ids"]:
+            corps = corps.filter(id__in=options["corp_ids"])
+        created = 0
+        for corp in corps.iterator():
+            created += len(take_cap_table_snapshots(corp, until=until))
+        self.stdout.write(self.style.SUCCESS(f"Terminé. {created} instantané(s) créé(s)."))
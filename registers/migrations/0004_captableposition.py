@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_positions(apps, schema_editor):
+    ShareIssuance = apps.get_model("registers", "ShareIssuance")
+    ShareTransfer = apps.get_model("registers", "ShareTransfer")
+    ShareRedemption = apps.get_model("registers", "ShareRedemption")
+    CapTablePosition = apps.get_model("registers", "CapTablePosition")
+    totals = {}
+    for model, holder, sign in (
+        (ShareIssuance, "to_holder", 1),
+        (ShareTransfer, "from_holder", -1),
+        (ShareTransfer, "to_holder", 1),
+        (ShareRedemption, "from_holder", -1),
+    ):
+        for row in model.objects.values("corp", holder, "share_class").annotate(qty=Sum("quantity")):
+            key = (row["corp"], row[holder], row["share_class"])
+            totals[key] = totals.get(key, 0) + sign * row["qty"]
+    CapTablePosition.objects.bulk_create(
+        [
+            CapTablePosition(corp_id=corp_id, holder_id=holder_id, share_class_id=class_id, quantity=qty)
+            for (corp_id, holder_id, class_id), qty in totals.items()
+            if qty
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corps', '0006_alter_address_options_alter_corporation_options_and_more'),
+        ('registers', '0003_alter_sharecertificate_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapTablePosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('corp', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cap_table_positions', to='corps.corporation')),
+                ('holder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='corps.party')),
+                ('share_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='registers.shareclass')),
+            ],
+            options={
+                'unique_together': {('corp', 'holder', 'share_class')},
+            },
+        ),
+        migrations.RunPython(populate_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corps', '0006_alter_address_options_alter_corporation_options_and_more'),
+        ('registers', '0004_captableposition'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapTableSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('positions', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('corp', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cap_table_snapshots', to='corps.corporation')),
+            ],
+            options={
+                'unique_together': {('corp', 'as_of')},
+            },
+        ),
+    ]
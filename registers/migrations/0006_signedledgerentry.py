@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+SIGNED_LEDGER_VIEW = """
+CREATE VIEW registers_signedledgerentry AS
+    SELECT 'ISS' AS kind, id AS entry_id, corp_id, to_holder_id AS holder_id, share_class_id,
+           quantity, occurred_on
+      FROM registers_shareissuance
+    UNION ALL
+    SELECT 'TRO', id, corp_id, from_holder_id, share_class_id, -quantity, occurred_on
+      FROM registers_sharetransfer
+    UNION ALL
+    SELECT 'TRI', id, corp_id, to_holder_id, share_class_id, quantity, occurred_on
+      FROM registers_sharetransfer
+    UNION ALL
+    SELECT 'RED', id, corp_id, from_holder_id, share_class_id, -quantity, occurred_on
+      FROM registers_shareredemption
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registers', '0005_captablesnapshot'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SIGNED_LEDGER_VIEW, "DROP VIEW IF EXISTS registers_signedledgerentry"),
+        migrations.CreateModel(
+            name='SignedLedgerEntry',
+            fields=[
+                ('pk', models.CompositePrimaryKey('kind', 'entry_id', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('ISS', 'Émission'), ('TRO', 'Transfert (sortant)'), ('TRI', 'Transfert (entrant)'), ('RED', 'Rachat')], max_length=3)),
+                ('entry_id', models.BigIntegerField()),
+                ('quantity', models.BigIntegerField()),
+                ('occurred_on', models.DateField()),
+            ],
+            options={
+                'db_table': 'registers_signedledgerentry',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('corps', '0007_entity_corporation'),
+        ('registers', '0006_signedledgerentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CapTableRevision',
+            fields=[
+                ('corp', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='corps.corporation')),
+                ('revision', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+import calendar
+from datetime import date
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Min
+from django.utils import timezone
 from corps.models import Corporation, Party
 
 class ShareClass(models.Model):
@@ -21,7 +25,97 @@ class ShareCertificate(models.Model):
     cancelled_on = models.DateField(null=True, blank=True)
     reason_cancelled = models.CharField(max_length=200, blank=True)
 
-class ShareIssuance(models.Model):
+class CapTablePosition(models.Model):
+    """Position matérialisée (société, détenteur, classe), tenue à jour par les écritures du registre."""
+    corp = models.ForeignKey(Corporation, on_delete=models.CASCADE, related_name="cap_table_positions")
+    holder = models.ForeignKey(Party, on_delete=models.CASCADE, related_name="+")
+    share_class = models.ForeignKey(ShareClass, on_delete=models.CASCADE, related_name="+")
+    quantity = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("corp", "holder", "share_class")
+
+def apply_position_deltas(deltas):
+    """Applique [(corp_id, holder_id, class_id, ±qty)] aux positions (UPDATE atomique, sinon INSERT)."""
+    merged = {}
+    for corp_id, holder_id, class_id, qty in deltas:
+        key = (corp_id, holder_id, class_id)
+        merged[key] = merged.get(key, 0) + qty
+    # Ordre stable → verrous de lignes toujours pris dans le même ordre
+    for (corp_id, holder_id, class_id), qty in sorted(merged.items()):
+        if not qty:
+            continue
+        lookup = {"corp_id": corp_id, "holder_id": holder_id, "share_class_id": class_id}
+        if CapTablePosition.objects.filter(**lookup).update(quantity=F("quantity") + qty):
+            continue
+        try:
+            with transaction.atomic():
+                CapTablePosition.objects.create(quantity=qty, **lookup)
+        except IntegrityError:
+            # Créée en parallèle entre l'UPDATE et l'INSERT
+            CapTablePosition.objects.filter(**lookup).update(quantity=F("quantity") + qty)
+    bump_cap_table_revisions(corp_id for (corp_id, _, _), qty in merged.items() if qty)
+
+class CapTableRevision(models.Model):
+    """Compteur incrémenté à chaque changement des positions d'une société.
+
+    Permet aux graphes de détention gardés en mémoire (registers.ownership) de ne recharger que
+    les sociétés modifiées depuis, y compris par un autre processus.
+    """
+    corp = models.OneToOneField(Corporation, on_delete=models.CASCADE, primary_key=True, related_name="+")
+    revision = models.PositiveBigIntegerField(default=0)
+
+def bump_cap_table_revisions(corp_ids):
+    for corp_id in sorted(set(corp_ids)):
+        if CapTableRevision.objects.filter(corp_id=corp_id).update(revision=F("revision") + 1):
+            continue
+        try:
+            with transaction.atomic():
+                CapTableRevision.objects.create(corp_id=corp_id, revision=1)
+        except IntegrityError:
+            CapTableRevision.objects.filter(corp_id=corp_id).update(revision=F("revision") + 1)
+
+def lock_cap_table(corp_id):
+    """Verrouille la ligne de révision d'une société jusqu'à la fin de la transaction en cours.
+
+    Sérialise les mouvements (invalidation des instantanés) et la prise d'instantanés.
+    """
+    CapTableRevision.objects.select_for_update().get_or_create(corp_id=corp_id)
+
+class LedgerEntry(models.Model):
+    """Mouvement du registre des valeurs mobilières.
+
+    save() et les suppressions (signal post_delete : instance, QuerySet.delete(), action
+    « supprimer » de l'admin) répercutent l'écriture sur CapTablePosition dans la même transaction
+    et invalident les instantanés (CapTableSnapshot) postérieurs à la date du mouvement.
+    QuerySet.update et bulk_create n'y passent pas : utiliser ensuite
+    `rebuild_cap_table_positions` (commande `rebuild_cap_table`).
+    """
+    class Meta:
+        abstract = True
+
+    def position_deltas(self):
+        """[(corp_id, holder_id, class_id, ±qty)] produits par ce mouvement."""
+        raise NotImplementedError
+
+    def _stored(self):
+        if self.pk is None:
+            return None
+        return type(self).objects.select_for_update().filter(pk=self.pk).first()
+
+    @staticmethod
+    def _reverted_deltas(stored):
+        return [(c, h, k, -q) for c, h, k, q in stored.position_deltas()] if stored else []
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            stored = self._stored()
+            super().save(*args, **kwargs)
+            apply_position_deltas(self._reverted_deltas(stored) + self.position_deltas())
+            invalidate_cap_table_snapshots([e for e in (stored, self) if e])
+
+
+class ShareIssuance(LedgerEntry):
     corp = models.ForeignKey(Corporation, on_delete=models.CASCADE)
     share_class = models.ForeignKey(ShareClass, on_delete=models.PROTECT)
     to_holder = models.ForeignKey(Party, on_delete=models.PROTECT, related_name="issuances")
@@ -30,7 +124,10 @@ class ShareIssuance(models.Model):
     resolution_ref = models.CharField(max_length=255, blank=True)
     occurred_on = models.DateField()
 
-class ShareTransfer(models.Model):
+    def position_deltas(self):
+        return [(self.corp_id, self.to_holder_id, self.share_class_id, self.quantity)]
+
+class ShareTransfer(LedgerEntry):
     corp = models.ForeignKey(Corporation, on_delete=models.CASCADE)
     share_class = models.ForeignKey(ShareClass, on_delete=models.PROTECT)
     from_holder = models.ForeignKey(Party, on_delete=models.PROTECT, related_name="transfers_out")
@@ -39,44 +136,209 @@ class ShareTransfer(models.Model):
     occurred_on = models.DateField()
     consideration = models.CharField(max_length=255, blank=True)
 
-class ShareRedemption(models.Model):
+    def position_deltas(self):
+        return [
+            (self.corp_id, self.from_holder_id, self.share_class_id, -self.quantity),
+            (self.corp_id, self.to_holder_id, self.share_class_id, self.quantity),
+        ]
+
+class ShareRedemption(LedgerEntry):
     corp = models.ForeignKey(Corporation, on_delete=models.CASCADE)
     share_class = models.ForeignKey(ShareClass, on_delete=models.PROTECT)
     from_holder = models.ForeignKey(Party, on_delete=models.PROTECT)
     quantity = models.PositiveIntegerField()
     occurred_on = models.DateField()
 
+    def position_deltas(self):
+        return [(self.corp_id, self.from_holder_id, self.share_class_id, -self.quantity)]
+
+class SignedLedgerEntry(models.Model):
+    """Vue SQL `registers_signedledgerentry` : chaque mouvement en lignes ±quantité par détenteur.
+
+    ISS : émission (+), TRO/TRI : transfert sortant (−) / entrant (+), RED : rachat (−).
+    La vue est créée par la migration 0006 (UNION ALL compatible SQLite et PostgreSQL).
+    """
+    class Kind(models.TextChoices):
+        ISSUANCE = "ISS", "Émission"
+        TRANSFER_OUT = "TRO", "Transfert (sortant)"
+        TRANSFER_IN = "TRI", "Transfert (entrant)"
+        REDEMPTION = "RED", "Rachat"
+
+    pk = models.CompositePrimaryKey("kind", "entry_id")
+    kind = models.CharField(max_length=3, choices=Kind.choices)
+    entry_id = models.BigIntegerField()
+    corp = models.ForeignKey(Corporation, on_delete=models.DO_NOTHING, related_name="+")
+    holder = models.ForeignKey(Party, on_delete=models.DO_NOTHING, related_name="+")
+    share_class = models.ForeignKey(ShareClass, on_delete=models.DO_NOTHING, related_name="+")
+    quantity = models.BigIntegerField()
+    occurred_on = models.DateField()
+
+    class Meta:
+        managed = False
+        db_table = "registers_signedledgerentry"
+
+class CapTableSnapshot(models.Model):
+    """Cap table figée à une date (fin d'exercice) : point de départ des calculs à une date donnée."""
+    corp = models.ForeignKey(Corporation, on_delete=models.CASCADE, related_name="cap_table_snapshots")
+    as_of = models.DateField()
+    positions = models.JSONField(default=list)  # [[holder_id, class_id, qty], ...]
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("corp", "as_of")
+
+    def to_cap_table(self):
+        return {(holder_id, class_id): qty for holder_id, class_id, qty in self.positions}
+
+def invalidate_cap_table_snapshots(entries):
+    """Supprime les instantanés devenus faux après l'écriture/suppression de ces mouvements."""
+    earliest = {}
+    for entry in entries:
+        if entry.corp_id not in earliest or entry.occurred_on < earliest[entry.corp_id]:
+            earliest[entry.corp_id] = entry.occurred_on
+    for corp_id, occurred_on in sorted(earliest.items()):
+        lock_cap_table(corp_id)  # attend un instantané en cours, qui sera supprimé s'il est faux
+        CapTableSnapshot.objects.filter(corp_id=corp_id, as_of__gte=occurred_on).delete()
+
 # Utilitaire: cap table (agrégation ORM)
 from django.db.models import Sum
 
+def _ledger_totals(corp: Corporation, after=None, until=None):
+    """{ (holder_id, class_id): qty } des mouvements datés dans ]after, until] (bornes optionnelles)."""
+    dates = {}
+    if after is not None:
+        dates["occurred_on__gt"] = after
+    if until is not None:
+        dates["occurred_on__lte"] = until
+    # Une seule requête groupée sur le grand livre signé (vue SQL)
+    return {
+        (row["holder"], row["share_class"]): row["qty"]
+        for row in (SignedLedgerEntry.objects
+                    .filter(corp=corp, **dates)
+                    .values("holder", "share_class")
+                    .annotate(qty=Sum("quantity"))
+                    .order_by())
+    }
+
 def compute_cap_table(corp: Corporation):
     """Retourne { (holder_id, class_id): qty } en tenant compte émissions, transferts, rachats."""
-    result = {}
-    # Issuances
-    for row in (ShareIssuance.objects
-                .filter(corp=corp)
-                .values("to_holder", "share_class")
-                .annotate(qty=Sum("quantity"))):
-        result[(row["to_holder"], row["share_class"])] = result.get((row["to_holder"], row["share_class"]), 0) + row["qty"]
-    # Transfers out
-    for row in (ShareTransfer.objects
-                .filter(corp=corp)
-                .values("from_holder", "share_class")
-                .annotate(qty=Sum("quantity"))):
-        key = (row["from_holder"], row["share_class"])
-        result[key] = result.get(key, 0) - row["qty"]
-    # Transfers in
-    for row in (ShareTransfer.objects
-                .filter(corp=corp)
-                .values("to_holder", "share_class")
-                .annotate(qty=Sum("quantity"))):
-        key = (row["to_holder"], row["share_class"])
-        result[key] = result.get(key, 0) + row["qty"]
-    # Redemptions
-    for row in (ShareRedemption.objects
-                .filter(corp=corp)
-                .values("from_holder", "share_class")
-                .annotate(qty=Sum("quantity"))):
-        key = (row["from_holder"], row["share_class"])
-        result[key] = result.get(key, 0) - row["qty"]
+    return _ledger_totals(corp)
+
+def _group_by_corp(rows, qty_field):
+    corp_id, table = None, {}
+    for row in rows:
+        if row["corp"] != corp_id:
+            if corp_id is not None:
+                yield corp_id, table
+            corp_id, table = row["corp"], {}
+        table[(row["holder"], row["share_class"])] = row[qty_field]
+    if corp_id is not None:
+        yield corp_id, table
+
+def compute_cap_tables(corps, chunk_size=2000):
+    """Génère (corp_id, cap table) pour plusieurs sociétés, en une requête groupée (corp, holder, class).
+
+    `corps` : QuerySet ou liste d'ids/instances. Les sociétés sans mouvement sont omises ;
+    l'ordre est celui des ids de société.
+    """
+    rows = (SignedLedgerEntry.objects
+            .filter(corp__in=corps)
+            .values("corp", "holder", "share_class")
+            .annotate(qty=Sum("quantity"))
+            .order_by("corp", "holder", "share_class")
+            .iterator(chunk_size=chunk_size))
+    yield from _group_by_corp(rows, "qty")
+
+def get_cap_tables(corps, chunk_size=2000):
+    """Comme compute_cap_tables, mais lu depuis les positions matérialisées (positions nulles omises)."""
+    rows = (CapTablePosition.objects
+            .filter(corp__in=corps)
+            .exclude(quantity=0)
+            .values("corp", "holder", "share_class", "quantity")
+            .order_by("corp", "holder", "share_class")
+            .iterator(chunk_size=chunk_size))
+    yield from _group_by_corp(rows, "quantity")
+
+def compute_cap_table_as_of(corp: Corporation, as_of):
+    """Cap table à la date `as_of` (incluse) : dernier instantané antérieur + mouvements postérieurs."""
+    snapshot = corp.cap_table_snapshots.filter(as_of__lte=as_of).order_by("-as_of").first()
+    if snapshot is None:
+        return _ledger_totals(corp, until=as_of)
+    result = snapshot.to_cap_table()
+    for key, qty in _ledger_totals(corp, after=snapshot.as_of, until=as_of).items():
+        result[key] = result.get(key, 0) + qty
     return result
+
+def fiscal_year_ends(corp: Corporation, start, end):
+    """Dates de fin d'exercice de la société comprises dans [start, end]."""
+    ends = []
+    for year in range(start.year, end.year + 1):
+        day = min(corp.fiscal_year_end_day, calendar.monthrange(year, corp.fiscal_year_end_month)[1])
+        fye = date(year, corp.fiscal_year_end_month, day)
+        if start <= fye <= end:
+            ends.append(fye)
+    return ends
+
+def take_cap_table_snapshots(corp: Corporation, until=None):
+    """Crée les instantanés de fin d'exercice manquants jusqu'à `until` (défaut : aujourd'hui).
+
+    Chaque instantané est dérivé du précédent : seul un exercice de mouvements est rejoué.
+    """
+    until = until or timezone.localdate()
+    with transaction.atomic():
+        # Un mouvement antidaté attend la fin de la transaction pour invalider les instantanés
+        lock_cap_table(corp.id)
+        first = min(filter(None, (
+            model.objects.filter(corp=corp).aggregate(first=Min("occurred_on"))["first"]
+            for model in (ShareIssuance, ShareTransfer, ShareRedemption)
+        )), default=None)
+        if first is None:
+            return []
+        existing = set(corp.cap_table_snapshots.values_list("as_of", flat=True))
+        created = []
+        for fye in fiscal_year_ends(corp, first, until):
+            if fye in existing:
+                continue
+            table = compute_cap_table_as_of(corp, fye)
+            created.append(CapTableSnapshot.objects.create(
+                corp=corp,
+                as_of=fye,
+                positions=[[holder_id, class_id, qty] for (holder_id, class_id), qty in sorted(table.items()) if qty],
+            ))
+    return created
+
+def get_cap_table(corp: Corporation):
+    """Comme compute_cap_table, mais lu depuis les positions matérialisées (positions nulles omises)."""
+    return {
+        (row["holder"], row["share_class"]): row["quantity"]
+        for row in (CapTablePosition.objects
+                    .filter(corp=corp)
+                    .exclude(quantity=0)
+                    .values("holder", "share_class", "quantity"))
+    }
+
+def rebuild_cap_table_positions(corp: Corporation):
+    """Recalcule entièrement les positions d'une société depuis l'historique du registre.
+
+    Les instantanés sont aussi supprimés : ils ne sont plus garantis après une opération de masse.
+    """
+    with transaction.atomic():
+        lock_cap_table(corp.id)
+        corp.cap_table_snapshots.all().delete()
+        CapTablePosition.objects.filter(corp=corp).delete()
+        CapTablePosition.objects.bulk_create([
+            CapTablePosition(corp=corp, holder_id=holder_id, share_class_id=class_id, quantity=qty)
+            for (holder_id, class_id), qty in compute_cap_table(corp).items()
+            if qty
+        ])
+        bump_cap_table_revisions([corp.id])
+
+def check_cap_table_positions(corp: Corporation):
+    """Écarts [(holder_id, class_id, attendu, matérialisé)] entre positions et recalcul complet."""
+    expected = {key: qty for key, qty in compute_cap_table(corp).items() if qty}
+    actual = get_cap_table(corp)
+    return [
+        (holder_id, class_id, expected.get((holder_id, class_id), 0), actual.get((holder_id, class_id), 0))
+        for holder_id, class_id in sorted(expected.keys() | actual.keys())
+        if expected.get((holder_id, class_id), 0) != actual.get((holder_id, class_id), 0)
+    ]
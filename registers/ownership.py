@@ -0,0 +1,190 @@
+"""Détention indirecte (ISC/BUO) : graphe de détention entre les sociétés d'une organisation.
+
+Une `Party` dont l'`Entity` est liée à une `Corporation` du graphe est « transparente » : sa
+participation est répartie entre ses propres actionnaires, en multipliant les fractions le long
+de chaque chaîne. Les participations circulaires sont détectées et coupées (seuls les chemins
+simples comptent), ce qui peut laisser un total inférieur à 100 %.
+
+Les graphes sont gardés en mémoire par organisation (`locked_graph`) : à chaque usage, seules
+les sociétés dont la révision de cap table a changé sont rechargées (`refresh`).
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from fractions import Fraction
+
+from corps.models import Party
+from .models import CapTablePosition, CapTableRevision
+
+SIGNIFICANT_CONTROL = Fraction(1, 4)
+_NO_CUT = float("inf")
+# Les liens entité ↔ société (Entity.corporation) changent hors registre : rechargement complet périodique
+GRAPH_TTL = 300
+MAX_GRAPHS = 64
+
+class OwnershipGraph:
+
+    def __init__(self):
+        self.holdings = {}      # corp_id -> {party_id: (fraction des actions, fraction des voix)}
+        self.party_corp = {}    # party_id -> corp_id de la société représentée par l'entité
+        self.party_type = {}    # party_id -> Party.Type
+        self.held_in = {}       # corp_id -> {corp_id des sociétés dont elle est actionnaire}
+        self.cycles = set()
+        self._memo = {}
+
+    @classmethod
+    def for_org(cls, org):
+        """Charge toutes les positions de l'organisation (deux requêtes)."""
+        graph = cls()
+        graph._load(CapTablePosition.objects.filter(corp__org=org, quantity__gt=0))
+        return graph
+
+    def refresh(self, corp_id):
+        """Recharge les positions d'une société après un mouvement, et invalide ce qui en dépend."""
+        self.invalidate(corp_id)
+        for party_id in self.holdings.pop(corp_id, {}):
+            owner_corp = self.party_corp.get(party_id)
+            if owner_corp is not None:
+                self.held_in.get(owner_corp, set()).discard(corp_id)
+        self.cycles = {cycle for cycle in self.cycles if corp_id not in cycle}
+        self._load(CapTablePosition.objects.filter(corp_id=corp_id, quantity__gt=0))
+
+    def invalidate(self, corp_id, _seen=None):
+        """Oublie les résultats mémorisés de cette société et des sociétés qu'elle détient (en aval)."""
+        seen = _seen if _seen is not None else set()
+        if corp_id in seen:
+            return
+        seen.add(corp_id)
+        self._memo.pop(corp_id, None)
+        for held in self.held_in.get(corp_id, ()):
+            self.invalidate(held, seen)
+
+    def _load(self, positions):
+        totals = {}
+        for corp_id, holder_id, qty, is_voting in positions.values_list("corp", "holder", "quantity", "share_class__is_voting"):
+            shares, votes = totals.setdefault(corp_id, {}).get(holder_id, (0, 0))
+            totals[corp_id][holder_id] = (shares + qty, votes + (qty if is_voting else 0))
+        holder_ids = {holder_id for holders in totals.values() for holder_id in holders} - self.party_type.keys()
+        for party_id, party_type, owner_corp in (Party.objects
+                                                 .filter(id__in=holder_ids)
+                                                 .values_list("id", "type", "entity__corporation")):
+            self.party_type[party_id] = party_type
+            if owner_corp is not None:
+                self.party_corp[party_id] = owner_corp
+        for corp_id, holders in totals.items():
+            all_shares = sum(shares for shares, _ in holders.values())
+            all_votes = sum(votes for _, votes in holders.values())
+            self.holdings[corp_id] = {
+                holder_id: (Fraction(shares, all_shares), Fraction(votes, all_votes) if all_votes else Fraction(0))
+                for holder_id, (shares, votes) in holders.items()
+            }
+            for holder_id in holders:
+                owner_corp = self.party_corp.get(holder_id)
+                if owner_corp is not None:
+                    self.held_in.setdefault(owner_corp, set()).add(corp_id)
+
+    def ultimate_owners(self, corp_id):
+        """{ party_id: (fraction des actions, fraction des voix) } détenues directement ou indirectement."""
+        return self._resolve(corp_id, [])[0]
+
+    def _resolve(self, corp_id, stack):
+        # Retourne (résultat, profondeur minimale d'un ancêtre dont un arc a été coupé) ;
+        # le résultat n'est mémorisé que s'il ne dépend d'aucun ancêtre de la pile courante.
+        if corp_id in self._memo:
+            return self._memo[corp_id], _NO_CUT
+        depth = len(stack)
+        stack.append(corp_id)
+        result, low = {}, _NO_CUT
+        for party_id, (shares, votes) in self.holdings.get(corp_id, {}).items():
+            owner_corp = self.party_corp.get(party_id)
+            if owner_corp not in self.holdings:
+                # Personne physique, ou entité non transparente : détenteur ultime
+                self._add(result, party_id, shares, votes)
+                continue
+            if owner_corp in stack:
+                start = stack.index(owner_corp)
+                self._record_cycle(stack[start:])
+                low = min(low, start)
+                continue
+            sub, sub_low = self._resolve(owner_corp, stack)
+            low = min(low, sub_low)
+            for ultimate_id, (sub_shares, sub_votes) in sub.items():
+                self._add(result, ultimate_id, shares * sub_shares, votes * sub_votes)
+        stack.pop()
+        if low >= depth:
+            self._memo[corp_id] = result
+        return result, low
+
+    @staticmethod
+    def _add(result, party_id, shares, votes):
+        prev_shares, prev_votes = result.get(party_id, (0, 0))
+        result[party_id] = (prev_shares + shares, prev_votes + votes)
+
+    def _record_cycle(self, path):
+        pivot = path.index(min(path))
+        self.cycles.add(tuple(path[pivot:] + path[:pivot]))
+
+    def cycles_of(self, corp_id):
+        """Cycles de détention en amont de la société (le graphe en mémoire couvre toute l'organisation)."""
+        self.ultimate_owners(corp_id)  # enregistre les cycles rencontrés
+        upstream, todo = set(), [corp_id]
+        while todo:
+            current = todo.pop()
+            if current in upstream:
+                continue
+            upstream.add(current)
+            todo += [self.party_corp[party_id] for party_id in self.holdings.get(current, {})
+                     if self.party_corp.get(party_id) in self.holdings]
+        return sorted(list(cycle) for cycle in self.cycles if upstream.intersection(cycle))
+
+    def significant_holders(self, corp_id, threshold=SIGNIFICANT_CONTROL):
+        """Détenteurs ultimes atteignant le seuil (25 % des actions ou des voix par défaut)."""
+        return sorted(
+            (
+                {
+                    "party": party_id,
+                    "is_individual": self.party_type.get(party_id) == Party.Type.PERSON,
+                    "shares": shares,
+                    "votes": votes,
+                }
+                for party_id, (shares, votes) in self.ultimate_owners(corp_id).items()
+                if shares >= threshold or votes >= threshold
+            ),
+            key=lambda row: (-max(row["shares"], row["votes"]), row["party"]),
+        )
+
+class _CachedGraph:
+    """Graphe d'une organisation et son verrou : un chargement par organisation à la fois."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.graph, self.seen, self.loaded_at = None, {}, 0.0  # seen : {corp_id: révision}
+
+_graphs = OrderedDict()  # org_id -> _CachedGraph, du moins au plus récemment utilisé
+_graphs_lock = threading.Lock()  # protège seulement _graphs (recherche, insertion, éviction)
+
+@contextmanager
+def locked_graph(org):
+    """Graphe à jour de l'organisation, utilisable jusqu'à la sortie du bloc (accès exclusif).
+
+    Le chargement se fait sous le verrou de l'organisation : les autres organisations ne l'attendent pas.
+    """
+    with _graphs_lock:
+        cached = _graphs.get(org.id)
+        if cached is None:
+            cached = _graphs[org.id] = _CachedGraph()
+        _graphs.move_to_end(org.id)
+        while len(_graphs) > MAX_GRAPHS:
+            _graphs.popitem(last=False)  # un graphe évincé en cours d'usage reste valable pour son détenteur
+    with cached.lock:
+        # Révisions lues avant les positions : au pire une société est rechargée une fois de trop
+        revisions = dict(CapTableRevision.objects.filter(corp__org=org).values_list("corp_id", "revision"))
+        if cached.graph is None or time.monotonic() - cached.loaded_at > GRAPH_TTL:
+            cached.graph, cached.loaded_at = OwnershipGraph.for_org(org), time.monotonic()
+        else:
+            for corp_id in sorted(revisions.keys() | cached.seen.keys()):
+                if revisions.get(corp_id) != cached.seen.get(corp_id):
+                    cached.graph.refresh(corp_id)
+        cached.seen = revisions
+        yield cached.graph
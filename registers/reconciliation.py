@@ -0,0 +1,43 @@
+"""Rapprochement des certificats en circulation avec les positions du registre."""
+import django
+from django.db import connections
+from django.db.models import Sum
+
+from .models import CapTablePosition, ShareCertificate
+
+REPORT_FIELDS = ["corp", "holder", "share_class", "ledger", "certificates", "difference"]
+
+def reconcile(corps):
+    """Écarts [(corp_id, holder_id, class_id, registre, certificats)] pour un ensemble de sociétés.
+
+    Deux requêtes groupées (certificats non annulés, positions), quel que soit le nombre
+    de sociétés ou de certificats.
+    """
+    totals = {}
+    for row in (ShareCertificate.objects
+                .filter(corp__in=corps, cancelled_on__isnull=True)
+                .values("corp", "holder", "share_class")
+                .annotate(qty=Sum("quantity"))
+                .order_by()):
+        totals[(row["corp"], row["holder"], row["share_class"])] = [0, row["qty"]]
+    for corp_id, holder_id, class_id, qty in (CapTablePosition.objects
+                                              .filter(corp__in=corps)
+                                              .exclude(quantity=0)
+                                              .values_list("corp", "holder", "share_class", "quantity")):
+        totals.setdefault((corp_id, holder_id, class_id), [0, 0])[0] = qty
+    return [
+        (corp_id, holder_id, class_id, ledger, certificates)
+        for (corp_id, holder_id, class_id), (ledger, certificates) in sorted(totals.items())
+        if ledger != certificates
+    ]
+
+def init_worker():
+    # Processus enfant : Django initialisé, sans réutiliser les connexions héritées du parent
+    django.setup()
+    connections.close_all()
+
+def reconcile_chunk(corp_ids):
+    try:
+        return reconcile(list(corp_ids))
+    finally:
+        connections.close_all()
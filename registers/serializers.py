@@ -0,0 +1,20 @@
+from rest_framework import serializers
+from .models import ShareIssuance, ShareTransfer, ShareRedemption
+
+class ShareIssuanceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShareIssuance
+        fields = ["id", "corp", "share_class", "to_holder", "quantity", "occurred_on", "consideration", "resolution_ref"]
+        read_only_fields = ["corp"]
+
+class ShareTransferSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShareTransfer
+        fields = ["id", "corp", "share_class", "from_holder", "to_holder", "quantity", "occurred_on", "consideration"]
+        read_only_fields = ["corp"]
+
+class ShareRedemptionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShareRedemption
+        fields = ["id", "corp", "share_class", "from_holder", "quantity", "occurred_on"]
+        read_only_fields = ["corp"]
@@ -0,0 +1,23 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import (LedgerEntry, ShareIssuance, ShareRedemption, ShareTransfer, apply_position_deltas,
+                     invalidate_cap_table_snapshots)
+
+# Signal plutôt que LedgerEntry.delete() : QuerySet.delete() (action « supprimer » de l'admin)
+# doit aussi retirer le mouvement des positions. Exécuté dans la transaction de la suppression.
+
+def _deletes_ledger(origin):
+    # Suppression en cascade d'une société/organisation : positions et instantanés partent avec elle
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, LedgerEntry)
+
+@receiver(post_delete, sender=ShareIssuance)
+@receiver(post_delete, sender=ShareTransfer)
+@receiver(post_delete, sender=ShareRedemption)
+def revert_positions(sender, instance, origin=None, **kwargs):
+    if origin is not None and not _deletes_ledger(origin):
+        return
+    apply_position_deltas(LedgerEntry._reverted_deltas(instance))
+    invalidate_cap_table_snapshots([instance])
@@ -1,3 +1,196 @@
-from django.shortcuts import render
+import json
+from datetime import date
+from fractions import Fraction
+from django.core.exceptions import ValidationError
+from django.http import FileResponse, Http404, StreamingHttpResponse
 
-# Create your views here.
+from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+
+from corps.models import Corporation
+from orgs.models import Membership, Organization
+from . import ledger
+from .models import compute_cap_table_as_of, get_cap_table, get_cap_tables
+from .serializers import ShareIssuanceSerializer, ShareTransferSerializer, ShareRedemptionSerializer
+
+def _positions_payload(table):
+    return [
+        {"holder": holder_id, "share_class": class_id, "quantity": qty}
+        for (holder_id, class_id), qty in sorted(table.items())
+        if qty
+    ]
+
+class RegisterViewSet(viewsets.ViewSet):
+    """Registres des valeurs mobilières d'une société (pk = id de la société)."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _get_corp(self, pk):
+        try:
+            corp = Corporation.objects.select_related("org").get(id=pk)
+        except (Corporation.DoesNotExist, ValueError):
+            raise Http404("Corporation not found")
+        user = self.request.user
+        if not user.is_superuser and not Membership.objects.filter(org=corp.org, user=user, is_active=True).exists():
+            raise PermissionDenied("Vous devez être membre actif de l'organisation de cette société.")
+        return corp
+
+    def _get_org(self, org_id):
+        try:
+            org = Organization.objects.get(id=org_id)
+        except Organization.DoesNotExist:
+            raise Http404("Organization not found")
+        user = self.request.user
+        if not user.is_superuser and not Membership.objects.filter(org=org, user=user, is_active=True).exists():
+            raise PermissionDenied("Vous devez être membre actif de cette organisation.")
+        return org
+
+    @action(detail=True, methods=["get"], url_path="cap-table")
+    def cap_table(self, request, pk=None):
+        corp = self._get_corp(pk)
+        as_of = request.query_params.get("as_of")
+        if as_of:
+            try:
+                as_of = date.fromisoformat(as_of)
+            except ValueError:
+                return Response({"detail": "Paramètre as_of invalide (AAAA-MM-JJ)."}, status=400)
+            table = compute_cap_table_as_of(corp, as_of)
+        else:
+            table = get_cap_table(corp)
+        return Response({"corp": corp.id, "as_of": as_of, "positions": _positions_payload(table)})
+
+    def _record(self, request, pk, serializer_class, write):
+        corp = self._get_corp(pk)
+        serializer = serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            entry = write(corp=corp, **serializer.validated_data)
+        except ValidationError as exc:
+            return Response({"detail": exc.messages}, status=400)
+        return Response(serializer_class(entry).data, status=201)
+
+    @action(detail=True, methods=["post"], url_path="issuances")
+    def issuances(self, request, pk=None):
+        return self._record(request, pk, ShareIssuanceSerializer, ledger.issue_shares)
+
+    @action(detail=True, methods=["post"], url_path="transfers")
+    def transfers(self, request, pk=None):
+        return self._record(request, pk, ShareTransferSerializer, ledger.transfer_shares)
+
+    @action(detail=True, methods=["post"], url_path="redemptions")
+    def redemptions(self, request, pk=None):
+        return self._record(request, pk, ShareRedemptionSerializer, ledger.redeem_shares)
+
+    @action(detail=True, methods=["get"], url_path="ownership")
+    def ownership(self, request, pk=None):
+        """Détention pleinement diluée, pouvoir de vote et concentration (calcul vectorisé)."""
+        corp = self._get_corp(pk)
+        from .analytics import OwnershipMatrix
+        return Response({"corp": corp.id, **OwnershipMatrix.for_corp(corp).report()})
+
+    @action(detail=True, methods=["get"], url_path="significant-control")
+    def significant_control(self, request, pk=None):
+        """Particuliers ayant un contrôle important (ISC/BUO), détention indirecte comprise."""
+        corp = self._get_corp(pk)
+        try:
+            threshold = Fraction(request.query_params.get("threshold", "0.25"))
+        except (ValueError, ZeroDivisionError):
+            return Response({"detail": "Paramètre threshold invalide."}, status=400)
+        from .ownership import locked_graph
+        with locked_graph(corp.org) as graph:
+            holders = graph.significant_holders(corp.id, threshold)
+            cycles = graph.cycles_of(corp.id)
+        return Response({
+            "corp": corp.id,
+            "threshold": float(threshold),
+            "holders": [
+                {**row, "shares": float(row["shares"]), "votes": float(row["votes"])}
+                for row in holders
+            ],
+            "cycles": cycles,
+        })
+
+    @action(detail=False, methods=["post"], url_path=r"org/(?P<org_id>\d+)/import",
+            parser_classes=[MultiPartParser, FormParser])
+    def import_registers(self, request, org_id=None):
+        """Import CSV/XLSX de mouvements (champ « file », option « dry_run »)."""
+        org = self._get_org(org_id)
+        f = request.FILES.get("file")
+        if not f:
+            return Response({"detail": 'Aucun fichier "file" fourni.'}, status=400)
+        from .importer import RegisterImporter, iter_rows
+        dry_run = request.data.get("dry_run", "").lower() in ("1", "true", "yes")
+        result = RegisterImporter(org, dry_run=dry_run).run(iter_rows(f, f.name))
+        return Response({"dry_run": dry_run, **result.as_dict()}, status=200 if dry_run else 201)
+
+    @action(detail=True, methods=["get"], url_path="reconciliation")
+    def reconciliation(self, request, pk=None):
+        """Écarts entre certificats en circulation et positions du registre."""
+        corp = self._get_corp(pk)
+        from .reconciliation import reconcile
+        return Response({
+            "corp": corp.id,
+            "discrepancies": [
+                {"holder": holder_id, "share_class": class_id, "ledger": ledger,
+                 "certificates": certificates, "difference": certificates - ledger}
+                for _, holder_id, class_id, ledger, certificates in reconcile([corp.id])
+            ],
+        })
+
+    @action(detail=True, methods=["get"],
+            url_path=r"export/(?P<register>securities|directors|cap-table)\.(?P<fmt>csv|xlsx|pdf)")
+    def export(self, request, pk=None, register=None, fmt=None):
+        """Export d'un registre en mémoire constante : CSV et PDF diffusés, XLSX écrit sur disque puis envoyé."""
+        corp = self._get_corp(pk)
+        from .exports import FORMATS, REGISTERS, iter_csv, iter_pdf, write_xlsx
+        header, rows = REGISTERS[register](corp)
+        filename = f"registre_{register}_{corp.id}.{fmt}"
+        title = f"{corp.legal_name} — {register}"
+        if fmt == "xlsx":
+            return FileResponse(write_xlsx(title, header, rows), as_attachment=True, filename=filename,
+                                content_type=FORMATS[fmt])
+        chunks = iter_csv(header, rows) if fmt == "csv" else iter_pdf(title, header, rows)
+        response = StreamingHttpResponse(chunks, content_type=FORMATS[fmt])
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=True, methods=["get"], url_path=r"minute-book\.zip")
+    def minute_book(self, request, pk=None):
+        """Livre de minutes complet en un ZIP diffusé (documents, registres, manifeste) ; ?merged=1 ajoute un PDF fusionné."""
+        corp = self._get_corp(pk)
+        from documents.minutebook import iter_minute_book
+        from documents.zipstream import iter_zip
+        merged = request.query_params.get("merged", "").lower() in ("1", "true", "yes")
+        try:
+            entries = iter_minute_book(corp, merged=merged)
+        except RuntimeError as exc:
+            return Response({"detail": str(exc)}, status=503)
+        response = StreamingHttpResponse(iter_zip(entries), content_type="application/zip")
+        response["Content-Disposition"] = f'attachment; filename="livre_minutes_{corp.id}.zip"'
+        return response
+
+    @action(detail=False, methods=["get"], url_path=r"org/(?P<org_id>\d+)/cap-tables")
+    def org_cap_tables(self, request, org_id=None):
+        """Cap tables de toutes les sociétés de l'organisation, en flux JSON (nombre de requêtes constant)."""
+        org = self._get_org(org_id)
+        corps = org.corporations.order_by("id")
+
+        def stream():
+            tables = get_cap_tables(corps)
+            pending = next(tables, None)
+            yield '{"org": %d, "corporations": [' % org.id
+            for n, (corp_id, legal_name) in enumerate(corps.values_list("id", "legal_name").iterator()):
+                table = {}
+                if pending and pending[0] == corp_id:
+                    table = pending[1]
+                    pending = next(tables, None)
+                yield ("," if n else "") + json.dumps({
+                    "corp": corp_id,
+                    "legal_name": legal_name,
+                    "positions": _positions_payload(table),
+                })
+            yield "]}"
+
+        return StreamingHttpResponse(stream(), content_type="application/json")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_ticketattachment_deleted_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
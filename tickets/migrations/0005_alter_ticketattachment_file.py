@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+import documents.storage
+import tickets.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_ticketattachment_sha256'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticketattachment',
+            name='file',
+            field=models.FileField(storage=documents.storage.get_cas_storage, upload_to=tickets.models.ticket_attachment_upload_to),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_alter_ticketattachment_file'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticketattachment',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
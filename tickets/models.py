@@ -1,7 +1,10 @@
 import os
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from corps.models import Corporation
+from documents.files import fieldfile_digest
+from documents.storage import get_cas_storage
 
 class Ticket(models.Model):
     class Category(models.TextChoices):
@@ -35,10 +38,11 @@ class TicketAttachment(models.Model):
         related_name="attachments",
         on_delete=models.CASCADE,
     )
-    file = models.FileField(upload_to=ticket_attachment_upload_to)
+    file = models.FileField(upload_to=ticket_attachment_upload_to, storage=get_cas_storage)
     original_name = models.CharField(max_length=255, blank=True)
     content_type = models.CharField(max_length=100, blank=True)
-    size = models.PositiveIntegerField(default=0)
+    size = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
     uploaded_by = models.ForeignKey(
         settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL
     )
@@ -62,6 +66,12 @@ class TicketAttachment(models.Model):
     def save(self, *args, **kwargs):
         if self.file and not self.original_name:
             self.original_name = os.path.basename(self.file.name)
+        # Empreinte et type calculés à la réception (documents.uploadhandlers), sinon en une lecture
+        # (recalculés si le fichier d'une pièce existante est remplacé)
+        if self.file and not self.file._committed and (self.pk or not self.sha256):
+            sha256, ctype, _ = fieldfile_digest(self.file)
+            self.sha256 = sha256
+            self.content_type = ctype or self.content_type
         try:
             if self.file and hasattr(self.file, "size"):
                 self.size = self.file.size
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from documents.models import Document
 from .models import Ticket, TicketAttachment
 
 class TicketSerializer(serializers.ModelSerializer):
@@ -32,5 +33,11 @@ class TicketCreateSerializer(serializers.ModelSerializer):
 class TicketAttachmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = TicketAttachment
-        fields = ["id", "ticket", "original_name", "file", "content_type", "size", "uploaded_by", "created_at"]
-        read_only_fields = ["ticket", "content_type", "size", "uploaded_by", "created_at"]
+        fields = ["id", "ticket", "original_name", "file", "content_type", "size", "sha256", "uploaded_by", "created_at"]
+        read_only_fields = ["ticket", "content_type", "size", "sha256", "uploaded_by", "created_at"]
+
+class AttachmentPromotionSerializer(serializers.Serializer):
+    """Promotion groupée : pièces jointes du ticket (toutes si absent) → documents de la société."""
+    attachments = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    category = serializers.ChoiceField(choices=Document.Category.choices, default=Document.Category.OTHER)
+    language = serializers.CharField(max_length=5, default="fr")
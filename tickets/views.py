@@ -1,6 +1,8 @@
 from rest_framework.decorators import action
-from rest_framework.parsers import MultiPartParser, FormParser
-from django.http import FileResponse
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from documents.downloads import download_filename, file_response
+from documents.models import Document
+from django.db import transaction
 from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.authentication import SessionAuthentication
@@ -8,7 +10,8 @@ from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from orgs.models import Membership
 from .models import Ticket, TicketAttachment
-from .serializers import TicketSerializer, TicketCreateSerializer
+from .serializers import (AttachmentPromotionSerializer, TicketAttachmentSerializer, TicketCreateSerializer,
+                          TicketSerializer)
 
 class IsAuthenticated(permissions.IsAuthenticated):
     pass
@@ -23,11 +26,12 @@ class TicketViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        qs = Ticket.objects.select_related("org", "corp", "created_by", "assigned_to")
+        # Le ticket n'a pas d'org propre : elle vient de la société
+        qs = Ticket.objects.select_related("corp__org", "opened_by", "assigned_to")
         org_ids = _user_org_ids(self.request.user)
         if org_ids is None:
             return qs
-        return qs.filter(org_id__in=org_ids)
+        return qs.filter(corp__org_id__in=org_ids)
 
     def get_serializer_class(self):
         if self.action in ("create", "update", "partial_update"):
@@ -75,7 +79,7 @@ class TicketViewSet(viewsets.ModelViewSet):
             parser_classes=[MultiPartParser, FormParser])
     def attachments(self, request, pk=None):
         ticket = self.get_object()
-        if not self._check_member(request.user, ticket.org):
+        if not self._check_member(request.user, ticket.corp.org):
             raise PermissionDenied("Accès refusé.")
 
         if request.method == "GET":
@@ -95,8 +99,9 @@ class TicketViewSet(viewsets.ModelViewSet):
             ticket=ticket,
             file=f,
             original_name=getattr(f, "name", ""),
-            content_type=getattr(f, "content_type", ""),
+            content_type=getattr(f, "sniffed_content_type", "") or getattr(f, "content_type", ""),
             size=f.size or 0,
+            sha256=getattr(f, "sha256", ""),
             uploaded_by=request.user,
         )
         data = TicketAttachmentSerializer(att, context={"request": request}).data
@@ -105,7 +110,7 @@ class TicketViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["delete"], url_path=r"attachments/(?P<att_id>[^/.]+)")
     def delete_attachment(self, request, pk=None, att_id=None):
         ticket = self.get_object()
-        if not self._check_member(request.user, ticket.org):
+        if not self._check_member(request.user, ticket.corp.org):
             raise PermissionDenied("Accès refusé.")
         att = self._get_attachment(ticket, att_id)
         if not att:
@@ -118,38 +123,68 @@ class TicketViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["get"], url_path=r"attachments/(?P<att_id>[^/.]+)/download")
     def download_attachment(self, request, pk=None, att_id=None):
         ticket = self.get_object()
-        if not self._check_member(request.user, ticket.org):
+        if not self._check_member(request.user, ticket.corp.org):
             raise PermissionDenied("Accès refusé.")
         att = self._get_attachment(ticket, att_id)
         if not att or not att.file:
             return Response({"detail": "Pièce jointe introuvable."}, status=404)
-        # Streaming avec contrôle d’accès (dev). En prod, préférer X-Accel-Redirect / presigned URL S3.
-        fh = att.file.open("rb")
-        resp = FileResponse(fh, content_type=(att.content_type or "application/octet-stream"))
-        filename = att.original_name or att.file.name.rsplit("/", 1)[-1]
-        resp["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return resp
+        # Transfert délégué (X-Accel-Redirect / X-Sendfile / URL S3 présignée) selon FILE_DOWNLOAD_BACKEND
+        filename = att.original_name or download_filename("piece_jointe", att.file.name, att.content_type)
+        return file_response(request, att.file, filename=filename, content_type=att.content_type,
+                             sha256=att.sha256, size=att.size)
+
+    def _promote(self, ticket, attachments, category=Document.Category.OTHER, language="fr"):
+        """Crée un Document par pièce jointe, sur le même blob (ni relecture ni copie des octets).
+
+        Empreinte, taille et type viennent de l'upload ; le compteur de références du blob est
+        incrémenté par le signal de création. Un contenu déjà présent dans la société est ignoré.
+        """
+        hashes = [att.sha256 for att in attachments if att.sha256]
+        existing = set(Document.objects.filter(corp_id=ticket.corp_id, sha256__in=hashes)
+                       .values_list("sha256", flat=True))
+        created, skipped = [], []
+        with transaction.atomic():
+            for att in attachments:
+                if att.sha256 and att.sha256 in existing:
+                    skipped.append(att.id)
+                    continue
+                doc = Document.objects.create(
+                    corp_id=ticket.corp_id, category=category, language=language,
+                    title=att.original_name or "Pièce jointe", uploaded_by=self.request.user,
+                    file=att.file.name, sha256=att.sha256, content_type=att.content_type, size=att.size,
+                )
+                existing.add(att.sha256)
+                created.append({"document_id": doc.id, "title": doc.title, "attachment": att.id})
+        return created, skipped
 
     @action(detail=True, methods=["post"], url_path=r"attachments/(?P<att_id>[^/.]+)/promote")
     def promote_attachment(self, request, pk=None, att_id=None):
         ticket = self.get_object()
-        if not self._check_member(request.user, ticket.org):
+        if not self._check_member(request.user, ticket.corp.org):
             raise PermissionDenied("Accès refusé.")
         att = self._get_attachment(ticket, att_id)
         if not att:
             return Response({"detail": "Pièce jointe introuvable."}, status=404)
-        if not ticket.corp_id:
-            return Response({"detail": "Ce ticket n'est lié à aucune corporation."}, status=400)
-
-        # Création d’un Document (app documents)
-        from documents.models import Document
-        doc = Document.objects.create(
-            corp_id=ticket.corp_id,
-            category="other",
-            title=att.original_name or "Pièce jointe",
-            file=att.file,  # même fichier; si tu veux dupliquer, gère-le ici
-            language="fr",
-            uploaded_by=request.user if request.user.is_authenticated else None,
-            sha256=getattr(att, "sha256", ""),
-        )
-        return Response({"document_id": doc.id, "title": doc.title}, status=201)
+        created, _ = self._promote(ticket, [att])
+        if not created:
+            return Response({"detail": "Ce contenu figure déjà dans les documents de la société."}, status=409)
+        return Response(created[0], status=201)
+
+    @action(detail=True, methods=["post"], url_path="promote-attachments", parser_classes=[JSONParser, FormParser])
+    def promote_attachments(self, request, pk=None):
+        """Promotion groupée, en une transaction : {"attachments": [ids] (toutes si absent), "category", "language"}."""
+        ticket = self.get_object()
+        if not self._check_member(request.user, ticket.corp.org):
+            raise PermissionDenied("Accès refusé.")
+        serializer = AttachmentPromotionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get("attachments")
+        qs = ticket.attachments.filter(is_deleted=False).exclude(file="").order_by("created_at", "id")
+        if ids is not None:
+            qs = qs.filter(pk__in=ids)
+        attachments = list(qs)
+        if ids is not None and len(attachments) != len(set(ids)):
+            return Response({"detail": "Pièces jointes introuvables pour ce ticket."}, status=404)
+        created, skipped = self._promote(ticket, attachments, serializer.validated_data["category"],
+                                         serializer.validated_data["language"])
+        return Response({"documents": created, "skipped": skipped}, status=201 if created else 200)